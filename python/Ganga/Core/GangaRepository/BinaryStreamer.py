@@ -0,0 +1,215 @@
+##########################################################################
+# Ganga Project. http://cern.ch/ganga
+##########################################################################
+
+# Compact binary persistence of Ganga object trees.
+#
+# The tree stored is exactly the one VStreamer writes as XML (it is built by the same accept()
+# visitor pattern) but encoded as nested tuples and written with pickle protocol 2:
+#   object:   (OBJECT, category, name, (major, minor), {attribute name: encoded value})
+#   sequence: (SEQUENCE, [encoded values])
+#   value:    (VALUE, python value)
+# The file holds the pair (names of the attributes of the root object which weren't written, encoded root object),
+# which lets the loader tell an object which lacks attributes (i.e. a broken file) from one written without them.
+# Files start with a short magic line so that from_file can tell them apart from XML, which is
+# still read (via VStreamer) for data written by sessions using the XML format.
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from Ganga.Utility.logging import getLogger
+from Ganga.Utility.Plugin import PluginManagerError, allPlugins
+from Ganga.GPIDev.Base.Objects import GangaObject
+from Ganga.GPIDev.Base.Proxy import isType
+from Ganga.GPIDev.Schema import Version
+from Ganga.GPIDev.Lib.GangaList.GangaList import GangaList, makeGangaList
+from Ganga.Core.exceptions import GangaException
+
+from .GangaRepository import SchemaVersionError
+from .VStreamer import XMLFileError, EmptyGangaObject
+from .VStreamer import from_file as xml_from_file
+
+logger = getLogger()
+
+_magic = '#GangaBinary 1\n'
+
+_OBJECT = 0
+_SEQUENCE = 1
+_VALUE = 2
+
+
+def is_binary_file(fobj):
+    """ Returns True if the open file fobj holds data written by this module, the position in the file is kept
+    Args:
+        fobj (file): file opened for reading
+    """
+    pos = fobj.tell()
+    head = fobj.read(len(_magic))
+    fobj.seek(pos)
+    return head == _magic
+
+
+def to_file(j, fobj=None, ignore_subs=[]):
+    """ Write the object j to the file fobj
+    Args:
+        j (GangaObject): The object to be written
+        fobj (file): The file to write to
+        ignore_subs (list, str): Name(s) of attributes of j which aren't written
+    """
+    _ignore_subs = [ignore_subs] if not isinstance(ignore_subs, list) else ignore_subs
+    try:
+        record = BinaryStreamer(_ignore_subs).encode(j)
+        fobj.write(_magic)
+        pickle.dump((_ignore_subs, record), fobj, 2)
+    except Exception as err:
+        logger.error("Binary to-file error for file:\n%s" % err)
+        raise XMLFileError(err, "to-file error")
+
+
+def from_file(f, lazy_attributes=()):
+    """ Load an object from the file f, data in XML is handed over to the XML loader
+    Returns the object and a list of errors, if the list isn't empty the object was not loaded correctly
+    Args:
+        f (file): file opened for reading
+        lazy_attributes (list): passed to the XML loader, binary data is always loaded completely
+    """
+    if not is_binary_file(f):
+        return xml_from_file(f, lazy_attributes)
+    try:
+        f.read(len(_magic))
+        ignored, record = pickle.load(f)
+        return BinaryLoader(ignored).decode(record)
+    except Exception as err:
+        logger.error("Binary from-file error for file:\n%s" % err)
+        raise XMLFileError(err, "from-file error")
+
+
+class BinaryStreamer(object):
+
+    """ A visitor building the binary representation of an object tree, it follows the same rules as VStreamer """
+
+    def __init__(self, selection=[]):
+        """
+        Args:
+            selection (list): names of attributes of the root object which should not be written
+        """
+        self.level = 0
+        self.selection = selection
+        self.stack = []
+
+    def encode(self, node):
+        """ Returns the encoded representation of node
+        Args:
+            node (GangaObject): The object to be encoded
+        """
+        node.accept(self)
+        return self.stack.pop()
+
+    def nodeBegin(self, node):
+        self.level += 1
+        s = node._schema
+        self.stack.append((_OBJECT, s.category, s.name, (s.version.major, s.version.minor), {}))
+
+    def nodeEnd(self, node):
+        self.level -= 1
+
+    def showAttribute(self, node, name):
+        return (self.level > 1 or name not in self.selection) and not node._schema.getItem(name)['transient']
+
+    def simpleAttribute(self, node, name, value, sequence):
+        if self.showAttribute(node, name):
+            if sequence:
+                encoded = (_SEQUENCE, [self.acceptOptional(v) for v in value])
+            elif isinstance(value, GangaObject):
+                encoded = self.acceptOptional(value)
+            else:
+                encoded = (_VALUE, value)
+            self.stack[-1][4][name] = encoded
+
+    def sharedAttribute(self, node, name, value, sequence):
+        self.simpleAttribute(node, name, value, sequence)
+
+    def componentAttribute(self, node, name, subnode, sequence):
+        if self.showAttribute(node, name):
+            if sequence:
+                encoded = (_SEQUENCE, [self.acceptOptional(s) for s in subnode])
+            else:
+                encoded = self.acceptOptional(subnode)
+            self.stack[-1][4][name] = encoded
+
+    def acceptOptional(self, s):
+        if s is None or isType(s, str):
+            return (_VALUE, s)
+        elif hasattr(s, 'accept'):
+            return self.encode(s)
+        elif isType(s, (list, tuple, GangaList)):
+            return (_SEQUENCE, [self.acceptOptional(sub_s) for sub_s in s])
+        else:
+            return (_VALUE, s)
+
+
+class BinaryLoader(object):
+
+    """ Object tree loader for the data written by BinaryStreamer """
+
+    def __init__(self, ignored=()):
+        """
+        Args:
+            ignored (list): names of attributes of the root object which were not written
+        """
+        self.errors = []  # list of exception objects in case of data errors
+        self.ignored = ignored
+        self.level = 0
+
+    def decode(self, record):
+        """ Returns the object stored in record and the list of errors found on the way
+        Args:
+            record (tuple): The encoded object as written by BinaryStreamer
+        """
+        obj = self._decode(record)
+        if not isinstance(obj, GangaObject):
+            self.errors.append(AssertionError('no object stored in binary data'))
+        return obj, self.errors
+
+    def _decode(self, record):
+        kind = record[0]
+        if kind == _VALUE:
+            return record[1]
+        if kind == _SEQUENCE:
+            try:
+                return makeGangaList([self._decode(r) for r in record[1]])
+            except GangaException:
+                raise
+            except Exception:
+                raise GangaException("ERROR in loading binary data, failed to construct a sequence(list) properly")
+
+        _kind, category, name, version, attributes = record
+        try:
+            cls = allPlugins.find(category, name)
+        except PluginManagerError as e:
+            self.errors.append(e)
+            return EmptyGangaObject()
+        if not cls._schema.version.isCompatible(Version(*version)):
+            self.errors.append(SchemaVersionError('Incompatible schema of %s, repository is %s.%s currently in use is %s.%s' %
+                                                  ((name,) + tuple(version) + (cls._schema.version.major, cls._schema.version.minor))))
+            return EmptyGangaObject()
+
+        # Raise Exception if object is incomplete, objects written with an older schema may lack the newer attributes
+        if cls._schema.version == Version(*version):
+            ignored = self.ignored if self.level == 0 else ()
+            for attr_name, item in cls._schema.allItems():
+                if item['visitable'] and not item['transient'] and attr_name not in ignored and attr_name not in attributes:
+                    raise AssertionError("incomplete binary file, %s has no attribute %s" % (name, attr_name))
+
+        obj = cls.getNew()
+        self.level += 1
+        for attr_name, attr_record in attributes.iteritems():
+            value = self._decode(attr_record)
+            try:
+                obj.setSchemaAttribute(attr_name, value)
+            except Exception:
+                raise GangaException("ERROR in loading binary data, failed to set attribute %s for class %s" % (attr_name, name))
+        self.level -= 1
+        return obj
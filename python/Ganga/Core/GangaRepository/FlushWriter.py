@@ -0,0 +1,164 @@
+# This class (FlushWriter) writes the objects of a Registry to its repository from a thread of its own.
+#
+# With [Registry]AsyncFlush, Registry._flush(objs, wait=False) hands the dirty objects over to the FlushWriter of the
+# registry and returns straight away, so e.g. a monitoring thread updating the status of jobs doesn't wait for them to
+# be written out, nor for the writes of the other threads.
+#   - an object handed over again before it has been written is only written once
+#   - the writer waits [Registry]AsyncFlushWindow seconds after the first object is handed over, to collect as many
+#     as possible, and then writes them from up to [Registry]AsyncFlushThreads threads at the same time
+#   - while the objects are written the flush lock of the registry is held, as it is for a synchronous flush
+#   - the files are still written to .new, renamed and the previous one kept as ~, see safe_save
+# drain() writes everything that is still waiting, from the calling thread, it's used before a synchronous flush of
+# the whole registry and on shutdown.
+
+import threading
+import time
+
+from Ganga.Core.GangaThread.GangaThread import GangaThread
+from Ganga.Utility.Config import getConfig
+from Ganga.Utility.external.OrderedDict import OrderedDict as oDict
+from Ganga.Utility.logging import getLogger
+
+logger = getLogger()
+
+
+class FlushWriter(object):
+
+    """
+    Writes the objects handed over by Registry._flush in the background, see the description of the module
+    """
+
+    def __init__(self, registry):
+        """
+        Args:
+            registry (Registry): the registry whose objects are written
+        """
+        super(FlushWriter, self).__init__()
+        self.registry = registry
+        self._pending = oDict()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self.stats = {'queued': 0, 'coalesced': 0, 'written': 0, 'errors': 0, 'max_depth': 0,
+                      'latency_total': 0., 'latency_max': 0.}
+
+    def depth(self):
+        """ Number of objects waiting to be written """
+        return len(self._pending)
+
+    def queue(self, objs):
+        """ Hand objects over to be written
+        Args:
+            objs (list): the objects, those already waiting are written once
+        """
+        with self._cond:
+            for obj in objs:
+                if id(obj) in self._pending:
+                    self.stats['coalesced'] += 1
+                    continue
+                self._pending[id(obj)] = obj
+                self.stats['queued'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], len(self._pending))
+            if self._thread is None and not self._stopped:
+                self._thread = GangaThread(name='FlushWriter_%s' % self.registry.name, target=self._run)
+                self._thread.start()
+            self._cond.notify()
+
+    def drain(self):
+        """ Write the objects waiting to be written now, from the calling thread """
+        with self.registry._flush_lock:
+            for obj in self._take():
+                self._write(obj, blocking=True)
+
+    def stop(self):
+        """ Write the objects waiting to be written and stop the thread of the writer """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self.drain()
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread.unregister()
+
+    def _take(self):
+        with self._cond:
+            objs = self._pending.values()
+            self._pending.clear()
+        return objs
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped and not self._thread.should_stop():
+                    self._cond.wait(1.)
+                if self._stopped or self._thread.should_stop():
+                    return
+            # Give the objects being handed over a chance to pile up
+            time.sleep(getConfig('Registry')['AsyncFlushWindow'])
+            # Don't get stuck behind a long flush of the whole registry, e.g. on shutdown which drains the writer itself
+            while not self.registry._flush_lock.acquire(False):
+                if self._stopped or self._thread.should_stop():
+                    return
+                time.sleep(0.05)
+            try:
+                self._writeAll(self._take())
+            finally:
+                self.registry._flush_lock.release()
+
+    def _writeAll(self, objs):
+        """ Write objects from up to [Registry]AsyncFlushThreads threads, the flush lock of the registry is held
+        Args:
+            objs (list): the objects to write
+        """
+        number = max(1, min(getConfig('Registry')['AsyncFlushThreads'], len(objs)))
+        threads = []
+        for i in range(1, number):
+            thread = threading.Thread(target=self._writeSome, args=(objs[i::number],))
+            thread.start()
+            threads.append(thread)
+        self._writeSome(objs[::number])
+        for thread in threads:
+            thread.join()
+
+    def _writeSome(self, objs):
+        busy = [obj for obj in objs if not self._write(obj, blocking=False)]
+        if busy:
+            # Another thread is holding these, they're written next time rather than waiting here with the flush lock
+            self.queue(busy)
+
+    def _write(self, obj, blocking):
+        """ Write an object if it's dirty and still in the registry, returns False if it's held by another thread
+        Args:
+            obj (GangaObject): the object to write
+            blocking (bool): wait for the other thread rather than return False
+        """
+        start = time.time()
+        try:
+            if not obj._dirty or not self.registry.has_loaded(obj):
+                return True
+            # This is what obj.const_lock does, but the lock may not be free
+            root_lock = obj._getRoot()._lock
+            if not root_lock.acquire(blocking):
+                return False
+            try:
+                self.registry.repository.flush([self.registry.find(obj)])
+                obj._setFlushed()
+            finally:
+                root_lock.release()
+        except Exception as err:
+            logger.error("Error writing '%s' object: %s" % (self.registry.name, err))
+            self.stats['errors'] += 1
+            return True
+        latency = time.time() - start
+        with self._cond:
+            self.stats['written'] += 1
+            self.stats['latency_total'] += latency
+            self.stats['latency_max'] = max(self.stats['latency_max'], latency)
+        return True
+
+    def info(self):
+        """ Returns a string describing the backlog of the writer and how long the writes take """
+        written = self.stats['written']
+        return "flush queue: %i waiting (at most %i), %i written, %i coalesced, %i errors, write latency mean %.1fms max %.1fms" % \
+            (self.depth(), self.stats['max_depth'], written, self.stats['coalesced'], self.stats['errors'],
+             1000. * self.stats['latency_total'] / max(written, 1), 1000. * self.stats['latency_max'])
@@ -16,6 +16,7 @@ from Ganga.Utility.logging import getLogger
 
 from Ganga.Utility.Plugin import allPlugins
 from Ganga.Core.exceptions import SchemaVersionError, RepositoryError
+from Ganga.Core.GangaRepository.QueryIndex import QueryIndex
 from Ganga.GPIDev.Base.Proxy import getName
 
 logger = getLogger()
@@ -27,7 +28,7 @@ class GangaRepository(object):
         The base class implements a transient Ganga Repository for testing purposes.
     """
 
-    __slots__ = ('registry', 'objects', 'incomplete_objects', '_found_classes')
+    __slots__ = ('registry', 'objects', 'incomplete_objects', '_found_classes', 'query_index')
 
     def __init__(self, registry, locking=True):
         """GangaRepository constructor. Initialization should be done in startup()"""
@@ -36,6 +37,8 @@ class GangaRepository(object):
         self.objects = {}
         self.incomplete_objects = []
         self._found_classes = {}
+        # Filled by the repositories which keep index caches, for the objects which aren't loaded
+        self.query_index = QueryIndex(registry.getIndexedAttributes())
 
 # Functions that should be overridden and implemented by derived classes.
     def startup(self):
@@ -212,6 +215,7 @@ class GangaRepository(object):
         Args:
             id (int):
         """
+        self.query_index.remove(id)
         if id in self.incomplete_objects:
             self.incomplete_objects.remove(id)
         else:
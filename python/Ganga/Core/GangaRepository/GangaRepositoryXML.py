@@ -11,9 +11,13 @@ import time
 import errno
 import copy
 import threading
+import hashlib
+import cStringIO
+from functools import partial
 
 from Ganga.Core.GangaRepository.SessionLock import SessionLockManager, dry_run_unix_locks
 from Ganga.Core.GangaRepository.FixedLock import FixedLockManager
+from Ganga.Core.GangaRepository.IndexStore import IndexStore, IndexStoreRecord
 
 import Ganga.Utility.logging
 
@@ -24,6 +28,9 @@ from Ganga.Core.GangaRepository.VStreamer import to_file as xml_to_file
 from Ganga.Core.GangaRepository.VStreamer import from_file as xml_from_file
 from Ganga.Core.GangaRepository.VStreamer import XMLFileError
 
+from Ganga.Core.GangaRepository.BinaryStreamer import to_file as binary_to_file
+from Ganga.Core.GangaRepository.BinaryStreamer import from_file as binary_from_file
+
 from Ganga.GPIDev.Base.Objects import Node
 from Ganga.Core.GangaRepository.SubJobXMLList import SubJobXMLList
 
@@ -76,43 +83,95 @@ def check_app_hash(obj):
             logger.warning('re-prepare() the application). Otherwise, please file a bug report at:')
             logger.warning('https://github.com/ganga-devs/ganga/issues/')
 
-def safe_save(fn, _obj, to_file, ignore_subs=''):
+# Writes of the same file must not overlap (see Github Issue 185), writes of different files can.
+# A file is serialised by one of a fixed number of locks chosen by its name, so this doesn't grow with the repository
+_file_locks = [threading.Lock() for _ in range(64)]
+
+def _getFileLock(fn):
+    """Returns the lock serialising the writes of a file
+    Args:
+        fn (str): This is the name of the file
+    """
+    return _file_locks[hash(os.path.abspath(fn)) % len(_file_locks)]
+
+def safe_save(fn, _obj, to_file, ignore_subs='', digests=None):
     """Try to save the XML for this object in as safe a way as possible
+    Returns whether the file was written
     Args:
         fn (str): This is the name of the file we are to save the object to
         _obj (GangaObject): This is the object which we want to save to the file
         to_file (str): This is the method we want to use to save the to the file
         ignore_subs (str): This is the name(s) of the attribute of _obj we want to ignore in writing to disk
+        digests (dict): file name -> fingerprint of what was last written to it, if given the file isn't written again
+                        when the data would be the same and the file hasn't been touched since
     """
 
-    # Add a global lock to make absolutely sure we don't have multiple threads writing files
+    # Make absolutely sure we don't have multiple threads writing this file
     # See Github Issue 185
-    with safe_save.lock:
+    with _getFileLock(fn):
 
         obj = stripProxy(_obj)
         check_app_hash(obj)
 
-        # Create the dirs
-        dirname = os.path.dirname(fn)
-        if not os.path.exists(dirname):
-            os.makedirs(dirname)
+        if digests is None:
+            _safe_replace(fn, lambda tmpfile: to_file(obj, tmpfile, ignore_subs))
+            return True
+
+        sio = cStringIO.StringIO()
+        to_file(obj, sio, ignore_subs)
+        data = sio.getvalue()
+        digest = hashlib.md5(data).digest()
+        if fn in digests and digests[fn] == (digest,) + _fileSignature(fn):
+            return False
+
+        _safe_replace(fn, lambda tmpfile: tmpfile.write(data))
+        digests[fn] = (digest,) + _fileSignature(fn)
+        return True
+
+def _fileSignature(fn):
+    """Returns (mtime, size) of a file, to tell whether it was written since, or (None, None) if it doesn't exist
+    Args:
+        fn (str): This is the name of the file
+    """
+    try:
+        st = os.stat(fn)
+    except OSError:
+        return (None, None)
+    return (st.st_mtime, st.st_size)
+
+def safe_write_data(fn, data):
+    """Write data which has already been serialised to a file in the same way as safe_save
+    Args:
+        fn (str): This is the name of the file we are to save the data to
+        data (str): This is the content of the file
+    """
+    with _getFileLock(fn):
+        _safe_replace(fn, lambda tmpfile: tmpfile.write(data))
 
-        # Prepare new data file
-        new_name = fn + '.new'
-        with open(new_name, "w") as tmpfile:
-            to_file(obj, tmpfile, ignore_subs)
+def _safe_replace(fn, write_function):
+    """Replace fn by the output of write_function keeping the old file as a backup
+    Args:
+        fn (str): This is the name of the file we are to save to
+        write_function (function): This is called with the open file to be written to
+    """
+    # Create the dirs
+    dirname = os.path.dirname(fn)
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
 
-        # everything ready so create new data file and backup old one
-        if os.path.exists(new_name):
+    # Prepare new data file
+    new_name = fn + '.new'
+    with open(new_name, "w") as tmpfile:
+        write_function(tmpfile)
 
-            # Do we have an old one to backup?
-            if os.path.exists(fn):
-                os.rename(fn, fn + "~")
+    # everything ready so create new data file and backup old one
+    if os.path.exists(new_name):
 
-            os.rename(new_name, fn)
+        # Do we have an old one to backup?
+        if os.path.exists(fn):
+            os.rename(fn, fn + "~")
 
-# Global lock for above function - See issue #185
-safe_save.lock = threading.Lock()
+        os.rename(new_name, fn)
 
 def rmrf(name, count=0):
     """
@@ -206,23 +265,28 @@ class GangaRepositoryLocal(GangaRepository):
         self._cache_load_timestamp = {}
         self.printed_explanation = False
         self._fully_loaded = {}
+        # Fingerprints of the data files written, so an unchanged object isn't written again, see safe_save
+        self._written_digests = {}
+        # Counts of the data files of objects written and of those skipped because they were unchanged
+        self.write_stats = {'written': 0, 'unchanged': 0}
 
     def startup(self):
         """ Starts a repository and reads in a directory structure.
         Raise RepositoryError"""
         self._load_timestamp = {}
 
-        # New Master index to speed up loading of many, MANY files
+        # Timestamp of the index information each object was last refreshed from
         self._cache_load_timestamp = {}
-        self._cached_cat = {}
-        self._cached_cls = {}
-        self._cached_obj = {}
-        self._master_index_timestamp = 0
 
         self.known_bad_ids = []
-        if "XML" in self.registry.type:
+        self.binary_format = False
+        if "XML" in self.registry.type and self.registry.name in getConfig('Configuration')['binaryRepositories']:
+            self.binary_format = True
+            self.to_file = binary_to_file
+            self.from_file = partial(binary_from_file, lazy_attributes=getConfig('Configuration')['lazyXMLAttributes'])
+        elif "XML" in self.registry.type:
             self.to_file = xml_to_file
-            self.from_file = xml_from_file
+            self.from_file = partial(xml_from_file, lazy_attributes=getConfig('Configuration')['lazyXMLAttributes'])
         elif "Pickle" in self.registry.type:
             self.to_file = pickle_to_file
             self.from_file = pickle_from_file
@@ -246,15 +310,19 @@ class GangaRepositoryLocal(GangaRepository):
         else:
             raise RepositoryError(self, "Unable to launch due to unknown file-locking Strategy: \"%s\"" % getConfig('Configuration')['lockingStrategy'])
         self.sessionlock.startup()
+        self._setup_change_detection()
+        # Single file holding the index caches of all objects, authoritative over the per-object index files
+        self._index_store = IndexStore(os.path.join(self.root, 'index.store'),
+                                       locking=getConfig('Configuration')['lockingStrategy'] == "UNIX")
         # Load the list of files, this time be verbose and print out a summary
         # of errors
-        self.update_index(True, True)
+        self.update_index(verbose=True, firstRun=True)
         logger.debug("GangaRepositoryLocal Finished Startup")
 
     def shutdown(self):
         """Shutdown the repository. Flushing is done by the Registry
         Raise RepositoryError
-        Write an index file for all new objects in memory and master index file of indexes"""
+        Write an index file for all new objects in memory and bring the index store up to date"""
         from Ganga.Utility.logging import getLogger
         logger = getLogger()
         logger.debug("Shutting Down GangaRepositoryLocal: %s" % self.registry.name)
@@ -264,9 +332,12 @@ class GangaRepositoryLocal(GangaRepository):
             except Exception as err:
                 logger.error("Warning: problem writing index object with id %s" % k)
         try:
-            self._write_master_cache(True)
+            self._compact_index_store()
         except Exception as err:
-            logger.warning("Warning: Failed to write master index due to: %s" % err)
+            logger.warning("Warning: Failed to write index store due to: %s" % err)
+        if self._dir_watcher is not None:
+            self._dir_watcher.close()
+            self._dir_watcher = None
         self.sessionlock.shutdown()
 
     def get_fn(self, this_id):
@@ -287,51 +358,59 @@ class GangaRepositoryLocal(GangaRepository):
             self.saved_idxpaths[this_id] = os.path.join(self.root, "%ixxx" % int(this_id * 0.001), "%i.index" % this_id)
         return self.saved_idxpaths[this_id]
 
+    def _legacy_index_load(self, this_id):
+        """ Read the per-object index file for an object the index store doesn't know about yet and add it to the store
+            Returns the IndexStoreRecord for this object
+            Raise IOError on access or unpickling error
+            Raise OSError on stat error
+        Args:
+            this_id (int): This is the id for which we want to load the index file from disk
+        """
+        fn = self.get_idxfn(this_id)
+        fn_ctime = os.stat(fn).st_ctime
+        try:
+            with open(fn, 'r') as fobj:
+                cat, cls, cache = pickle_from_file(fobj)[0]
+        except Exception as x:
+            logger.warning("index_load Exception: %s" % x)
+            raise IOError("Error on unpickling: %s %s" %(getName(x), x))
+        self._index_store.put(this_id, cat, cls, cache, fn_ctime)
+        return IndexStoreRecord(fn_ctime, cat, cls, cache)
+
     def index_load(self, this_id):
-        """ load the index file for this object if necessary
-            Loads if never loaded or timestamp changed. Creates object if necessary
+        """ load the index information for this object if necessary
+            Loads if never loaded or the stored index changed. Creates object if necessary
             Returns True if this object has been changed, False if not
             Raise IOError on access or unpickling error 
             Raise OSError on stat error
             Raise PluginManagerError if the class name is not found
         Args:
-            this_id (int): This is the id for which we want to load the index file from disk
+            this_id (int): This is the id for which we want to load the index from the index store (or file on disk)
         """
         #logger.debug("Loading index %s" % this_id)
-        fn = self.get_idxfn(this_id)
-        # index timestamp changed
-        fn_ctime = os.stat(fn).st_ctime
+        record = self._index_store.get(this_id)
+        if record is None:
+            record = self._legacy_index_load(this_id)
         cache_time = self._cache_load_timestamp.get(this_id, 0)
-        if cache_time != fn_ctime:
-            logger.debug("%s != %s" % (cache_time, fn_ctime))
-            try:
-                with open(fn, 'r') as fobj:
-                    cat, cls, cache = pickle_from_file(fobj)[0]
-            except Exception as x:
-                logger.warning("index_load Exception: %s" % x)
-                raise IOError("Error on unpickling: %s %s" %(getName(x), x))
+        if cache_time != record.timestamp:
+            logger.debug("%s != %s" % (cache_time, record.timestamp))
             if this_id in self.objects:
                 obj = self.objects[this_id]
                 setattr(obj, "_registry_refresh", True)
             else:
                 try:
-                    obj = self._make_empty_object_(this_id, cat, cls)
+                    obj = self._make_empty_object_(this_id, record.category, record.classname)
                 except Exception as err:
-                    raise IOError('Failed to Parse information in Index file: %s. Err: %s' % (fn, err))
-            this_cache = obj._index_cache
-            this_data = this_cache if this_cache else {}
-            for k, v in cache.iteritems():
-                this_data[k] = v
-            #obj.setNodeData(this_data)
-            obj._index_cache = cache
-            self._cache_load_timestamp[this_id] = fn_ctime
-            self._cached_cat[this_id] = cat
-            self._cached_cls[this_id] = cls
-            self._cached_obj[this_id] = cache
+                    raise IOError('Failed to Parse information in Index for object: %s. Err: %s' % (this_id, err))
+            obj._index_cache = record.cache
+            self.query_index.update(this_id, record.cache)
+            self._cache_load_timestamp[this_id] = record.timestamp
+            self._index_reads += 1
             return True
         elif this_id not in self.objects:
-            self.objects[this_id] = self._make_empty_object_(this_id, self._cached_cat[this_id], self._cached_cls[this_id])
-            self.objects[this_id]._index_cache = self._cached_obj[this_id]
+            self.objects[this_id] = self._make_empty_object_(this_id, record.category, record.classname)
+            self.objects[this_id]._index_cache = record.cache
+            self.query_index.update(this_id, record.cache)
             setattr(self.objects[this_id], '_registry_refresh', True)
             return True
         else:
@@ -340,11 +419,11 @@ class GangaRepositoryLocal(GangaRepository):
         return False
 
     def index_write(self, this_id, shutdown=False):
-        """ write an index file for this object (must be locked).
+        """ write the index information for this object (must be locked) to the index store.
             Should not raise any Errors,
         Args:
             this_id (int): This is the index for which we want to write the index to disk
-            shutdown (bool): True causes this to always be written regardless of any checks"""
+            shutdown (bool): True causes the per-object index file to always be written regardless of any checks"""
         if this_id in self.incomplete_objects:
             return
         logger.debug("Writing index: %s" % this_id)
@@ -352,170 +431,160 @@ class GangaRepositoryLocal(GangaRepository):
         try:
             ifn = self.get_idxfn(this_id)
             new_idx_cache = self.registry.getIndexCache(stripProxy(obj))
+            record = self._index_store.get(this_id)
+            if record is None or record.cache != new_idx_cache or record.classname != getName(obj):
+                self._index_store.put(this_id, obj._category, getName(obj), new_idx_cache)
+                self._index_store.commit()
+                self._cache_load_timestamp[this_id] = self._index_store.get(this_id).timestamp
+            # The per-object index file is kept for older Ganga sessions and to rebuild a lost index store
             if not os.path.exists(ifn) or shutdown:
-                new_cache = new_idx_cache
                 with open(ifn, "w") as this_file:
-                    new_index = (obj._category, getName(obj), new_cache)
+                    new_index = (obj._category, getName(obj), new_idx_cache)
                     logger.debug("Writing: %s" % str(new_index))
                     pickle_to_file(new_index, this_file)
-                self._cached_obj[this_id] = new_cache
                 obj._index_cache = {}
-            self._cached_obj[this_id] = new_idx_cache
-        except IOError as err:
+        except (IOError, OSError) as err:
             logger.error("Index saving to '%s' failed: %s %s" % (ifn, getName(err), err))
 
-    def get_index_listing(self):
-        """Get dictionary of possible objects in the Repository: True means index is present,
-            False if not present
-        Raise RepositoryError"""
-        try:
-            if not os.path.exists(self.root):
-                os.makedirs(self.root)
-            obj_chunks = [d for d in os.listdir(self.root) if d.endswith("xxx") and d[:-3].isdigit()]
-        except OSError as err:
-            logger.debug("get_index_listing Exception: %s" % err)
-            raise RepositoryError(self, "Could not list repository '%s'!" % (self.root))
-        objs = {}  # True means index is present, False means index not present
-        for c in obj_chunks:
+    def _setup_change_detection(self):
+        """
+        Prepare the per-directory listing cache used to avoid re-reading unchanged parts of the repository
+        and, if requested and available, an inotify watch on the repository directories
+        """
+        self._chunk_listing = {}
+        self._dir_mtimes = {}
+        self._listing_time = 0
+        self._dir_watcher = None
+        self.last_update_stats = {}
+        self._index_reads = 0
+        detection = getConfig('Configuration')['repositoryChangeDetection']
+        if detection == 'inotify':
+            from Ganga.Utility.inotify import InotifyWatcher
             try:
-                listing = os.listdir(os.path.join(self.root, c))
-            except OSError as err:
-                logger.debug("get_index_listing Exception: %s")
-                raise RepositoryError(self, "Could not list repository '%s'!" % (os.path.join(self.root, c)))
-            objs.update(dict([(int(l), False) for l in listing if l.isdigit()]))
-            for l in listing:
-                if l.endswith(".index") and l[:-6].isdigit():
-                    this_id = int(l[:-6])
-                    if this_id in objs:
-                        objs[this_id] = True
-                    else:
-                        try:
-                            rmrf(self.get_idxfn(this_id))
-                            logger.warning("Deleted index file without data file: %s" % self.get_idxfn(this_id))
-                        except OSError as err:
-                            logger.debug("get_index_listing delete Exception: %s" % err)
-        return objs
-
-    def _read_master_cache(self):
+                self._dir_watcher = InotifyWatcher()
+            except (OSError, AttributeError) as err:
+                logger.debug("inotify unavailable, falling back to mtime checks: %s" % err)
+        elif detection not in ['mtime', 'rescan']:
+            raise RepositoryError(self, "Unknown repository change detection: \"%s\"" % detection)
+        self._always_rescan = detection == 'rescan'
+
+    def _dir_changed(self, path):
         """
-        read in the master cache to reduce significant I/O over many indexes separately on startup
+        Returns True if the directory at path may have changed since it was last listed.
+        Directories modified shortly before the last listing are always treated as changed as the
+        mtime resolution of some (network) filesystems can hide a second modification
+        Args:
+            path (str): The directory to check
         """
-        try:
-            _master_idx = os.path.join(self.root, 'master.idx')
-            if os.path.isfile(_master_idx):
-                logger.debug("Reading Master index")
-                self._master_index_timestamp = os.stat(_master_idx).st_ctime
-                with open(_master_idx, 'r') as input_f:
-                    this_master_cache = pickle_from_file(input_f)[0]
-                for this_cache in this_master_cache:
-                    if this_cache[1] >= 0:
-                        this_id = this_cache[0]
-                        self._cache_load_timestamp[this_id] = this_cache[1]
-                        self._cached_cat[this_id] = this_cache[2]
-                        self._cached_cls[this_id] = this_cache[3]
-                        self._cached_obj[this_id] = this_cache[4]
-            else:
-                logger.debug("Not Reading Master Index")
-        except Exception as err:
-            Ganga.Utility.logging.log_unknown_exception()
-            logger.debug("Master Index corrupt, ignoring it")
-            logger.debug("Exception: %s" % err)
-            self._clear_stored_cache()
-        finally:
-            rmrf(os.path.join(self.root, 'master.idx'))
+        mtime = os.stat(path).st_mtime
+        old_mtime = self._dir_mtimes.get(path)
+        self._dir_mtimes[path] = mtime
+        return old_mtime is None or old_mtime != mtime or mtime >= self._listing_time - 2
 
-    def _clear_stored_cache(self):
-        """
-        clear the master cache(s) which have been stored in memory
+    def _list_chunk(self, c):
         """
-        for k, v in self._cache_load_timestamp.iteritems():
-            self._cache_load_timestamp.pop(k)
-        for k, v in self._cached_cat.iteritems():
-            self._cached_cat.pop(k)
-        for k, v in self._cached_cls.iteritems():
-            self._cached_cls.pop(k)
-        for k, v in self._cached_obj.iteritems():
-            self._cached_obj.pop(k)
-
-    def _write_master_cache(self, shutdown=False):
+        List the objects in the chunk directory 'c' (e.g. '12xxx').
+        Returns a dict of id: True if an index file is present, False if not
+        Raise RepositoryError
+        Args:
+            c (str): The name of the chunk directory in the repository root
         """
-        write a master index cache once per 300sec
+        try:
+            listing = os.listdir(os.path.join(self.root, c))
+        except OSError as err:
+            logger.debug("get_index_listing Exception: %s" % err)
+            raise RepositoryError(self, "Could not list repository '%s'!" % (os.path.join(self.root, c)))
+        objs = dict([(int(l), False) for l in listing if l.isdigit()])
+        for l in listing:
+            if l.endswith(".index") and l[:-6].isdigit():
+                this_id = int(l[:-6])
+                if this_id in objs:
+                    objs[this_id] = True
+                else:
+                    try:
+                        rmrf(self.get_idxfn(this_id))
+                        logger.warning("Deleted index file without data file: %s" % self.get_idxfn(this_id))
+                    except OSError as err:
+                        logger.debug("get_index_listing delete Exception: %s" % err)
+        return objs
+
+    def get_index_listing(self, rescan=False):
+        """Get dictionary of possible objects in the Repository: True means index is present,
+            False if not present
+            Only directories which have changed since the last call are listed again
+        Raise RepositoryError
         Args:
-            shutdown (boool): True causes this to be written now
+            rescan (bool): Ignore the cached listing and list every directory again
         """
+        rescan = rescan or self._always_rescan
+        watcher = self._dir_watcher
+        dirty_chunks = set()
+        root_changed = False
+        listing_time = time.time()
         try:
-            _master_idx = os.path.join(self.root, 'master.idx')
-            this_master_cache = []
-            if os.path.isfile(_master_idx) and not shutdown:
-                if abs(self._master_index_timestamp - os.stat(_master_idx).st_ctime) < 300:
-                    return
-
-            items_to_save = self.objects.iteritems()
-            for k, v in items_to_save:
-                if k in self.incomplete_objects:
-                    continue
-                try:
-                    if k in self._fully_loaded:
-                        # Check and write index first
-                        obj = v#self.objects[k]
-                        new_index = None
-                        if obj is not None:
-                            new_index = self.registry.getIndexCache(stripProxy(obj))
-
-                        if new_index is not None:
-                            #logger.debug("k: %s" % k)
-                            arr_k = [k]
-                            if len(self.lock(arr_k)) != 0:
-                                self.index_write(k)
-                                self.unlock(arr_k)
-                                self._cached_obj[k] = new_index
+            if not os.path.exists(self.root):
+                os.makedirs(self.root)
+            if watcher is not None:
+                if not watcher.add_watch(self.root):
+                    rescan = True
+                for path, name, mask in watcher.read_events():
+                    if path == self.root:
+                        root_changed = True
+                    else:
+                        dirty_chunks.add(os.path.basename(path))
+                if watcher.overflowed:
+                    watcher.overflowed = False
+                    rescan = True
+            else:
+                root_changed = self._dir_changed(self.root)
+            if rescan or root_changed or not self._chunk_listing:
+                obj_chunks = [d for d in os.listdir(self.root) if d.endswith("xxx") and d[:-3].isdigit()]
+            else:
+                obj_chunks = self._chunk_listing.keys()
+        except OSError as err:
+            logger.debug("get_index_listing Exception: %s" % err)
+            raise RepositoryError(self, "Could not list repository '%s'!" % (self.root))
 
-                except Exception as err:
-                    logger.debug("Failed to update index: %s on startup/shutdown" % k)
-                    logger.debug("Reason: %s" % err)
+        for c in set(self._chunk_listing.keys()) - set(obj_chunks):
+            del self._chunk_listing[c]
+            self._dir_mtimes.pop(os.path.join(self.root, c), None)
+            if watcher is not None:
+                watcher.rm_watch(os.path.join(self.root, c))
 
-            iterables = self._cache_load_timestamp.iteritems()
-            for k, v in iterables:
-                if k in self.incomplete_objects:
-                    continue
-                cached_list = []
-                cached_list.append(k)
+        dirs_listed = 0
+        for c in obj_chunks:
+            chunk_dir = os.path.join(self.root, c)
+            if watcher is not None:
+                changed = c in dirty_chunks or c not in self._chunk_listing
+                if changed and not watcher.add_watch(chunk_dir):
+                    # Can't watch this one (e.g. out of watches) so check it every time
+                    dirty_chunks.add(c)
+            else:
                 try:
-                    fn = self.get_idxfn(k)
-                    if os.path.isfile(fn):
-                        time = os.stat(fn).st_ctime
-                    else:
-                        time = -1
+                    changed = self._dir_changed(chunk_dir)
                 except OSError as err:
-                    logger.debug("_write_master_cache: %s" % err)
-                    logger.debug("_cache_load_timestamp: %s" % self._cache_load_timestamp)
-                    import errno
-                    if err.errno == errno.ENOENT:  # If file is not found
-                        time = -1
-                    else:
-                        raise
+                    logger.debug("get_index_listing Exception: %s" % err)
+                    changed = True
+            if rescan or changed or c not in self._chunk_listing:
+                self._chunk_listing[c] = self._list_chunk(c)
+                dirs_listed += 1
 
-                if time > 0:
-                    cached_list.append(time)
-                    cached_list.append(self._cached_cat[k])
-                    cached_list.append(self._cached_cls[k])
-                    cached_list.append(self._cached_obj[k])
-                    this_master_cache.append(cached_list)
+        self._listing_time = listing_time
+        self.last_update_stats['dirs_listed'] = dirs_listed
 
-            try:
-                with open(_master_idx, 'w') as of:
-                    pickle_to_file(this_master_cache, of)
-            except IOError as err:
-                logger.debug("write_master: %s" % err)
-                try:
-                    os.remove(os.path.join(self.root, 'master.idx'))
-                except OSError as x:
-                    Ganga.Utility.logging.log_user_exception(True)
-        except Exception as err:
-            logger.debug("write_error2: %s" % err)
-            Ganga.Utility.logging.log_unknown_exception()
+        objs = {}  # True means index is present, False means index not present
+        for c_objs in self._chunk_listing.itervalues():
+            objs.update(c_objs)
+        return objs
 
-        return
+    def _compact_index_store(self):
+        """
+        Write any pending index information and compact the index store if it holds too many stale records
+        """
+        self._index_store.commit()
+        if self._index_store.needs_compaction():
+            logger.debug("Compacting index store of %s" % self.registry.name)
+            self._index_store.compact()
 
     def updateLocksNow(self):
         """
@@ -524,33 +593,53 @@ class GangaRepositoryLocal(GangaRepository):
         """
         self.sessionlock.updateNow()
 
-    def update_index(self, this_id=None, verbose=False, firstRun=False):
+    def update_index(self, this_id=None, verbose=False, firstRun=False, rescan=False):
         """ Update the list of available objects
+        Only directories and index entries which changed since the last update are re-read,
+        last_update_stats records how much work was actually done
         Raise RepositoryError
-        TODO avoid updating objects which haven't changed as this causes un-needed I/O
         Args:
             this_id (int): This is the id we want to explicitly check the index on disk for
             verbose (bool): Should we be verbose
-            firstRun (bool): If this is the call from the Repo startup then load the master index for perfomance boost
+            firstRun (bool): If this is the call from the Repo startup then (re)read the whole index store
+            rescan (bool): Re-list the whole repository and re-check every object
         """
-        # First locate and load the index files
+        # First bring the index store up to date, this must happen before listing the directories
+        # as other sessions create an object's directory before adding it to the store
         logger.debug("updating index...")
-        objs = self.get_index_listing()
+        t0 = time.time()
+        if firstRun:
+            store_changed = self._index_store.load()
+        else:
+            store_changed = self._index_store.refresh()
+        objs = self.get_index_listing(rescan=firstRun or rescan)
         changed_ids = []
         deleted_ids = set(self.objects.keys())
         summary = []
-        if firstRun:
-            self._read_master_cache()
         logger.debug("Iterating over Items")
 
+        # Objects removed from disk without going through the index store
+        for this_id in set(self._index_store.ids()) - set(objs):
+            self._index_store.remove(this_id)
+
+        deleted_ids -= set(objs)
+
+        # Make sure we do not overwrite older jobs if someone deleted the
+        # count file
+        if objs and max(objs) > self.sessionlock.count:
+            self.sessionlock.count = max(objs) + 1
+
+        # Only look at objects which are new to us or whose index has changed
+        if firstRun or rescan:
+            candidate_ids = objs.keys()
+        else:
+            candidate_ids = [i for i in objs if i not in self.objects]
+            candidate_ids.extend(i for i in store_changed if i in objs and i in self.objects)
+
         locked_ids = self.sessionlock.locked
+        index_reads = self._index_reads
 
-        for this_id in objs.keys():
-            deleted_ids.discard(this_id)
-            # Make sure we do not overwrite older jobs if someone deleted the
-            # count file
-            if this_id > self.sessionlock.count:
-                self.sessionlock.count = this_id + 1
+        for this_id in candidate_ids:
             # Locked IDs can be ignored
             if this_id in locked_ids:
                 continue
@@ -635,9 +724,11 @@ class GangaRepositoryLocal(GangaRepository):
                 self.printed_explanation = True
         logger.debug("updated index done")
 
-        if len(changed_ids) != 0:
-            isShutdown = not firstRun
-            self._write_master_cache(isShutdown)
+        self._compact_index_store()
+
+        self.last_update_stats['candidates'] = len(candidate_ids)
+        self.last_update_stats['index_reads'] = self._index_reads - index_reads
+        self.last_update_stats['time'] = time.time() - t0
 
         return changed_ids
 
@@ -708,6 +799,8 @@ class GangaRepositoryLocal(GangaRepository):
                     getattr(obj, self.sub_split).flush()
                 else:
                     # I have been constructed in this session, I don't know how to flush!
+                    # Any log of changes to older subjobs doesn't apply to these
+                    SubJobXMLList.removeWriteAheadLog(os.path.dirname(fn))
                     if hasattr(getattr(obj, self.sub_split)[0], "_dirty"):
                         split_cache = getattr(obj, self.sub_split)
                         for i in range(len(split_cache)):
@@ -732,7 +825,7 @@ class GangaRepositoryLocal(GangaRepository):
                     tempSubJList.flush(ignore_disk=True)
                     del tempSubJList
 
-                safe_save(fn, obj, self.to_file, self.sub_split)
+                self._count_write(safe_save(fn, obj, self.to_file, self.sub_split, self._written_digests))
                 # clean files not in subjobs anymore... (bug 64041)
                 for idn in os.listdir(os.path.dirname(fn)):
                     split_cache = getattr(obj, self.sub_split)
@@ -742,8 +835,9 @@ class GangaRepositoryLocal(GangaRepository):
 
                 logger.debug("not has_children")
 
-                safe_save(fn, obj, self.to_file, "")
+                self._count_write(safe_save(fn, obj, self.to_file, "", self._written_digests))
                 # clean files leftover from sub_split
+                SubJobXMLList.removeWriteAheadLog(os.path.dirname(fn))
                 for idn in os.listdir(os.path.dirname(fn)):
                     if idn.isdigit():
                         rmrf(os.path.join(os.path.dirname(fn), idn))
@@ -755,6 +849,17 @@ class GangaRepositoryLocal(GangaRepository):
         if this_id not in self._fully_loaded:
             self._fully_loaded[this_id] = obj
 
+    def _count_write(self, written):
+        """
+        Count a write of the data file of an object
+        Args:
+            written (bool): whether the file was written or skipped as it was unchanged
+        """
+        if written:
+            self.write_stats['written'] += 1
+        else:
+            self.write_stats['unchanged'] += 1
+
     def flush(self, ids):
         """
         flush the set of "ids" to disk and write the XML representing said objects in self.objects
@@ -774,11 +879,6 @@ class GangaRepositoryLocal(GangaRepository):
                 logger.debug("safe_flush: %s" % this_id)
                 self._safe_flush_xml(this_id)
 
-                self._cache_load_timestamp[this_id] = time.time()
-                self._cached_cls[this_id] = getName(self.objects[this_id])
-                self._cached_cat[this_id] = self.objects[this_id]._category
-                self._cached_obj[this_id] = self.objects[this_id]._index_cache
-
                 try:
                     self.index_write(this_id)
                 except:
@@ -897,6 +997,7 @@ class GangaRepositoryLocal(GangaRepository):
             self._check_index_cache(obj, this_id)
 
         obj._index_cache = {}
+        self.query_index.remove(this_id)
 
         if this_id not in self._fully_loaded:
             self._fully_loaded[this_id] = obj
@@ -971,6 +1072,8 @@ class GangaRepositoryLocal(GangaRepository):
                 try:
                     # remove internal representation
                     self._internal_del__(this_id)
+                    self._index_store.remove(this_id)
+                    self._index_store.commit()
                     rmrf(os.path.dirname(fn) + ".index")
                 except OSError as err:
                     logger.debug("load unlink Error: %s" % err)
@@ -1066,7 +1169,6 @@ class GangaRepositoryLocal(GangaRepository):
 
         logger.debug("Finished 'load'-ing of: %s" % ids)
 
-
     def _handle_load_exception(self, err, fn, this_id, load_backup):
         """
         This method does a lot of the handling of an exception thrown from the load method
@@ -1104,6 +1206,9 @@ class GangaRepositoryLocal(GangaRepository):
             self.incomplete_objects.append(this_id)
             # remove index so we do not continue working with wrong
             # information
+            self.query_index.remove(this_id)
+            self._index_store.remove(this_id)
+            self._index_store.commit()
             rmrf(os.path.dirname(fn) + ".index")
             raise InaccessibleObjectError(self, this_id, err)
 
@@ -1119,12 +1224,16 @@ class GangaRepositoryLocal(GangaRepository):
             # First remove the index, so that it is gone if we later have a
             # KeyError
             fn = self.get_fn(this_id)
+            self._index_store.remove(this_id)
+            self._index_store.commit()
+            self.query_index.remove(this_id)
             try:
                 rmrf(os.path.dirname(fn) + ".index")
             except OSError as err:
                 logger.debug("Delete Error: %s" % err)
             self._internal_del__(this_id)
             rmrf(os.path.dirname(fn))
+            self._written_digests.pop(fn, None)
             if this_id in self._fully_loaded:
                 del self._fully_loaded[this_id]
             if this_id in self.objects:
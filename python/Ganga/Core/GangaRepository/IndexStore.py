@@ -0,0 +1,284 @@
+# This class (IndexStore) keeps the index cache of every object of a repository in a single append-only file.
+#
+# Each record in the file is a pickled tuple:
+#   (id, timestamp, category, classname, index_cache)
+# A record with a timestamp of None marks the id as deleted. The last record for an id wins.
+# Records are only ever appended, so other sessions can pick up changes by reading from
+# the last offset they have seen. When the file holds too many superseded records it is
+# compacted by writing a new file and renaming it over the old one.
+
+import os
+import errno
+import fcntl
+import time
+import threading
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from Ganga.Utility.logging import getLogger
+
+logger = getLogger()
+
+_store_header = ('GangaIndexStore', 1)
+
+
+class IndexStoreRecord(object):
+
+    """ The most recent index information stored for one object """
+
+    __slots__ = ('timestamp', 'category', 'classname', 'cache')
+
+    def __init__(self, timestamp, category, classname, cache):
+        self.timestamp = timestamp
+        self.category = category
+        self.classname = classname
+        self.cache = cache
+
+
+class IndexStore(object):
+
+    """
+    Single-file, append-only store of the index caches of all objects in a repository.
+    This replaces opening one '<id>.index' file per object on startup/refresh with a single sequential read.
+    """
+
+    def __init__(self, fn, locking=True, compact_ratio=2.0, compact_minimum=1000):
+        """
+        Args:
+            fn (str): Path of the file holding the store
+            locking (bool): Should fcntl locks be used to serialise writers from different sessions
+            compact_ratio (float): Compact the file when it holds this many records per live object
+            compact_minimum (int): Never compact a file holding fewer records than this
+        """
+        super(IndexStore, self).__init__()
+        self.fn = fn
+        self.locking = locking
+        self.compact_ratio = compact_ratio
+        self.compact_minimum = compact_minimum
+        self._records = {}
+        self._offset = 0
+        self._inode = None
+        self._n_records = 0
+        self._pending = []
+        self._lock = threading.RLock()
+
+    def __contains__(self, this_id):
+        return this_id in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def ids(self):
+        """ Returns the ids of all objects known to the store """
+        return self._records.keys()
+
+    def get(self, this_id):
+        """ Returns the IndexStoreRecord for this id or None if the store doesn't know about it
+        Args:
+            this_id (int): id of the object
+        """
+        return self._records.get(this_id)
+
+    def _lock_fd(self, fd, mode):
+        if self.locking:
+            fcntl.lockf(fd, mode)
+
+    def _unlock_fd(self, fd):
+        if self.locking:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+
+    def _apply(self, record, changed):
+        """ Apply a single record read from disk to the in-memory view
+        Args:
+            record (tuple): (id, timestamp, category, classname, cache)
+            changed (set): ids which were modified by this record are added here
+        """
+        this_id, timestamp, category, classname, cache = record
+        self._n_records += 1
+        if timestamp is None:
+            if self._records.pop(this_id, None) is not None:
+                changed.add(this_id)
+        else:
+            self._records[this_id] = IndexStoreRecord(timestamp, category, classname, cache)
+            changed.add(this_id)
+
+    def _read_from(self, fobj, offset, truncate=False):
+        """ Read all records from offset to the end of the file
+        A torn record at the end of the file (from a crashed writer) is ignored and,
+        if truncate is True (the exclusive lock is held), removed from the file
+        Args:
+            fobj (file): open file object of the store
+            offset (int): position at which to start reading
+            truncate (bool): Remove a torn trailing record
+        """
+        changed = set()
+        size = os.fstat(fobj.fileno()).st_size
+        fobj.seek(offset)
+        good_offset = offset
+        while good_offset < size:
+            try:
+                record = pickle.load(fobj)
+            except Exception as err:
+                logger.debug("IndexStore: torn or corrupt record in '%s' at %s: %s" % (self.fn, good_offset, err))
+                if truncate:
+                    logger.warning("Recovering index store '%s' after an interrupted write" % self.fn)
+                    fobj.truncate(good_offset)
+                break
+            if record != _store_header:
+                self._apply(record, changed)
+            good_offset = fobj.tell()
+        self._offset = good_offset
+        return changed
+
+    def _open(self, mode):
+        try:
+            return open(self.fn, mode)
+        except IOError as err:
+            if err.errno != errno.ENOENT:
+                raise
+        return None
+
+    def load(self):
+        """ (Re)read the whole store from disk
+        Returns the set of ids known to the store
+        """
+        with self._lock:
+            self._records = {}
+            self._offset = 0
+            self._n_records = 0
+            self._inode = None
+            fobj = self._open('rb')
+            if fobj is None:
+                return set()
+            with fobj:
+                self._lock_fd(fobj.fileno(), fcntl.LOCK_SH)
+                try:
+                    self._inode = os.fstat(fobj.fileno()).st_ino
+                    self._read_from(fobj, 0)
+                finally:
+                    self._unlock_fd(fobj.fileno())
+            return set(self._records.keys())
+
+    def refresh(self):
+        """ Read only the records appended by other sessions since the last read
+        Returns the set of ids which have been changed or deleted
+        """
+        with self._lock:
+            try:
+                st = os.stat(self.fn)
+            except OSError as err:
+                if err.errno != errno.ENOENT:
+                    raise
+                st = None
+            if st is None or st.st_ino != self._inode or st.st_size < self._offset:
+                # The file has been compacted (or removed) by someone else
+                old = self._records
+                new_ids = self.load()
+                return set(i for i in set(old.keys()) | new_ids if old.get(i) is None or
+                           self._records.get(i) is None or old[i].timestamp != self._records[i].timestamp)
+            if st.st_size == self._offset:
+                return set()
+            with open(self.fn, 'rb') as fobj:
+                self._lock_fd(fobj.fileno(), fcntl.LOCK_SH)
+                try:
+                    return self._read_from(fobj, self._offset)
+                finally:
+                    self._unlock_fd(fobj.fileno())
+
+    def put(self, this_id, category, classname, cache, timestamp=None):
+        """ Queue a new index record for this id, it is written to disk on commit()
+        Returns the timestamp of the record
+        Args:
+            this_id (int): id of the object
+            category (str): category of the object
+            classname (str): name of the class of the object
+            cache (dict): index cache of the object
+            timestamp (float): timestamp to store, defaults to now
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            self._pending.append((this_id, timestamp, category, classname, cache))
+        return timestamp
+
+    def remove(self, this_id):
+        """ Queue the removal of this id from the store, it is written to disk on commit()
+        Args:
+            this_id (int): id of the object
+        """
+        with self._lock:
+            self._pending.append((this_id, None, None, None, None))
+
+    def commit(self):
+        """ Append all pending records to the store with a single write
+        Returns the set of ids changed by other sessions which were picked up whilst appending
+        """
+        with self._lock:
+            if not self._pending:
+                return set()
+            pending, self._pending = self._pending, []
+            data = ''.join(pickle.dumps(r, pickle.HIGHEST_PROTOCOL) for r in pending)
+            while True:
+                fobj = open(self.fn, 'a+b')
+                with fobj:
+                    self._lock_fd(fobj.fileno(), fcntl.LOCK_EX)
+                    try:
+                        # Someone may have compacted the store whilst we were waiting for the lock
+                        try:
+                            if os.stat(self.fn).st_ino != os.fstat(fobj.fileno()).st_ino:
+                                continue
+                        except OSError as err:
+                            if err.errno != errno.ENOENT:
+                                raise
+                            continue
+                        inode = os.fstat(fobj.fileno()).st_ino
+                        if inode != self._inode:
+                            self._records = {}
+                            self._n_records = 0
+                            self._offset = 0
+                            self._inode = inode
+                        if self._offset == 0 and os.fstat(fobj.fileno()).st_size == 0:
+                            fobj.write(pickle.dumps(_store_header, pickle.HIGHEST_PROTOCOL))
+                            fobj.flush()
+                        # Catch up with other sessions, this also drops any torn trailing record
+                        others = self._read_from(fobj, self._offset, truncate=True)
+                        fobj.seek(0, os.SEEK_END)
+                        fobj.write(data)
+                        fobj.flush()
+                        os.fsync(fobj.fileno())
+                        self._read_from(fobj, self._offset)
+                    finally:
+                        self._unlock_fd(fobj.fileno())
+                return others
+
+    def needs_compaction(self):
+        """ Returns True if the file holds many more records than live objects """
+        return self._n_records > max(self.compact_minimum, self.compact_ratio * len(self._records))
+
+    def compact(self):
+        """ Rewrite the store holding only the most recent record for each live object """
+        with self._lock:
+            self.commit()
+            fobj = self._open('r+b')
+            if fobj is None:
+                return
+            with fobj:
+                self._lock_fd(fobj.fileno(), fcntl.LOCK_EX)
+                try:
+                    self._read_from(fobj, self._offset, truncate=True)
+                    new_fn = self.fn + '.new'
+                    with open(new_fn, 'wb') as new_f:
+                        pickler = pickle.Pickler(new_f, pickle.HIGHEST_PROTOCOL)
+                        pickler.dump(_store_header)
+                        for this_id, rec in sorted(self._records.iteritems()):
+                            pickler.clear_memo()
+                            pickler.dump((this_id, rec.timestamp, rec.category, rec.classname, rec.cache))
+                        new_f.flush()
+                        os.fsync(new_f.fileno())
+                    os.rename(new_fn, self.fn)
+                finally:
+                    self._unlock_fd(fobj.fileno())
+            self.load()
@@ -0,0 +1,103 @@
+# This class (QueryIndex) lets RegistrySlice.select() pick objects without looking at every one of them.
+#
+# For the objects of a repository which are not loaded, the values select() compares are in their index cache
+# (e.g. the status of a job or the name of the class of its backend). The QueryIndex keeps, for each such attribute,
+# the ids of the objects having each value, so a select() tests each distinct value once instead of every object,
+# and doesn't load an object just to find the class of one of its components.
+# It is updated whenever the repository reads the index cache of an object, and an object is dropped from it once it
+# is loaded, from then on its attributes in memory are what counts.
+
+import threading
+
+
+class QueryIndex(object):
+
+    """
+    Ids of the objects which aren't loaded, by the values in their index cache of the attributes select() can look up
+    """
+
+    def __init__(self, fields):
+        """
+        Args:
+            fields (dict): attribute name -> key of its value in the index cache, e.g. {'backend': 'class:backend'}
+        """
+        super(QueryIndex, self).__init__()
+        self.fields = dict(fields)
+        self._lock = threading.Lock()
+        # attribute -> value -> ids
+        self._ids_by_value = dict((attr, {}) for attr in self.fields)
+        # attribute -> ids whose index cache has no (hashable) value for it
+        self._unknown = dict((attr, set()) for attr in self.fields)
+        # id -> {attribute: value}
+        self._values = {}
+
+    def __contains__(self, this_id):
+        return this_id in self._values
+
+    def update(self, this_id, cache):
+        """ Index an object by its index cache
+        Args:
+            this_id (int): the id of the object
+            cache (dict): its index cache
+        """
+        with self._lock:
+            self._remove(this_id)
+            values = {}
+            for attr, key in self.fields.iteritems():
+                # The index cache may have been written by a version of Ganga which didn't store the value
+                if key not in cache:
+                    self._unknown[attr].add(this_id)
+                    continue
+                value = cache[key]
+                try:
+                    self._ids_by_value[attr].setdefault(value, set()).add(this_id)
+                except TypeError:
+                    self._unknown[attr].add(this_id)
+                    continue
+                values[attr] = value
+            self._values[this_id] = values
+
+    def remove(self, this_id):
+        """ Forget an object, because it has been loaded or deleted
+        Args:
+            this_id (int): the id of the object
+        """
+        with self._lock:
+            self._remove(this_id)
+
+    def _remove(self, this_id):
+        values = self._values.pop(this_id, None)
+        if values is None:
+            return
+        for attr in self.fields:
+            if attr in values:
+                ids = self._ids_by_value[attr][values[attr]]
+                ids.discard(this_id)
+                if not ids:
+                    del self._ids_by_value[attr][values[attr]]
+            else:
+                self._unknown[attr].discard(this_id)
+
+    def candidates(self, attr, matches):
+        """ Returns the ids of the indexed objects which may match, i.e. whose value matches or isn't known
+        Args:
+            attr (str): the attribute, one of self.fields
+            matches (function): tells whether a value of the attribute is selected
+        """
+        with self._lock:
+            ids = set(self._unknown[attr])
+            for value, value_ids in self._ids_by_value[attr].iteritems():
+                if matches(value):
+                    ids.update(value_ids)
+            return ids
+
+    def value(self, this_id, attr):
+        """ Returns (True, value) if the value of the attribute of an indexed object is known, (False, None) if not
+        Args:
+            this_id (int): the id of the object
+            attr (str): the attribute
+        """
+        values = self._values.get(this_id)
+        if values is None or attr not in values:
+            return False, None
+        return True, values[attr]
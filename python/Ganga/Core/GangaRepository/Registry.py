@@ -11,6 +11,7 @@ import time
 import threading
 
 from Ganga.Core.GangaThread.GangaThread import GangaThread
+from Ganga.Core.GangaRepository.FlushWriter import FlushWriter
 from Ganga.GPIDev.Lib.GangaList.GangaList import GangaList
 from Ganga.GPIDev.Base.Objects import GangaObject
 from Ganga.GPIDev.Schema import Schema, Version
@@ -279,7 +280,7 @@ class Registry(object):
     Base class providing a dict-like locked and lazy-loading interface to a Ganga repository
     """
 
-    __slots__ = ('name', 'doc', '_hasStarted', '_needs_metadata', 'metadata', '_read_lock', '_flush_lock', '_parent', 'repository', '_objects', '_incomplete_objects', 'flush_thread', 'type', 'location')
+    __slots__ = ('name', 'doc', '_hasStarted', '_needs_metadata', 'metadata', '_read_lock', '_flush_lock', '_parent', 'repository', '_objects', '_incomplete_objects', 'flush_thread', 'flush_writer', 'type', 'location', 'subjob_cache_stats')
 
     def __init__(self, name, doc):
         """Registry constructor, giving public name and documentation
@@ -302,6 +303,11 @@ class Registry(object):
         self._incomplete_objects = None
 
         self.flush_thread = None
+        # Writes the objects flushed with [Registry]AsyncFlush, see FlushWriter
+        self.flush_writer = None
+
+        # Counters of the subjob caches (SubJobXMLList) of the objects in this registry
+        self.subjob_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
 
     def hasStarted(self):
         """
@@ -486,15 +492,17 @@ class Registry(object):
             logger.debug('deleting the object %d from the registry %s', this_id, self.name)
             self.repository.delete([this_id])
 
-    @synchronised_flush_lock
-    def _flush(self, objs):
+    def _flush(self, objs, wait=True):
         """
-        Flush a set of objects to the persistency layer immediately
+        Flush a set of objects to the persistency layer
 
         Only those objects passed in will be flushed and only if they are dirty.
 
         Args:
             objs (list): a list of objects to flush
+            wait (bool): write the objects before returning, otherwise with [Registry]AsyncFlush they are handed over to
+                         the FlushWriter of the registry which writes them shortly afterwards from a thread of its own,
+                         without it they are left to the next auto-flush
         """
         # Too noisy
         #logger.debug("_flush")
@@ -505,6 +513,19 @@ class Registry(object):
         if self.hasStarted() is not True:
             raise RegistryAccessError("Cannot flush to a disconnected repository!")
 
+        if wait:
+            self._flush_now(objs)
+        elif self.flush_writer is not None and getConfig('Registry')['AsyncFlush']:
+            self.flush_writer.queue([obj for obj in objs if obj._dirty])
+
+    @synchronised_flush_lock
+    def _flush_now(self, objs):
+        """
+        Flush a set of objects to the persistency layer immediately, see _flush
+
+        Args:
+            objs (list): a list of objects to flush
+        """
         for obj in objs:
             # check if the object is dirty, if not do nothing
             if not obj._dirty:
@@ -521,12 +542,14 @@ class Registry(object):
 
     def flush_all(self):
         """
-        This will attempt to flush all the jobs in the registry.
-        It does this via ``_flush`` so the same conditions apply.
+        This will attempt to flush all the jobs in the registry immediately.
+        It does this via ``_flush_now`` so the same conditions apply.
         """
         if self.hasStarted():
+            if self.flush_writer is not None:
+                self.flush_writer.drain()
             for _obj in self.values():
-                self._flush(_obj)
+                self._flush_now([_obj])
 
         if self.metadata and self.metadata.hasStarted():
             self.metadata.flush_all()
@@ -604,6 +627,12 @@ class Registry(object):
         This can and should be overwritten by derived Registries to provide more index values."""
         return {}
 
+    def getIndexedAttributes(self):
+        """Returns {attribute: key in obj._index_cache} for the attributes select() can look up in the index cache of
+        objects which aren't loaded, see QueryIndex. Derived Registries which provide the values in getIndexCache
+        should overwrite this."""
+        return {}
+
     @synchronised_complete_lock
     def startup(self):
         """Connect the repository to the registry. Called from Repository_runtime.py"""
@@ -611,6 +640,7 @@ class Registry(object):
             self._hasStarted = True
             t0 = time.time()
             self.repository = makeRepository(self)
+            self.flush_writer = FlushWriter(self)
             self._objects = self.repository.objects
             self._incomplete_objects = self.repository.incomplete_objects
 
@@ -649,6 +679,9 @@ class Registry(object):
             self._hasStarted = True
             # NB flush_all by definition relies on both the metadata repo and the repo to be fully initialized
             try:
+                if self.flush_writer is not None:
+                    self.flush_writer.stop()
+                    self.flush_writer = None
                 self.flush_all()
             except Exception as err:
                 logger.error("Exception on flushing '%s' registry: %s", self.name, err)
@@ -676,6 +709,13 @@ class Registry(object):
         """Returns an informative string onFlush and disconnect the repository. Called from Repository_runtime.py """
         logger.debug("info")
         s = "registry '%s': %i objects" % (self.name, len(self._objects))
+        if self.subjob_cache_stats['hits'] or self.subjob_cache_stats['misses']:
+            s += ", subjob cache: %(hits)i hits, %(misses)i misses, %(evictions)i evictions" % self.subjob_cache_stats
+        write_stats = getattr(self.repository, 'write_stats', None)
+        if write_stats and (write_stats['written'] or write_stats['unchanged']):
+            s += ", %(written)i objects written, %(unchanged)i unchanged writes skipped" % write_stats
+        if self.flush_writer is not None and self.flush_writer.stats['queued']:
+            s += ", " + self.flush_writer.info()
         if full:
             other_sessions = self.repository.get_other_sessions()
             if len(other_sessions) > 0:
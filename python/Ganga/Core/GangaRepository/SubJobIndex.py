@@ -0,0 +1,200 @@
+# This class (SubJobIndex) holds the index caches of the subjobs of one master job (the content of subjobs.idx).
+#
+# The caches are stored column by column rather than as one dict per subjob:
+#   status    -> array of small integer codes, one per subjob (0 means there is no entry for the subjob)
+#   modified  -> array of doubles
+#   any other key of the cache -> list of values
+# and the indexes of the subjobs are kept grouped by status. Asking which subjobs are in a given status or how many
+# subjobs there are in each status therefore doesn't walk through every subjob.
+# The class behaves like the {index: cache} dict it replaces so existing code keeps working.
+
+from array import array
+
+
+class _Missing(object):
+
+    """ Marker for a key which isn't in the cache of a subjob """
+
+    def __reduce__(self):
+        return '_MISSING'
+
+    def __repr__(self):
+        return '_MISSING'
+
+_MISSING = _Missing()
+
+
+class SubJobIndex(object):
+
+    """
+    Column store of the index caches of subjobs
+    """
+
+    def __init__(self, caches=None):
+        """
+        Args:
+            caches (dict): optional {index: cache} to start from, entries which are None are ignored
+        """
+        super(SubJobIndex, self).__init__()
+        self._length = 0
+        # status name <-> code, code 0 is reserved for subjobs without an entry
+        self._status_names = [None]
+        self._status_codes = {}
+        self._status = array('B')
+        self._modified = array('d')
+        # key -> list of values
+        self._columns = {}
+        # status code -> set of indexes
+        self._by_status = {}
+        if caches:
+            self.update(caches)
+
+    def __getstate__(self):
+        return {'length': self._length,
+                'status_names': self._status_names,
+                'status': self._status.tostring(),
+                'modified': self._modified.tostring(),
+                'columns': self._columns}
+
+    def __setstate__(self, state):
+        self._length = state['length']
+        self._status_names = state['status_names']
+        self._status_codes = dict((name, code) for code, name in enumerate(self._status_names) if code)
+        self._status = array('B')
+        self._status.fromstring(state['status'])
+        self._modified = array('d')
+        self._modified.fromstring(state['modified'])
+        self._columns = state['columns']
+        self._by_status = {}
+        for index, code in enumerate(self._status):
+            if code:
+                self._by_status.setdefault(code, set()).add(index)
+
+    def _grow(self, index):
+        """ Make room for the entry of a subjob
+        Args:
+            index (int): index of the subjob
+        """
+        extra = index + 1 - len(self._status)
+        if extra <= 0:
+            return
+        self._status.extend([0] * extra)
+        self._modified.extend([0.] * extra)
+        for column in self._columns.itervalues():
+            column.extend([_MISSING] * extra)
+
+    def _getCode(self, status):
+        """ Returns the code used for a status, allocating one for a status never seen before
+        Args:
+            status (str): name of the status
+        """
+        code = self._status_codes.get(status)
+        if code is None:
+            code = len(self._status_names)
+            if code > 255:
+                raise ValueError("Too many different subjob statuses in the index")
+            self._status_names.append(status)
+            self._status_codes[status] = code
+        return code
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, index):
+        return 0 <= index < len(self._status) and self._status[index] != 0
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        """ Returns the indexes of the subjobs with an entry """
+        return [index for index, code in enumerate(self._status) if code]
+
+    def __getitem__(self, index):
+        """ Returns the cache of a subjob as a dict
+        Args:
+            index (int): index of the subjob
+        """
+        if index not in self:
+            raise KeyError(index)
+        cache = {'status': self._status_names[self._status[index]], 'modified': self._modified[index]}
+        for key, column in self._columns.iteritems():
+            value = column[index]
+            if value is not _MISSING:
+                cache[key] = value
+        if cache['modified'] != cache['modified']:
+            # NaN marks a cache without a modification time
+            del cache['modified']
+        return cache
+
+    def get(self, index, default=None):
+        try:
+            return self[index]
+        except KeyError:
+            return default
+
+    def __setitem__(self, index, cache):
+        """ Store the cache of a subjob
+        Args:
+            index (int): index of the subjob
+            cache (dict): index cache of the subjob, it must contain 'status'
+        """
+        if index < 0:
+            raise KeyError(index)
+        self._grow(index)
+        old_code = self._status[index]
+        new_code = self._getCode(cache['status'])
+        if old_code:
+            self._by_status[old_code].discard(index)
+        else:
+            self._length += 1
+        self._status[index] = new_code
+        self._by_status.setdefault(new_code, set()).add(index)
+        modified = cache.get('modified')
+        self._modified[index] = float('nan') if modified is None else modified
+        for key, column in self._columns.iteritems():
+            column[index] = cache.get(key, _MISSING)
+        for key, value in cache.iteritems():
+            if key not in ('status', 'modified') and key not in self._columns:
+                column = [_MISSING] * len(self._status)
+                column[index] = value
+                self._columns[key] = column
+
+    def update(self, caches):
+        """ Store the caches of several subjobs
+        Args:
+            caches (dict): {index: cache}, entries which are None are ignored
+        """
+        for index, cache in caches.iteritems():
+            if cache is not None:
+                self[index] = cache
+
+    def getStatus(self, index):
+        """ Returns the status of a subjob or None if it has no entry
+        Args:
+            index (int): index of the subjob
+        """
+        if index not in self:
+            return None
+        return self._status_names[self._status[index]]
+
+    def getAllStatus(self):
+        """ Returns the list of the status of every subjob, None for subjobs without an entry """
+        names = self._status_names
+        return [names[code] for code in self._status]
+
+    def getIndexesWithStatus(self, statuses):
+        """ Returns the sorted list of indexes of the subjobs in one of the given statuses
+        Args:
+            statuses (list): names of the statuses
+        """
+        indexes = set()
+        for status in statuses:
+            code = self._status_codes.get(status)
+            if code is not None:
+                indexes.update(self._by_status.get(code, ()))
+        return sorted(indexes)
+
+    def getStatusCounts(self):
+        """ Returns {status: number of subjobs} for the statuses of the subjobs with an entry """
+        return dict((self._status_names[code], len(indexes)) for code, indexes in self._by_status.iteritems() if indexes)
@@ -1,14 +1,21 @@
 from Ganga.GPIDev.Schema.Schema import Schema, SimpleItem, Version
 from Ganga.GPIDev.Base.Objects import GangaObject
 from Ganga.Utility.logging import getLogger
+from Ganga.Utility.Config import getConfig
 from Ganga.Core.GangaRepository.GangaRepository import RepositoryError
 from Ganga.Core.exceptions import GangaException
 from Ganga.GPIDev.Base.Proxy import stripProxy
 from Ganga.Core.GangaRepository.VStreamer import XMLFileError
+from Ganga.Core.GangaRepository.WriteAheadLog import WriteAheadLog
+from Ganga.Core.GangaRepository.SubJobIndex import SubJobIndex
+from cStringIO import StringIO
 import errno
 import copy
 import threading
+import itertools
+import weakref
 import shutil
+import os
 from os import listdir, path, stat
 
 logger = getLogger()
@@ -49,6 +56,9 @@ class SubJobXMLList(GangaObject):
 
     _schema = Schema(Version(1, 0), {})
 
+    # Name of the write-ahead log holding subjob changes not yet copied into the subjob data files
+    _subjob_wal_name = "subjobs.wal"
+
     def __init__(self, jobDirectory='', registry=None, dataFileName='data', load_backup=False, parent=None):
         """ Constructor for SubjobXMLList
         Args:
@@ -63,6 +73,7 @@ class SubJobXMLList(GangaObject):
         self._jobDirectory = jobDirectory
         self._registry = registry
         self._cachedJobs = {}
+        self._initSubJobCache()
 
         self._dataFileName = dataFileName
         self._load_backup = load_backup
@@ -71,10 +82,14 @@ class SubJobXMLList(GangaObject):
 
         self._subjob_master_index_name = "subjobs.idx"
 
+        self._wal = None
+
         if jobDirectory == '' and registry is None:
             return
 
-        self._subjobIndexData = {}
+        self._wal = WriteAheadLog(path.join(jobDirectory, SubJobXMLList._subjob_wal_name))
+
+        self._subjobIndexData = SubJobIndex()
         if parent:
             self._setParent(parent)
         self.load_subJobIndex()
@@ -101,18 +116,32 @@ class SubJobXMLList(GangaObject):
         obj._load_backup = copy.deepcopy(self._load_backup, memo)
         obj._cached_filenames = copy.deepcopy(self._cached_filenames, memo)
         obj._stored_len = copy.deepcopy(self._stored_len, memo)
+        obj._wal = self._wal
 
         ## Manually define unsafe/uncopyable objects
         obj._definedParent = None
         obj._cachedJobs = {}
+        obj._initSubJobCache()
         return obj
 
+    def _initSubJobCache(self):
+        """Set up the bookkeeping needed to drop the least recently used subjobs from memory"""
+        # index -> value of _accessCounter when the subjob was last requested
+        self._lastAccess = {}
+        self._accessCounter = itertools.count()
+        # index -> estimated size of the subjob (size of its data on disk)
+        self._cachedSizes = {}
+        # Subjobs dropped from the cache which may still be referenced from elsewhere, they must be re-used
+        # rather than loaded again so that there is never more than one copy of a subjob
+        self._evictedJobs = weakref.WeakValueDictionary()
+
     def _reset_cachedJobs(self, obj):
         """Hard reset function. Not really to be used externally without great care
         Args:
             obj (dict): This is the new dictonary of subjob Job objects with sequential integer keys
         """
         self._cachedJobs = obj
+        self._initSubJobCache()
 
     def isLoaded(self, subjob_id):
         """Has the subjob been loaded? True/False
@@ -137,7 +166,7 @@ class SubJobXMLList(GangaObject):
                     self._setDirty()
 
                 if self._subjobIndexData is None:
-                    self._subjobIndexData = {}
+                    self._subjobIndexData = SubJobIndex()
                 else:
                     for subjob_id in self._subjobIndexData:
                         index_data = self._subjobIndexData.get(subjob_id)
@@ -162,19 +191,31 @@ class SubJobXMLList(GangaObject):
                             self._subjobIndexData[subjob_id] = new_data
                             continue
                         #self._subjobIndexData = {}
+                    if not isinstance(self._subjobIndexData, SubJobIndex):
+                        # Index written as one dict per subjob, it's stored by column the next time it's written
+                        self._subjobIndexData = SubJobIndex(self._subjobIndexData)
             except Exception as err:
                 logger.debug( "Subjob Index file open, error: %s" % err )
-                self._subjobIndexData = {}
+                self._subjobIndexData = SubJobIndex()
                 self._setDirty()
             finally:
                 if index_file_obj is not None:
                     index_file_obj.close()
                 if self._subjobIndexData is None:
-                    self._subjobIndexData = {}
+                    self._subjobIndexData = SubJobIndex()
         else:
             self._setDirty()
+        self._loadWriteAheadLog()
         return
 
+    def _loadWriteAheadLog(self):
+        """Pick up the subjob changes in the write-ahead log which haven't been copied into the data files yet"""
+        try:
+            if self._wal.load():
+                self._subjobIndexData.update(self._wal.caches())
+        except (IOError, OSError) as err:
+            logger.warning("Could not read the subjob log of job %s: %s" % (self.getMasterID(), err))
+
     def write_subJobIndex(self, ignore_disk=False):
         """interface for writing the index which captures errors and alerts the user vs throwing uncaught exception
         Args:
@@ -193,7 +234,7 @@ class SubJobXMLList(GangaObject):
             ignore_disk (bool): Optional flag to force the class to ignore all on-disk data when flushing
         """
 
-        all_caches = {}
+        all_caches = SubJobIndex()
         if ignore_disk:
             range_limit = self._cachedJobs.keys()
         else:
@@ -202,17 +243,18 @@ class SubJobXMLList(GangaObject):
         for sj_id in range_limit:
             if sj_id in self._cachedJobs:
                 this_cache = self._registry.getIndexCache(self.__getitem__(sj_id))
-                all_caches[sj_id] = this_cache
                 disk_location = self.__get_dataFile(sj_id)
-                all_caches[sj_id]['modified'] = stat(disk_location).st_ctime
+                this_cache['modified'] = stat(disk_location).st_ctime
+                all_caches[sj_id] = this_cache
+                self._subjobIndexData[sj_id] = this_cache
             else:
                 if sj_id in self._subjobIndexData:
                     all_caches[sj_id] = self._subjobIndexData[sj_id]
                 else:
                     this_cache = self._registry.getIndexCache(self.__getitem__(sj_id))
-                    all_caches[sj_id] = this_cache
                     disk_location = self.__get_dataFile(sj_id)
-                    all_caches[sj_id]['modified'] = stat(disk_location).st_ctime
+                    this_cache['modified'] = stat(disk_location).st_ctime
+                    all_caches[sj_id] = this_cache
 
         try:
             from Ganga.Core.GangaRepository.PickleStreamer import to_file
@@ -314,6 +356,18 @@ class SubJobXMLList(GangaObject):
             fqid = "unknown"
         return fqid
 
+    def _isBinary(self):
+        """ Are the subjobs stored in the binary rather than the XML format? """
+        return getattr(getattr(self._registry, 'repository', None), 'binary_format', False)
+
+    def _getStreamers(self):
+        """ Returns the to_file and from_file methods used for the subjob data files of this repository """
+        if self._isBinary():
+            from Ganga.Core.GangaRepository.BinaryStreamer import to_file, from_file
+        else:
+            from Ganga.Core.GangaRepository.VStreamer import to_file, from_file
+        return to_file, from_file
+
     def _loadSubJobFromDisk(self, subjob_data):
         """Load the subjob file 'subjob_data' from disk. No Parsing
         Args:
@@ -361,23 +415,47 @@ class SubJobXMLList(GangaObject):
         """
         logger.debug("Requesting subjob: #%s" % index)
 
-        if index not in self._cachedJobs:
-
-            logger.debug("Attempting to load subjob: #%s from disk" % index)
+        self._lastAccess[index] = next(self._accessCounter)
+        stats = getattr(self._registry, 'subjob_cache_stats', {'hits': 0, 'misses': 0, 'evictions': 0})
 
-            # obtain a lock to make sure multiple loads of the same object don't happen
-            with self._load_lock:
+        try:
+            cached_sj = self._cachedJobs[index]
+        except KeyError:
+            pass
+        else:
+            stats['hits'] += 1
+            return cached_sj
 
-                # just make sure we haven't loaded this object already while waiting on the lock
-                if index in self._cachedJobs:
-                    return self._cachedJobs[index]
+        logger.debug("Attempting to load subjob: #%s from disk" % index)
 
-                has_loaded_backup = False
+        # obtain a lock to make sure multiple loads of the same object don't happen
+        with self._load_lock:
 
-                # Now try to load the subjob
-                if len(self) < index:
-                    raise GangaException("Subjob: %s does NOT exist" % index)
-                subjob_data = self.__get_dataFile(str(index))
+            # just make sure we haven't loaded this object already while waiting on the lock
+            if index in self._cachedJobs:
+                stats['hits'] += 1
+                return self._cachedJobs[index]
+
+            # A subjob which was dropped from the cache but is still in use elsewhere
+            evicted_sj = self._evictedJobs.pop(index, None)
+            if evicted_sj is not None:
+                stats['hits'] += 1
+                self._cachedJobs[index] = evicted_sj
+                return evicted_sj
+
+            stats['misses'] += 1
+
+            has_loaded_backup = False
+
+            # Now try to load the subjob
+            if len(self) < index:
+                raise GangaException("Subjob: %s does NOT exist" % index)
+            subjob_data = self.__get_dataFile(str(index))
+            # The write-ahead log holds the most recent version of a subjob
+            wal_data = self._wal.read(index) if self._wal is not None else None
+            if wal_data is not None:
+                sj_file = StringIO(wal_data)
+            else:
                 try:
                     sj_file = self._loadSubJobFromDisk(subjob_data)
                 except (XMLFileError, IOError) as x:
@@ -395,32 +473,82 @@ class SubJobXMLList(GangaObject):
                         else:
                             raise RepositoryError(self,"IOError on loading subobject %s: %s" % (index, x))
 
-                from Ganga.Core.GangaRepository.VStreamer import from_file
+            to_file, from_file = self._getStreamers()
+            lazy_attributes = getConfig('Configuration')['lazyXMLAttributes']
+
+            # load the subobject into a temporary object
+            try:
+                loaded_sj = from_file(sj_file, lazy_attributes)[0]
+            except (IOError, XMLFileError) as err:
 
-                # load the subobject into a temporary object
                 try:
-                    loaded_sj = from_file(sj_file)[0]
+                    logger.warning("Loading subjob #%s for job #%s from backup, recent changes may be lost" % (index, self.getMasterID()))
+                    subjob_data = self.__get_dataFile(str(index), True)
+                    sj_file = self._loadSubJobFromDisk(subjob_data)
+                    loaded_sj = from_file(sj_file, lazy_attributes)[0]
+                    has_loaded_backup = True
                 except (IOError, XMLFileError) as err:
+                    logger.debug("Failed to Load XML for job: %s using: %s" % (index, subjob_data))
+                    logger.debug("Err:\n%s" % err)
+                    raise
 
-                    try:
-                        logger.warning("Loading subjob #%s for job #%s from backup, recent changes may be lost" % (index, self.getMasterID()))
-                        subjob_data = self.__get_dataFile(str(index), True)
-                        sj_file = self._loadSubJobFromDisk(subjob_data)
-                        loaded_sj = from_file(sj_file)[0]
-                        has_loaded_backup = True
-                    except (IOError, XMLFileError) as err:
-                        logger.debug("Failed to Load XML for job: %s using: %s" % (index, subjob_data))
-                        logger.debug("Err:\n%s" % err)
-                        raise
+            loaded_sj._setParent( self._definedParent )
+            if has_loaded_backup:
+                loaded_sj._setDirty()
+            else:
+                loaded_sj._setFlushed()
 
-                loaded_sj._setParent( self._definedParent )
-                if has_loaded_backup:
-                    loaded_sj._setDirty()
-                else:
-                    loaded_sj._setFlushed()
-                self._cachedJobs[index] = loaded_sj
+            if wal_data is not None:
+                self._cachedSizes[index] = len(wal_data)
+            else:
+                try:
+                    self._cachedSizes[index] = os.fstat(sj_file.fileno()).st_size
+                except (AttributeError, OSError):
+                    self._cachedSizes[index] = 0
+            self._cachedJobs[index] = loaded_sj
+            self._evictSubJobs(index)
+
+        return loaded_sj
+
+    def _evictSubJobs(self, keep_index):
+        """Drop the least recently used subjobs from memory if there are more of them than allowed by
+        [Registry]SubjobCacheMaxCount/SubjobCacheMaxSize. Only subjobs which haven't been modified and aren't
+        being used by another thread are dropped, their index cache is kept and they are re-loaded when needed.
+        Must be called holding _load_lock
+        Args:
+            keep_index (int): index of a subjob which is never dropped (the one just loaded)
+        """
+        max_count = getConfig('Registry')['SubjobCacheMaxCount']
+        max_size = getConfig('Registry')['SubjobCacheMaxSize']
+
+        cached_size = sum(self._cachedSizes.get(i, 0) for i in self._cachedJobs) if max_size else 0
+        if not ((max_count and len(self._cachedJobs) > max_count) or (max_size and cached_size > max_size)):
+            return
 
-        return self._cachedJobs[index]
+        # Make some room rather than evicting one subjob on every load
+        target_count = int(max_count * 0.9)
+        target_size = int(max_size * 0.9)
+        stats = getattr(self._registry, 'subjob_cache_stats', {'hits': 0, 'misses': 0, 'evictions': 0})
+
+        for index in sorted(self._cachedJobs.keys(), key=lambda i: self._lastAccess.get(i, -1)):
+            if (not max_count or len(self._cachedJobs) <= target_count) and (not max_size or cached_size <= target_size):
+                break
+            if index == keep_index:
+                continue
+            subjob_obj = self._cachedJobs[index]
+            if subjob_obj._dirty:
+                continue
+            if not subjob_obj._lock.acquire(False):
+                continue
+            try:
+                if self._registry is not None:
+                    self._subjobIndexData[index] = self._registry.getIndexCache(subjob_obj)
+                del self._cachedJobs[index]
+                self._evictedJobs[index] = subjob_obj
+            finally:
+                subjob_obj._lock.release()
+            cached_size -= self._cachedSizes.pop(index, 0)
+            stats['evictions'] += 1
 
     def _setParent(self, parentObj):
         """Set the parent of self and any objects in memory we control
@@ -485,32 +613,87 @@ class SubJobXMLList(GangaObject):
         """
         Returns the cached statuses of the subjobs whilst respecting the Lazy loading
         """
-        sj_statuses = []
         if len(self._subjobIndexData) == len(self):
-            for i in range(len(self)):
-                if self.isLoaded(i):
-                    sj_statuses.append(self.__getitem__(i).status)
-                else:
-                    sj_statuses.append(self._subjobIndexData[i]['status'])
+            sj_statuses = self._subjobIndexData.getAllStatus()[:len(self)]
+            for i, subjob_obj in self._cachedJobs.items():
+                if i < len(sj_statuses):
+                    sj_statuses[i] = subjob_obj.status
         else:
+            sj_statuses = []
             for i in range(len(self)):
                 sj_statuses.append(self.__getitem__(i).status)
         return sj_statuses
 
+    def getSJStatusCounts(self):
+        """
+        Returns {status: number of subjobs} whilst respecting the Lazy loading.
+        Only the subjobs in memory are looked at individually, the rest comes from the index
+        """
+        if len(self._subjobIndexData) != len(self):
+            counts = {}
+            for status in self.getAllSJStatus():
+                counts[status] = counts.get(status, 0) + 1
+            return counts
+
+        counts = self._subjobIndexData.getStatusCounts()
+        for i, subjob_obj in self._cachedJobs.items():
+            old_status = self._subjobIndexData.getStatus(i)
+            new_status = subjob_obj.status
+            if old_status == new_status:
+                continue
+            if old_status is not None:
+                counts[old_status] -= 1
+                if not counts[old_status]:
+                    del counts[old_status]
+            counts[new_status] = counts.get(new_status, 0) + 1
+        return counts
+
+    def getSJIdsWithStatus(self, statuses):
+        """
+        Returns the sorted ids of the subjobs in one of the given statuses whilst respecting the Lazy loading.
+        Only the subjobs in memory are looked at individually, the rest comes from the index
+        Args:
+            statuses (list): names of the statuses we're interested in
+        """
+        if len(self._subjobIndexData) != len(self):
+            return [i for i, status in enumerate(self.getAllSJStatus()) if status in statuses]
+
+        sj_ids = set(self._subjobIndexData.getIndexesWithStatus(statuses))
+        for i, subjob_obj in self._cachedJobs.items():
+            ## SJ may have changed from cache in memory
+            if subjob_obj.status in statuses:
+                sj_ids.add(i)
+            else:
+                sj_ids.discard(i)
+        return sorted(sj_ids)
+
     def flush(self, ignore_disk=False):
         """Flush all subjobs to disk using XML methods
+        If the write-ahead log is in use the subjobs which already exist on disk are appended to it with a single write
         Args:
             ignore_disk (bool): Optional flag to force the class to ignore all on-disk data when flushing
         """
-        from Ganga.Core.GangaRepository.GangaRepositoryXML import safe_save
+        from Ganga.Core.GangaRepository.GangaRepositoryXML import safe_save, check_app_hash
 
-        from Ganga.Core.GangaRepository.VStreamer import to_file
+        to_file = self._getStreamers()[0]
+
+        wal_enabled = getConfig('Registry')['SubjobWriteAheadLog']
+        # Once there is a log every change has to go through it, otherwise an older record would win
+        use_wal = self._wal is not None and (wal_enabled or len(self._wal) > 0)
 
         if ignore_disk:
             range_limit = self._cachedJobs.keys()
         else:
             range_limit = range(len(self))
 
+        # Subjobs dropped from the cache may have been modified through a reference held elsewhere
+        for index, subjob_obj in self._evictedJobs.items():
+            if subjob_obj._dirty and index not in self._cachedJobs:
+                self._cachedJobs[index] = subjob_obj
+                self._evictedJobs.pop(index, None)
+
+        wal_records = []
+        direct_writes = 0
         for index in range_limit:
             if index in self._cachedJobs:
                 ## If it ain't dirty skip it
@@ -523,9 +706,48 @@ class SubJobXMLList(GangaObject):
                 if subjob_obj is subjob_obj._getRoot():
                     raise GangaException(self, "Subjob parent not set correctly in flush.")
 
-                safe_save( subjob_data, subjob_obj, to_file )
+                if use_wal and path.isfile(path.join(self._jobDirectory, str(index), self._dataFileName)):
+                    check_app_hash(subjob_obj)
+                    sio = StringIO()
+                    to_file(subjob_obj, sio, '')
+                    wal_records.append((index, sio.getvalue(), self._registry.getIndexCache(subjob_obj)))
+                else:
+                    safe_save( subjob_data, subjob_obj, to_file )
+                    direct_writes += 1
+
+        if wal_records:
+            self._wal.append(wal_records)
+            for index, _data, cache in wal_records:
+                self._subjobIndexData[index] = cache
+
+        if use_wal and (not wal_enabled or self._wal.size() > getConfig('Registry')['SubjobWriteAheadLogMaxSize']):
+            self.compactWriteAheadLog()
+        elif direct_writes or not wal_records:
+            self.write_subJobIndex(ignore_disk)
+
+    def compactWriteAheadLog(self):
+        """Copy the latest version of each subjob in the write-ahead log into its data file, rewrite the index and remove the log
+        This must only be called by the session holding the lock on the master job"""
+        from Ganga.Core.GangaRepository.GangaRepositoryXML import safe_write_data
 
-        self.write_subJobIndex(ignore_disk)
+        if self._wal is None or len(self._wal) == 0:
+            return
+
+        logger.debug("Compacting the subjob log of job %s (%s subjobs)" % (self.getMasterID(), len(self._wal)))
+        for index in sorted(self._wal.indexes()):
+            data = self._wal.read(index)
+            if data is not None:
+                safe_write_data(path.join(self._jobDirectory, str(index), self._dataFileName), data)
+        self.write_subJobIndex()
+        self._wal.clear()
+
+    @staticmethod
+    def removeWriteAheadLog(jobDirectory):
+        """Remove the write-ahead log of a job whose subjobs are all being written out to their data files
+        Args:
+            jobDirectory (str): dir on disk which contains subjob folders
+        """
+        WriteAheadLog(path.join(jobDirectory, SubJobXMLList._subjob_wal_name)).clear()
 
     def _setFlushed(self):
         """ Like Node only descend into objects which aren't in the Schema"""
@@ -10,7 +10,7 @@ from Ganga.Utility.Config import config_scope
 
 from Ganga.Utility.Plugin import PluginManagerError, allPlugins
 
-from Ganga.GPIDev.Base.Objects import GangaObject, ObjectMetaclass
+from Ganga.GPIDev.Base.Objects import GangaObject, ObjectMetaclass, LazyValue
 from Ganga.GPIDev.Schema import Schema, Version
 from Ganga.GPIDev.Lib.GangaList.GangaList import makeGangaList
 
@@ -18,6 +18,8 @@ from .GangaRepository import SchemaVersionError
 
 import xml.sax.saxutils
 import copy
+import os
+import re
 from cStringIO import StringIO
 
 logger = getLogger()
@@ -83,17 +85,28 @@ def to_file(j, fobj=None, ignore_subs=[]):
 # * AssertionError (corruption: multiple objects in <root>...</root>
 # * Exception (probably corrupted data problem)
 
-def _raw_from_file(f):
+def _raw_from_file(f, lazy_attributes=()):
     # logger.debug('----------------------------')
     ###logger.debug('Parsing file: %s',f.name)
+    source = None
+    if lazy_attributes:
+        try:
+            source = (f.name, _file_identity(os.fstat(f.fileno())))
+        except (AttributeError, IOError, OSError):
+            # Not a real file, we can't come back to it later
+            source = None
     xml_content = f.read()
-    obj, errors = Loader().parse(xml_content)
+    if source is None:
+        obj, errors = Loader().parse(xml_content)
+    else:
+        obj, errors = Loader().parse(xml_content, source, lazy_attributes)
     return obj, errors
 
-def from_file(f):
+# lazy_attributes: names of attributes of the root object which are not parsed until they're first accessed
+def from_file(f, lazy_attributes=()):
     #return _raw_from_file(f)
     try:
-        return _raw_from_file(f)
+        return _raw_from_file(f, lazy_attributes)
     except Exception as err:
         logger.error("XML from-file error for file:\n%s" % err)
         raise XMLFileError(err, "from-file error")
@@ -254,6 +267,109 @@ class VStreamer(object):
             self.level -= 1
 
 
+##########################################################################
+# Deferred loading of attributes.
+#
+# The <attribute> elements of the root object named in lazy_attributes are cut out of the
+# XML before it is parsed and replaced by a LazyXMLAttribute holding the byte range of the
+# element in the file. On first access the range is read back and parsed on its own.
+
+# The XML written by VStreamer escapes '<' in values so these only match real elements
+_attribute_tag_re = re.compile(r'<attribute name="([^"]*)">|</attribute>')
+
+
+def _file_identity(st):
+    return (st.st_ino, st.st_size, st.st_mtime)
+
+
+def _find_root_attributes(s, names):
+    """ Returns {name: (start, end)}, the byte ranges of the <attribute> elements with these names
+    which belong to the root object of the XML string s
+    Args:
+        s (str): XML as written by VStreamer
+        names (list): names of the attributes of interest
+    """
+    found = {}
+    depth = 0
+    current = None
+    for match in _attribute_tag_re.finditer(s):
+        this_name = match.group(1)
+        if this_name is not None:
+            depth += 1
+            if depth == 1 and this_name in names:
+                current = (this_name, match.start())
+        else:
+            depth -= 1
+            if depth == 0 and current is not None:
+                found[current[0]] = (current[1], match.end())
+                current = None
+    return found
+
+
+class LazyXMLAttribute(LazyValue):
+
+    """ Placeholder for an attribute of a loaded object whose XML hasn't been parsed yet """
+
+    __slots__ = ('name', 'fn', 'identity', 'start', 'end')
+
+    def __init__(self, name, fn, identity, start, end):
+        """
+        Args:
+            name (str): name of the attribute
+            fn (str): file the object was loaded from
+            identity (tuple): (inode, size, mtime) of the file when it was loaded
+            start (int): offset of the <attribute> element in the file
+            end (int): offset of the end of the </attribute> element in the file
+        """
+        super(LazyXMLAttribute, self).__init__()
+        self.name = name
+        self.fn = fn
+        self.identity = identity
+        self.start = start
+        self.end = end
+
+    def _read_fragment(self):
+        """ Returns the XML of the <attribute> element from the file it was loaded from.
+        The repository renames the old data file to a backup when saving an object, so look there as well.
+        If neither is the file we loaded from it has been rewritten since, and what it holds now may not go with the
+        rest of the object, so fail rather than mix the two """
+        for fn in (self.fn, self.fn + '~'):
+            try:
+                with open(fn, 'r') as f:
+                    if _file_identity(os.fstat(f.fileno())) == self.identity:
+                        f.seek(self.start)
+                        return f.read(self.end - self.start)
+            except IOError:
+                pass
+        raise XMLFileError(None, "'%s' has changed since it was loaded, attribute '%s' can't be read, reload the object"
+                           % (self.fn, self.name))
+
+    def materialise(self):
+        try:
+            value, errors = Loader().parse_attribute(self._read_fragment())
+        except XMLFileError:
+            raise
+        except Exception as err:
+            logger.error("XML lazy-load error for attribute '%s' of file '%s':\n%s" % (self.name, self.fn, err))
+            raise XMLFileError(err, "lazy-load error")
+        if errors:
+            raise XMLFileError(errors[0], "lazy-load error for attribute '%s' of file '%s'" % (self.name, self.fn))
+        return value
+
+    def __repr__(self):
+        return "<LazyXMLAttribute %s of '%s' [%s:%s]>" % (self.name, self.fn, self.start, self.end)
+
+
+class _AttributeHolder(object):
+
+    """ Stands in for the parent object when parsing a single deferred <attribute> element """
+
+    def __init__(self):
+        self.value = None
+
+    def setSchemaAttribute(self, attrib_name, attrib_value):
+        self.value = attrib_value
+
 ##########################################################################
 # XML Parser.
 
@@ -287,8 +403,58 @@ class Loader(object):
         # buffer for building sequences (FIXME: what about nested sequences?)
         self.sequence_start = []
 
-    def parse(self, s):
+    def parse(self, s, source=None, lazy_attributes=()):
         """ Parse and load object from string s using internal XML parser (expat).
+        Args:
+            s (str): The XML to be parsed
+            source (tuple): (filename, identity) of the file s was read from, needed for lazy_attributes
+            lazy_attributes (list): names of attributes of the root object whose parsing is deferred until first access
+        """
+        deferred = {}
+        if source is not None and lazy_attributes:
+            deferred = _find_root_attributes(s, lazy_attributes)
+            if deferred:
+                pieces = []
+                last = 0
+                for start, end in sorted(deferred.values()):
+                    pieces.append(s[last:start])
+                    last = end
+                pieces.append(s[last:])
+                s = ''.join(pieces)
+
+        self._parse_xml(s)
+
+        if len(self.stack) != 1:
+            self.errors.append(AssertionError('multiple objects inside <root> element'))
+
+        obj = self.stack[-1]
+
+        if not self.errors:
+            for name, (start, end) in deferred.iteritems():
+                obj.setSchemaAttribute(name, LazyXMLAttribute(name, source[0], source[1], start, end))
+
+        #logger.info("obj.__dict__: %s" % obj.__dict__)
+
+        # Raise Exception if object is incomplete
+        for attr, item in obj._schema.allItems():
+            if attr not in deferred and not hasattr(obj, attr):
+                raise AssertionError("incomplete XML file")
+        return obj, self.errors
+
+    def parse_attribute(self, s):
+        """ Parse a single <attribute> element, as deferred by parse(), and return its value and the errors
+        Args:
+            s (str): The XML of the <attribute> element
+        """
+        holder = _AttributeHolder()
+        self.stack = [holder]
+        self._parse_xml(s)
+        if len(self.stack) != 1:
+            self.errors.append(AssertionError('multiple objects inside <attribute> element'))
+        return holder.value, self.errors
+
+    def _parse_xml(self, s):
+        """ Run expat over the string s building up the object stack
         """
         import xml.parsers.expat
 
@@ -438,16 +604,3 @@ class Loader(object):
 
         p.Parse(s)
 
-        if len(self.stack) != 1:
-            self.errors.append(AssertionError('multiple objects inside <root> element'))
-
-        obj = self.stack[-1]
-
-        #logger.info("obj.__dict__: %s" % obj.__dict__)
-
-        # Raise Exception if object is incomplete
-        for attr, item in obj._schema.allItems():
-            if not hasattr(obj, attr):
-                raise AssertionError("incomplete XML file")
-        return obj, self.errors
-
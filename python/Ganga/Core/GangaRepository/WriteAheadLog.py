@@ -0,0 +1,158 @@
+# This class (WriteAheadLog) keeps the latest data files of the subjobs of one master job in a single append-only file.
+#
+# Each record in the file is a pickled header followed by the raw data:
+#   (index, len(data), index_cache) data
+# The last record for an index wins. A flush of many subjobs is a single sequential append (and fsync)
+# instead of rewriting one data file (plus its backup) per subjob. The records are copied into the
+# per-subjob data files and the file removed when the log is compacted.
+# Only the session holding the lock on the master job writes to the log so no file locking is needed.
+
+import os
+import errno
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from Ganga.Utility.logging import getLogger
+
+logger = getLogger()
+
+
+class WriteAheadLog(object):
+
+    """
+    Append-only log of the data of the subjobs of a master job
+    """
+
+    def __init__(self, fn):
+        """
+        Args:
+            fn (str): Path of the file holding the log
+        """
+        super(WriteAheadLog, self).__init__()
+        self.fn = fn
+        # index -> (offset of the data, length of the data, index cache)
+        self._entries = {}
+        self._inode = None
+        self._size = 0
+
+    def __contains__(self, index):
+        return index in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def size(self):
+        """ Returns the size of the log file in bytes """
+        return self._size
+
+    def indexes(self):
+        """ Returns the indexes of all subjobs with a record in the log """
+        return self._entries.keys()
+
+    def caches(self):
+        """ Returns {index: index_cache} of the latest record of each subjob """
+        return dict((index, entry[2]) for index, entry in self._entries.iteritems())
+
+    def load(self):
+        """ (Re)read the record headers of the log, a torn record at the end (from a crashed writer) is ignored
+        Returns the set of indexes found
+        """
+        self._entries = {}
+        self._inode = None
+        self._size = 0
+        try:
+            fobj = open(self.fn, 'rb')
+        except IOError as err:
+            if err.errno != errno.ENOENT:
+                raise
+            return set()
+        with fobj:
+            st = os.fstat(fobj.fileno())
+            self._inode = st.st_ino
+            good_offset = 0
+            while good_offset < st.st_size:
+                try:
+                    index, length, cache = pickle.load(fobj)
+                except Exception as err:
+                    logger.debug("WriteAheadLog: torn or corrupt record in '%s' at %s: %s" % (self.fn, good_offset, err))
+                    break
+                offset = fobj.tell()
+                if offset + length > st.st_size:
+                    logger.debug("WriteAheadLog: incomplete record in '%s' at %s" % (self.fn, good_offset))
+                    break
+                self._entries[index] = (offset, length, cache)
+                fobj.seek(length, os.SEEK_CUR)
+                good_offset = offset + length
+            self._size = good_offset
+        return set(self._entries.keys())
+
+    def read(self, index):
+        """ Returns the data stored for this subjob or None if it isn't (or no longer) in the log
+        Args:
+            index (int): index of the subjob
+        """
+        entry = self._entries.get(index)
+        if entry is None:
+            return None
+        offset, length, _cache = entry
+        try:
+            with open(self.fn, 'rb') as fobj:
+                if os.fstat(fobj.fileno()).st_ino != self._inode:
+                    # The log has been compacted by the owner of the master job, the data files are up to date
+                    return None
+                fobj.seek(offset)
+                data = fobj.read(length)
+        except IOError as err:
+            if err.errno != errno.ENOENT:
+                raise
+            return None
+        if len(data) != length:
+            return None
+        return data
+
+    def append(self, records):
+        """ Append records to the log with a single write
+        Args:
+            records (list): (index, data, index_cache) for each subjob
+        """
+        if not records:
+            return
+        chunks = []
+        headers = []
+        for index, data, cache in records:
+            header = pickle.dumps((index, len(data), cache), pickle.HIGHEST_PROTOCOL)
+            headers.append((index, len(header), len(data), cache))
+            chunks.append(header)
+            chunks.append(data)
+        with open(self.fn, 'ab') as fobj:
+            st = os.fstat(fobj.fileno())
+            if st.st_ino != self._inode or st.st_size != self._size:
+                # Throw away anything we don't know about, i.e. a torn record
+                fobj.truncate(self._size if st.st_ino == self._inode else 0)
+                if st.st_ino != self._inode:
+                    self._entries = {}
+                    self._size = 0
+                    self._inode = st.st_ino
+            fobj.write(''.join(chunks))
+            fobj.flush()
+            os.fsync(fobj.fileno())
+        offset = self._size
+        for index, header_length, data_length, cache in headers:
+            offset += header_length
+            self._entries[index] = (offset, data_length, cache)
+            offset += data_length
+        self._size = offset
+
+    def clear(self):
+        """ Remove the log, to be called once all records have been written to the data files """
+        try:
+            os.remove(self.fn)
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+        self._entries = {}
+        self._inode = None
+        self._size = 0
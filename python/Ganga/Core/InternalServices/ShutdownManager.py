@@ -18,6 +18,8 @@ from Ganga.Utility.logging import getLogger, requires_shutdown, final_shutdown
 from Ganga.Utility.Config import setConfigOption
 from Ganga.Core.MonitoringComponent.Local_GangaMC_Service import getStackTrace, _purge_actions_queue,\
     stop_and_free_thread_pool
+from Ganga.Core.MonitoringComponent.StatusFileWatcher import shutdownStatusFileWatcher
+from Ganga.GPIDev.Adapters.PostProcessExecutor import shutdownPostProcessExecutor
 from Ganga.GPIDev.Lib.Tasks import stopTasks
 from Ganga.GPIDev.Credentials import CredentialStore
 from Ganga.Core.GangaRepository.SessionLock import removeGlobalSessionFiles, removeGlobalSessionFileHandlers
@@ -70,6 +72,18 @@ def _ganga_run_exitfuncs():
     except Exception as err:
         logger.exception("Exception raised while purging monitoring queues: %s" % err)
 
+    # stop watching the status files of jobs
+    try:
+        shutdownStatusFileWatcher()
+    except Exception as err:
+        logger.exception("Exception raised while stopping the status file watcher: %s" % err)
+
+    # let the postprocessors of subjobs which are running finish, the others are run by the next session
+    try:
+        shutdownPostProcessExecutor()
+    except Exception as err:
+        logger.exception("Exception raised while finishing the postprocessing of subjobs: %s" % err)
+
     # Freeze queues
     try:
         if _global_queues:
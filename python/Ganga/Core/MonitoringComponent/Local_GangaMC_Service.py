@@ -18,6 +18,8 @@ from Ganga.GPIDev.Base.Proxy import isType, stripProxy, getName, getRuntimeGPIOb
 
 from Ganga.GPIDev.Lib.Job.Job import lazyLoadJobStatus, lazyLoadJobBackend
 
+from Ganga.Core.MonitoringComponent.PollScheduler import PollScheduler, jobStateSignature
+
 # Setup logging ---------------
 from Ganga.Utility.logging import getLogger, log_unknown_exception, log_user_exception
 
@@ -475,7 +477,7 @@ class JobRegistry_Monitor(GangaThread):
     minPollRate = 1.
     global_count = 0
 
-    __slots__ = ('registry_slice', '__sleepCounter', '__updateTimeStamp', 'progressCallback', 'callbackHookDict', 'clientCallbackDict', 'alive', 'enabled', 'steps', 'activeBackends', 'updateJobStatus', 'errors', 'updateDict_ts', '__mainLoopCond', '__cleanUpEvent', '__monStepsTerminatedEvent', 'stopIter', '_runningNow')
+    __slots__ = ('registry_slice', '__sleepCounter', '__updateTimeStamp', 'progressCallback', 'callbackHookDict', 'clientCallbackDict', 'alive', 'enabled', 'steps', 'activeBackends', 'updateJobStatus', 'errors', 'updateDict_ts', '__mainLoopCond', '__cleanUpEvent', '__monStepsTerminatedEvent', 'stopIter', '_runningNow', 'pollScheduler')
 
     def __init__(self, registry_slice):
         GangaThread.__init__(self, name="JobRegistry_Monitor")
@@ -497,6 +499,8 @@ class JobRegistry_Monitor(GangaThread):
         self.errors = {}
 
         self.updateDict_ts = SynchronisedObject(UpdateDict())
+        # decides which jobs of a backend are due for a check
+        self.pollScheduler = PollScheduler()
 
         # Create the default backend update method and add to callback hook.
         self.makeUpdateJobStatusFunction()
@@ -636,6 +640,13 @@ class JobRegistry_Monitor(GangaThread):
         self.__updateTimeStamp = time.time()
         self.__sleepCounter = config['base_poll_rate']
 
+    def wakeUp(self):
+        """
+        Cut short the wait before the next monitoring step, e.g. because the status file of a job has been written to
+        """
+        self.__sleepCounter = 0.0
+        self.pollScheduler.expedite()
+
     def runMonitoring(self, jobs=None, steps=1, timeout=300):
         """
         Enable/Run the monitoring loop and wait for the monitoring steps completion.
@@ -1032,6 +1043,9 @@ class JobRegistry_Monitor(GangaThread):
 
                 all_exceptions = []
 
+                signatures = dict((j.id, jobStateSignature(j)) for j in jobList_fromset)
+                poll_start = time.time()
+
                 for this_job_list in all_job_bunches:
 
                     if self.enabled is False and self.alive is False:
@@ -1055,6 +1069,23 @@ class JobRegistry_Monitor(GangaThread):
                         if err not in all_exceptions:
                             all_exceptions.append(err)
 
+                changed, unchanged = [], []
+                for j in jobList_fromset:
+                    if jobStateSignature(j) != signatures[j.id]:
+                        changed.append(j.id)
+                    else:
+                        unchanged.append(j.id)
+                self.pollScheduler.recordPoll(getName(backendObj), changed, unchanged, time.time() - poll_start)
+
+                # The jobs which changed are written out by the background writer of their registry rather than
+                # waiting for the next auto-flush, without holding up this thread
+                for j in jobList_fromset:
+                    if j.id in changed:
+                        raw_job = stripProxy(j)
+                        registry = raw_job._getRegistry()
+                        if registry is not None:
+                            registry._flush([raw_job], wait=False)
+
                 if all_exceptions != []:
                     for err in all_exceptions:
                         log.error("Monitoring Error: %s" % str(err))
@@ -1116,6 +1147,13 @@ class JobRegistry_Monitor(GangaThread):
             else:
                 pRate = config['default_backend_poll_rate']
 
+            # Only hand over the jobs which are due, unless all jobs have been asked for with runMonitoring
+            if config['adaptive_polling'] and self.steps <= 0:
+                jList = self.pollScheduler.selectJobs(b_name, jList)
+                if not jList:
+                    log.debug("No %s job is due for a check" % b_name)
+                    continue
+
             # TODO: To include an if statement before adding entry to
             #       updateDict. Entry is added only if credential requirements
             #       of the particular backend is satisfied.
@@ -0,0 +1,277 @@
+"""
+Decide when the jobs of each backend are handed to the backend for monitoring.
+
+Rather than polling every active job of a backend on every step of the monitoring loop, each job has its own next
+check time:
+  - a job which was just submitted, or whose state changed at its last check, is checked again after
+    [PollThread]adaptive_min_poll_rate seconds
+  - a job whose state didn't change has its interval doubled, up to the poll rate configured for the backend
+    (e.g. [PollThread]LSF, or default_backend_poll_rate)
+  - the interval of a backend is never below adaptive_cost_factor times the time its last poll took, so that a
+    slow backend can't keep the monitoring busy all the time
+  - no more than [PollThread]max_backend_calls_per_minute calls to master_updateMonitoringInformation are made
+    over all backends (0 means no limit), the jobs which are the most overdue go first
+The decisions taken are available from stats(), exported to the GPI as monitoring.stats().
+"""
+
+import math
+import time
+import threading
+from collections import deque
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+from Ganga.Utility.Config import getConfig
+from Ganga.Utility.logging import getLogger
+
+logger = getLogger()
+
+
+def jobStateSignature(job):
+    """ Returns something which changes whenever the monitoring changes the state of the job or of its subjobs
+    Args:
+        job (Job): a job handed to the backend for monitoring
+    """
+    job = stripProxy(job)
+    subjobs = getattr(job, 'subjobs', None)
+    if not subjobs:
+        return job.status
+    if hasattr(subjobs, 'getSJStatusCounts'):
+        counts = subjobs.getSJStatusCounts()
+    else:
+        counts = {}
+        for sj in subjobs:
+            counts[sj.status] = counts.get(sj.status, 0) + 1
+    return job.status, tuple(sorted(counts.items()))
+
+
+class _BackendSchedule(object):
+
+    """ What the scheduler knows about one backend """
+
+    __slots__ = ('interval', 'next_check', 'job_intervals', 'polls', 'jobs_polled', 'changes', 'last_duration',
+                 'last_poll', 'deferred', 'skipped')
+
+    def __init__(self):
+        # interval used for the jobs of the backend which haven't changed for the longest
+        self.interval = 0.
+        # job id -> next time it should be checked
+        self.next_check = {}
+        # job id -> current interval
+        self.job_intervals = {}
+        self.polls = 0
+        self.jobs_polled = 0
+        self.changes = 0
+        self.last_duration = 0.
+        self.last_poll = None
+        # jobs which were due but held back because of the budget of calls
+        self.deferred = 0
+        # monitoring steps in which none of the jobs was due
+        self.skipped = 0
+
+
+class PollScheduler(object):
+
+    """
+    Per job and per backend poll intervals for the monitoring loop
+    """
+
+    def __init__(self):
+        super(PollScheduler, self).__init__()
+        self._lock = threading.Lock()
+        self._backends = {}
+        # times of the calls made to backends over the last minute
+        self._calls = deque()
+
+    def _getBackend(self, backend_name):
+        schedule = self._backends.get(backend_name)
+        if schedule is None:
+            schedule = _BackendSchedule()
+            self._backends[backend_name] = schedule
+        return schedule
+
+    @staticmethod
+    def _maxInterval(backend_name):
+        """ The poll rate configured for the backend, the longest a job waits between two checks
+        Args:
+            backend_name (str): name of the backend, e.g. 'LSF'
+        """
+        config = getConfig('PollThread')
+        if backend_name in config:
+            return float(config[backend_name])
+        return float(config['default_backend_poll_rate'])
+
+    def _callsLeft(self, now):
+        """ Returns how many more backend calls can be made in this minute, None if there is no limit
+        Must be called holding _lock
+        """
+        budget = getConfig('PollThread')['max_backend_calls_per_minute']
+        while self._calls and now - self._calls[0] >= 60.:
+            self._calls.popleft()
+        if not budget:
+            return None
+        return max(0, budget - len(self._calls))
+
+    def selectJobs(self, backend_name, jobs, now=None):
+        """ Returns the jobs of the backend which are due for a check, most overdue first
+        Args:
+            backend_name (str): name of the backend the jobs belong to
+            jobs (list): all the active jobs of the backend
+            now (float): the current time, mostly for testing
+        """
+        if now is None:
+            now = time.time()
+        config = getConfig('PollThread')
+        min_interval = float(config['adaptive_min_poll_rate'])
+
+        with self._lock:
+            schedule = self._getBackend(backend_name)
+            active_ids = set()
+            due = []
+            for j in jobs:
+                job_id = j.id
+                active_ids.add(job_id)
+                next_check = schedule.next_check.get(job_id)
+                if next_check is None:
+                    # Newly submitted (or newly seen) jobs are looked at straight away
+                    schedule.job_intervals[job_id] = min_interval
+                    next_check = now
+                    schedule.next_check[job_id] = now
+                if next_check <= now:
+                    due.append((next_check, j))
+
+            # Forget the jobs which are no longer active
+            for job_id in schedule.next_check.keys():
+                if job_id not in active_ids:
+                    del schedule.next_check[job_id]
+                    schedule.job_intervals.pop(job_id, None)
+
+            if not due:
+                schedule.skipped += 1
+                return []
+
+            due.sort(key=lambda entry: entry[0])
+            selected = [j for _next_check, j in due]
+
+            block_size = max(1, config['numParallelJobs'])
+            calls_left = self._callsLeft(now)
+            if calls_left is not None:
+                allowed = calls_left * block_size
+                if allowed < len(selected):
+                    schedule.deferred += len(selected) - allowed
+                    logger.debug("Monitoring budget reached, deferring %s %s jobs" % (len(selected) - allowed, backend_name))
+                    selected = selected[:allowed]
+            for _ in range(int(math.ceil(len(selected) / float(block_size)))):
+                self._calls.append(now)
+
+            # Don't hand out the same jobs again before the poll reports back
+            max_interval = self._maxInterval(backend_name)
+            for j in selected:
+                schedule.next_check[j.id] = now + max_interval
+
+            return selected
+
+    def recordPoll(self, backend_name, changed, unchanged, duration, now=None):
+        """ Adapt the intervals after the backend has been asked about some jobs
+        Args:
+            backend_name (str): name of the backend
+            changed (list): ids of the jobs whose state changed during the poll
+            unchanged (list): ids of the jobs whose state didn't change
+            duration (float): how long the poll took in seconds
+            now (float): the current time, mostly for testing
+        """
+        if now is None:
+            now = time.time()
+        config = getConfig('PollThread')
+        min_interval = float(config['adaptive_min_poll_rate'])
+        max_interval = self._maxInterval(backend_name)
+        # Keep the time spent polling this backend a small fraction of the time
+        cost_interval = duration * config['adaptive_cost_factor']
+
+        with self._lock:
+            schedule = self._getBackend(backend_name)
+            schedule.polls += 1
+            schedule.jobs_polled += len(changed) + len(unchanged)
+            schedule.changes += len(changed)
+            schedule.last_duration = duration
+            schedule.last_poll = now
+
+            for job_id in changed:
+                interval = max(min_interval, min(cost_interval, max_interval))
+                schedule.job_intervals[job_id] = interval
+                if job_id in schedule.next_check:
+                    schedule.next_check[job_id] = now + interval
+            for job_id in unchanged:
+                interval = schedule.job_intervals.get(job_id, min_interval) * 2.
+                interval = min(max(interval, cost_interval, min_interval), max(max_interval, min_interval))
+                schedule.job_intervals[job_id] = interval
+                if job_id in schedule.next_check:
+                    schedule.next_check[job_id] = now + interval
+            if schedule.job_intervals:
+                schedule.interval = max(schedule.job_intervals.values())
+
+    def expedite(self):
+        """ Make all the jobs due for a check at the next monitoring step, e.g. after a status file was written to """
+        now = time.time()
+        with self._lock:
+            for schedule in self._backends.itervalues():
+                for job_id in schedule.next_check:
+                    schedule.next_check[job_id] = min(schedule.next_check[job_id], now)
+
+    def forget(self):
+        """ Drop everything learnt so far """
+        with self._lock:
+            self._backends = {}
+            self._calls.clear()
+
+    def stats(self):
+        """ Returns a dict describing the current schedule of each backend and the use of the budget of calls """
+        now = time.time()
+        with self._lock:
+            calls_left = self._callsLeft(now)
+            result = {'calls_last_minute': len(self._calls),
+                      'calls_left_this_minute': calls_left,
+                      'backends': {}}
+            for backend_name, schedule in self._backends.iteritems():
+                next_checks = schedule.next_check.values()
+                result['backends'][backend_name] = {
+                    'active_jobs': len(schedule.next_check),
+                    'jobs_due': len([t for t in next_checks if t <= now]),
+                    'next_check_in': max(0., min(next_checks) - now) if next_checks else None,
+                    'longest_interval': schedule.interval,
+                    'polls': schedule.polls,
+                    'jobs_polled': schedule.jobs_polled,
+                    'changes': schedule.changes,
+                    'last_poll_duration': schedule.last_duration,
+                    'last_poll_ago': now - schedule.last_poll if schedule.last_poll is not None else None,
+                    'deferred_by_budget': schedule.deferred,
+                    'steps_skipped': schedule.skipped,
+                }
+            return result
+
+
+class MonitoringInterface(object):
+
+    """
+    Information about the job monitoring loop, exported to the GPI as 'monitoring'
+    """
+
+    def stats(self):
+        """ Returns the decisions of the adaptive poll scheduler: per backend the number of active jobs, when the next
+        check is due, the longest poll interval in use, how many polls were made and how many state changes they found,
+        how long the last poll took and how many checks were held back by [PollThread]max_backend_calls_per_minute
+        """
+        from Ganga.Core import monitoring_component
+        if monitoring_component is None:
+            return {}
+        return monitoring_component.pollScheduler.stats()
+
+    def postprocessing(self):
+        """ Returns how many completed subjobs are waiting for their postprocessors to be run and how long they waited,
+        and per type of postprocessor how many times it ran and how long it took
+        """
+        from Ganga.GPIDev.Adapters.PostProcessExecutor import postProcessingStats
+        return postProcessingStats()
+
+    def __repr__(self):
+        return "<Ganga monitoring: use monitoring.stats() for the poll schedule of each backend and " \
+            "monitoring.postprocessing() for the time taken by postprocessors>"
@@ -0,0 +1,266 @@
+"""
+Change detection for the status files (e.g. __jobstatus__) which Local and Batch jobs write into their output
+workspace, so that monitoring only re-reads and re-parses the files which have changed since the previous pass.
+
+The behaviour is chosen with [PollThread]statusFileChangeDetection:
+  'poll'    every status file is read and parsed on every monitoring pass
+  'mtime'   a status file is only read again if its modification time, size or inode changed
+  'inotify' the output workspaces are watched through Linux inotify and a status file is only looked at once it
+            has been written to. A thread waits for the changes and wakes the monitoring loop up when a status file
+            is written. Falls back to 'mtime' if inotify isn't available
+In the 'mtime' and 'inotify' modes every file is read again at least every [PollThread]statusFileRecheckInterval
+seconds. This covers writes made on other hosts of a network filesystem, which inotify never reports.
+"""
+
+import os
+import time
+import errno
+import threading
+
+from Ganga.Core.GangaThread import GangaThread
+from Ganga.Utility.Config import getConfig
+from Ganga.Utility.logging import getLogger
+
+logger = getLogger()
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def getStatusFileWatcher():
+    """ Returns the StatusFileWatcher shared by all the backends, created on first use """
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = StatusFileWatcher(getConfig('PollThread')['statusFileChangeDetection'])
+        return _watcher
+
+
+def shutdownStatusFileWatcher():
+    """ Stop the thread and release the inotify watches of the shared StatusFileWatcher, if any """
+    global _watcher
+    with _watcher_lock:
+        if _watcher is not None:
+            _watcher.close()
+            _watcher = None
+
+
+def _read_file(fn):
+    """ Returns the content of a file or None if it can't be read
+    Args:
+        fn (str): Path of the file
+    """
+    try:
+        with open(fn) as f:
+            return f.read()
+    except IOError as err:
+        logger.debug('Problem reading status file: %s (%s)', fn, err)
+        return None
+
+
+def _signature(fn):
+    """ Returns (mtime, size, inode) of a file or None if it doesn't exist
+    Args:
+        fn (str): Path of the file
+    """
+    try:
+        st = os.stat(fn)
+    except OSError as err:
+        if err.errno != errno.ENOENT:
+            logger.debug('Problem with status file: %s (%s)', fn, err)
+        return None
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+
+class _StatusFileEntry(object):
+
+    """ What is known about one status file """
+
+    __slots__ = ('signature', 'read_time', 'check_time', 'value')
+
+    def __init__(self, signature, read_time, value):
+        self.signature = signature
+        self.read_time = read_time
+        self.check_time = read_time
+        self.value = value
+
+
+class _StatusFileEventThread(GangaThread):
+
+    """ Waits for inotify events on the watched output workspaces """
+
+    def __init__(self, watcher):
+        super(_StatusFileEventThread, self).__init__(name='StatusFileWatcher', critical=False)
+        self._watcher = watcher
+
+    def run(self):
+        while not self.should_stop():
+            try:
+                self._watcher._processEvents(timeout=1.)
+            except Exception as err:
+                logger.debug("StatusFileWatcher error: %s" % err)
+                time.sleep(1.)
+
+
+class StatusFileWatcher(object):
+
+    """
+    Cache of the parsed content of the status files of active jobs which is only refreshed when a file changes
+    """
+
+    def __init__(self, mode='mtime'):
+        """
+        Args:
+            mode (str): 'poll', 'mtime' or 'inotify', see the module documentation
+        """
+        super(StatusFileWatcher, self).__init__()
+        if mode not in ['poll', 'mtime', 'inotify']:
+            raise ValueError("Unknown status file change detection: \"%s\"" % mode)
+        self._lock = threading.Lock()
+        # path -> _StatusFileEntry
+        self._entries = {}
+        # paths written to since they were last read, according to inotify
+        self._changed = set()
+        # directory -> time the last write to a file in it was seen through inotify
+        self._last_event = {}
+        self._inotify = None
+        self._thread = None
+        self.stats = {'reads': 0, 'cached': 0, 'events': 0}
+        if mode == 'inotify':
+            from Ganga.Utility.inotify import InotifyWatcher
+            try:
+                self._inotify = InotifyWatcher()
+            except (OSError, AttributeError) as err:
+                logger.debug("inotify unavailable, falling back to mtime checks: %s" % err)
+                mode = 'mtime'
+            else:
+                self._thread = _StatusFileEventThread(self)
+                self._thread.start()
+        self.mode = mode
+
+    def close(self):
+        """ Stop watching and forget everything """
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        with self._lock:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+            self._entries = {}
+            self._changed = set()
+            self._last_event = {}
+
+    def _watch(self, directory):
+        """ Make sure changes in the directory are reported, returns False if they can't be
+        Must be called holding _lock
+        Args:
+            directory (str): The output workspace of a job
+        """
+        from Ganga.Utility.inotify import IN_FILE_CHANGES, IN_MODIFY, IN_ATTRIB
+        if self._inotify is None:
+            return False
+        return self._inotify.add_watch(directory, IN_FILE_CHANGES | IN_MODIFY | IN_ATTRIB)
+
+    def read(self, fn, parser):
+        """ Returns parser(content of the file), the content being None if the file can't be read.
+        The previous result is returned without touching the file if it hasn't changed since it was last parsed
+        Args:
+            fn (str): Path of the status file
+            parser (function): Turns the content of the file into the value returned
+        """
+        if self.mode == 'poll':
+            self.stats['reads'] += 1
+            return parser(_read_file(fn))
+
+        now = time.time()
+        recheck_interval = getConfig('PollThread')['statusFileRecheckInterval']
+        with self._lock:
+            entry = self._entries.get(fn)
+            watched = self._watch(os.path.dirname(fn))
+            changed = fn in self._changed
+            # Clear the flag before looking at the file so a write from now on is noticed next time
+            self._changed.discard(fn)
+
+        if entry is not None and now - entry.read_time < recheck_interval:
+            if watched and not changed and entry.signature is not None:
+                self.stats['cached'] += 1
+                return entry.value
+            signature = _signature(fn)
+            # A file modified around the time it was read may have been changed again within the mtime resolution
+            if signature == entry.signature and (signature is None or signature[0] < entry.read_time - 2):
+                entry.check_time = now
+                self.stats['cached'] += 1
+                return entry.value
+        else:
+            signature = _signature(fn)
+
+        value = parser(_read_file(fn))
+        self.stats['reads'] += 1
+        with self._lock:
+            self._entries[fn] = _StatusFileEntry(signature, now, value)
+        return value
+
+    def lastModified(self, fn):
+        """ Returns the time the file was last modified, using the time of a recent inotify event rather than stat when possible
+        Raises OSError if the file doesn't exist and no recent change has been seen
+        Args:
+            fn (str): Path of the file, e.g. a heartbeat file touched while a job is alive
+        """
+        with self._lock:
+            event_time = self._last_event.get(fn)
+        if event_time is not None and time.time() - event_time < getConfig('PollThread')['statusFileRecheckInterval']:
+            return event_time
+        return os.path.getmtime(fn)
+
+    def forget(self, directory):
+        """ Drop the cached content of the status files in a directory and stop watching it, e.g. once a job has finished
+        Args:
+            directory (str): The output workspace of a job
+        """
+        prefix = os.path.join(directory, '')
+        with self._lock:
+            for fn in self._entries.keys():
+                if fn.startswith(prefix):
+                    del self._entries[fn]
+            for fn in self._last_event.keys():
+                if fn.startswith(prefix):
+                    del self._last_event[fn]
+            self._changed = set(fn for fn in self._changed if not fn.startswith(prefix))
+            if self._inotify is not None:
+                self._inotify.rm_watch(directory)
+
+    def _processEvents(self, timeout=0):
+        """ Wait for inotify events, record which files changed and wake the monitoring loop up if a status file
+        which is being followed was written to
+        Args:
+            timeout (float): Seconds to wait for the first event
+        """
+        inotify = self._inotify
+        if inotify is None:
+            time.sleep(timeout)
+            return
+        events = inotify.read_events(timeout)
+        if not events and not inotify.overflowed:
+            return
+
+        now = time.time()
+        wake_up = False
+        with self._lock:
+            if inotify.overflowed:
+                # Events were lost, re-read everything
+                inotify.overflowed = False
+                self._changed.update(self._entries.keys())
+                wake_up = True
+            for directory, name, mask in events:
+                fn = os.path.join(directory, name)
+                self._last_event[fn] = now
+                self.stats['events'] += 1
+                if fn in self._entries:
+                    self._changed.add(fn)
+                    wake_up = True
+
+        if wake_up:
+            from Ganga.Core import monitoring_component
+            if monitoring_component is not None:
+                monitoring_component.wakeUp()
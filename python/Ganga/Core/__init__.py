@@ -20,11 +20,13 @@ def bootstrap(reg_slice, interactive_session, my_interface=None):
         reg_slice (RegistrySlice): A registry slice encompassing the Registry to monitor,
             e.g. from getRegistrySlice('jobs') -> JobRegistry.getSlice()
         interactive_session (bool): Flag indicating an interactive session or not
-        my_interface (Optional[module]): Public interface to add the runMonitoring function to, None (default) will set
+        my_interface (Optional[module]): Public interface to add runMonitoring and monitoring to, None (default) will set
             it to Ganga.GPI
     """
     # Must do some Ganga imports here to avoid circular importing
     from Ganga.Core.MonitoringComponent.Local_GangaMC_Service import JobRegistry_Monitor
+    from Ganga.Core.MonitoringComponent.PollScheduler import MonitoringInterface
+    from Ganga.GPIDev.Adapters.PostProcessExecutor import requeuePendingPostProcessing
     from Ganga.Utility.Config import getConfig
     from Ganga.Runtime.GPIexport import exportToInterface
     from Ganga.Utility.logging import getLogger
@@ -49,9 +51,16 @@ def bootstrap(reg_slice, interactive_session, my_interface=None):
     if config['autostart']:
         monitoring_component.enableMonitoring()
 
-    # export the runMonitoring function to the public interface
+    # export the runMonitoring function and the monitoring statistics to the public interface
     if not my_interface:
         import Ganga.GPI
         my_interface = Ganga.GPI
 
     exportToInterface(my_interface, 'runMonitoring', monitoring_component.runMonitoring, 'Functions')
+    exportToInterface(my_interface, 'monitoring', MonitoringInterface(), 'Objects', 'Statistics of the job monitoring loop')
+
+    # complete the subjobs whose postprocessing didn't run before the last session ended
+    try:
+        requeuePendingPostProcessing(reg_slice)
+    except Exception as err:
+        getLogger().error("Failed to complete the subjobs left completing: %s" % err)
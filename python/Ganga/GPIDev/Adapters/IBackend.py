@@ -67,25 +67,20 @@ class IBackend(GangaObject):
         """
         pass
 
-    def _parallel_submit(self, b, sj, sc, master_input_sandbox, fqid, logger):
-
-        try:
+    def _parallel_submit(self, sj, sc, master_input_sandbox):
+        """ Submit one subjob, from a thread of the SubmissionExecutor. Returns whether it was submitted
+        Args:
+            sj (Job): the subjob
+            sc (object): its config from the runtime handler
+            master_input_sandbox (list): files shared by all the subjobs
+        """
+        if sj.status != 'submitting':
             sj.updateStatus('submitting')
-            if b.submit(sc, master_input_sandbox):
-                sj.info.increment()
-                return 1
-            else:
-                raise IncompleteJobSubmissionError(fqid, 'submission failed')
-        except Exception as err:
-            logger.error("Parallel Job Submission Failed: %s" % err)
-            return 0
-
-    def _successfulSubmit(self, out, sj, incomplete_subjobs):
-        if out == 0:
-            incomplete_subjobs.append(sj.getFQID('.'))
-            sj.updateStatus('new', update_master = False)
-        else:
-            sj.updateStatus('submitted', update_master = False)
+        if not stripProxy(sj.backend).submit(sc, master_input_sandbox):
+            return False
+        sj.updateStatus('submitted', update_master=False)
+        stripProxy(sj.info).increment()
+        return True
 
     def master_submit(self, rjobs, subjobconfigs, masterjobconfig, keep_going=False, parallel_submit=False):
         """  Submit   the  master  job  and  all   its  subjobs.   The
@@ -146,15 +141,15 @@ class IBackend(GangaObject):
         # Shall we submit in parallel
         if parallel_submit:
 
-            from Ganga.Core.GangaThread.WorkerThreads import getQueues
-
-            threads_before = getQueues().totalNumIntThreads()
+            from Ganga.GPIDev.Adapters.SubmissionExecutor import SubmissionExecutor, waitForAll
 
+            executor = SubmissionExecutor(lambda sj, sc: self._parallel_submit(sj, sc, master_input_sandbox), getName(self))
+            futures = []
             for sc, sj in zip(subjobconfigs, rjobs):
 
                 b = sj.backend
 
-                # Must check for credentials here as we cannot handle missing credentials on Queues by design!
+                # Must check for credentials here as we cannot handle missing credentials on the threads by design!
                 if hasattr(b, 'credential_requirements') and b.credential_requirements is not None:
                     from Ganga.GPIDev.Credentials.CredentialStore import credential_store
                     try:
@@ -162,21 +157,17 @@ class IBackend(GangaObject):
                     except GangaKeyError:
                         credential_store.create(b.credential_requirements)
 
-                fqid = sj.getFQID('.')
-                # FIXME would be nice to move this to the internal threads not user ones
-                getQueues()._monitoring_threadpool.add_function(self._parallel_submit, (b, sj, sc, master_input_sandbox, fqid, logger), callback_func = self._successfulSubmit, callback_args = (sj, incomplete_subjobs))
-
-            def subjob_status_check(rjobs):
-                has_submitted = True
-                for sj in rjobs:
-                    if sj.status not in ["submitted","failed","completed","running","completing"] and sj.getFQID('.') not in incomplete_subjobs:
-                        has_submitted = False
-                        break
-                return has_submitted
+                futures.append(executor.submit(sj, sc))
+
+            try:
+                _submitted, failed = waitForAll(futures)
+            finally:
+                executor.shutdown()
 
-            while not subjob_status_check(rjobs):
-                import time
-                time.sleep(1.)
+            for future in failed:
+                logger.error("Parallel Job Submission Failed: %s" % (future.error or 'submission failed'))
+                incomplete_subjobs.append(future.subjob.getFQID('.'))
+                future.subjob.updateStatus('new', update_master=False)
 
             if incomplete_subjobs:
                 raise IncompleteJobSubmissionError(
@@ -448,16 +439,7 @@ class IBackend(GangaObject):
                 monitorable_subjob_ids = []
 
                 if isType(j.subjobs, SubJobXMLList):
-                    cache = j.subjobs.getAllCachedData()
-                    for sj_id in range(0,len(j.subjobs)):
-                        if cache[sj_id]['status'] in ['submitted', 'running']:
-                            if j.subjobs.isLoaded(sj_id):
-                                ## SJ may have changed from cache in memory
-                                this_sj = j.subjobs(sj_id)
-                                if this_sj.status in ['submitted', 'running']:
-                                    monitorable_subjob_ids.append(sj_id)
-                            else:
-                                monitorable_subjob_ids.append(sj_id)
+                    monitorable_subjob_ids = j.subjobs.getSJIdsWithStatus(['submitted', 'running'])
                 else:
                     for sj in j.subjobs:
                         if sj.status in ['submitted', 'running']:
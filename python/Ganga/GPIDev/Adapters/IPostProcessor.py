@@ -3,9 +3,12 @@
 #
 # $Id: IMerger.py,v 1.1 2008-07-17 16:40:52 moscicki Exp $
 ##########################################################################
+import time
+
 from Ganga.Core.exceptions import GangaException
+from Ganga.GPIDev.Adapters.PostProcessExecutor import recordPostProcessorTime
 from Ganga.GPIDev.Base import GangaObject
-from Ganga.GPIDev.Base.Proxy import isType, stripProxy
+from Ganga.GPIDev.Base.Proxy import getName, isType, stripProxy
 from Ganga.GPIDev.Schema import Schema, Version, ComponentItem
 from Ganga.GPIDev.Base.Proxy import GPIProxyObjectFactory
 from Ganga.GPIDev.Lib.GangaList.GangaList import GangaList
@@ -106,7 +109,9 @@ class MultiPostProcessor(IPostProcessor):
             if p is self:
                 continue
             # execute all postprocessors
+            start = time.time()
             process_result = p.execute(job, newstatus, **options)
+            recordPostProcessorTime(getName(p), time.time() - start)
             if process_result == False:
                 newstatus = 'failed'
             process_results.append(process_result)
@@ -177,6 +177,10 @@ class IPrepareApp(IApplication):
             import md5
             digest = md5.new()
 
+        # Nothing under the application has changed since the hash was last found to match, see _setDirty
+        if verify and self.hash is not None and getattr(self, '_verified_hash', None) == self.hash:
+            return True
+
         sio = cStringIO.StringIO()
         runProxyMethod(self, 'printPrepTree', sio)
         digest.update(str(sio.getvalue()))
@@ -187,7 +191,15 @@ class IPrepareApp(IApplication):
             # we return true if this is called with verify=True and the current hash is the same as that stored in the schema.
             # this is checked immediately prior to (re)writing the object to
             # the repository
-            return digest.hexdigest() == self.hash
+            if digest.hexdigest() == self.hash:
+                self._verified_hash = self.hash
+                return True
+            return False
+
+    def _setDirty(self):
+        """ Any change to the application or an object in it means the hash has to be verified again """
+        self._verified_hash = None
+        super(IPrepareApp, self)._setDirty()
 
     #printPrepTree is only ever run on applications, from within IPrepareApp.py
     #if you (manually) try to run printPrepTree on anything other than an application, it will not work as expected
@@ -0,0 +1,227 @@
+"""
+Running the postprocessors of completed subjobs from a few threads, used by Job.updateStatus.
+
+A subjob with postprocessors which completes while [Configuration]PostProcessThreads is more than 0 is left
+'completing' and handed to the PostProcessExecutor, so the monitoring thread carries on with the other jobs rather than
+waiting for the checkers and mergers of each subjob in turn.
+  - at most [Configuration]PostProcessThreads subjobs are postprocessed at the same time, over all the jobs
+  - the executor moves the subjob on with updateStatus('completed'), which runs its hooks and postprocessors and
+    makes it 'completed' or 'failed' as usual, and updates the status of its master job, which runs the postprocessors
+    of the master once all its subjobs are done
+  - master jobs, subjobs which failed or were killed and j.force_status() still run the postprocessors straight away
+  - the time taken by each type of postprocessor is recorded wherever it runs, see postProcessingStats()
+On shutdown the threads finish the subjobs they are postprocessing, those still waiting are left completing. They, and
+those a session left completing as it crashed, are handed to the executor again at startup, see
+requeuePendingPostProcessing.
+"""
+
+import time
+import threading
+import Queue
+
+from Ganga.Utility.Config import getConfig
+from Ganga.Utility.logging import getLogger
+
+logger = getLogger()
+
+# postprocessor name -> {'runs', 'total', 'max'}
+_timings = {}
+_timings_lock = threading.Lock()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def recordPostProcessorTime(name, seconds):
+    """ Add the time taken by a run of a postprocessor to its statistics
+    Args:
+        name (str): the name of the postprocessor class, e.g. 'FileChecker'
+        seconds (float): how long its execute() took
+    """
+    with _timings_lock:
+        timing = _timings.setdefault(name, {'runs': 0, 'total': 0., 'max': 0.})
+        timing['runs'] += 1
+        timing['total'] += seconds
+        timing['max'] = max(timing['max'], seconds)
+
+
+class PostProcessExecutor(object):
+
+    """
+    Runs the postprocessors of completed subjobs from threads of its own, see the description of the module
+    """
+
+    def __init__(self):
+        super(PostProcessExecutor, self).__init__()
+        self._queue = Queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._outstanding = 0
+        self._stopped = False
+        self.stats = {'queued': 0, 'done': 0, 'failed': 0, 'max_depth': 0, 'wait_total': 0., 'wait_max': 0.}
+
+    @staticmethod
+    def enabled():
+        """ Whether the postprocessors of completed subjobs are to be run by the executor """
+        return getConfig('Configuration')['PostProcessThreads'] > 0
+
+    def submit(self, job):
+        """ Queue the postprocessing of a subjob which has been moved to 'completing'
+        Args:
+            job (Job): the subjob
+        """
+        with self._lock:
+            if self._stopped:
+                # Left completing for the next session
+                return
+            self._outstanding += 1
+            self.stats['queued'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], self._outstanding)
+            start_thread = not self._stopped and len(self._threads) < getConfig('Configuration')['PostProcessThreads']
+            if start_thread:
+                thread = threading.Thread(target=self._work, name='PostProcess_%s' % len(self._threads))
+                thread.daemon = True
+                self._threads.append(thread)
+        self._queue.put((job, time.time()))
+        if start_thread:
+            thread.start()
+
+    def wait(self, timeout=None):
+        """ Wait until the subjobs queued have been postprocessed, returns whether they have
+        Args:
+            timeout (float): seconds to wait at most, None to wait until they are
+        """
+        end = time.time() + timeout if timeout is not None else None
+        with self._idle:
+            while self._outstanding:
+                remaining = end - time.time() if end is not None else 1.
+                if remaining <= 0:
+                    return False
+                self._idle.wait(min(remaining, 1.))
+        return True
+
+    def shutdown(self):
+        """ Let the threads finish the subjobs they are postprocessing and exit, the subjobs still waiting are left
+        completing for the next session """
+        with self._lock:
+            self._stopped = True
+            threads = list(self._threads)
+        dropped = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except Queue.Empty:
+                break
+            if item is not None:
+                dropped += 1
+        if dropped:
+            logger.info("Leaving %s subjobs completing, they will be postprocessed by the next session" % dropped)
+        with self._lock:
+            self._outstanding -= dropped
+            self._idle.notify_all()
+        for _ in threads:
+            self._queue.put(None)
+        self.wait()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._run(*item)
+
+    def _run(self, job, queued):
+        waited = time.time() - queued
+        try:
+            passed = job._finishPostProcessing()
+        except Exception as err:
+            logger.error("Postprocessing of Job %s failed: %s" % (job.getFQID('.'), err))
+            passed = False
+        with self._lock:
+            self._outstanding -= 1
+            self.stats['done'] += 1
+            if not passed:
+                self.stats['failed'] += 1
+            self.stats['wait_total'] += waited
+            self.stats['wait_max'] = max(self.stats['wait_max'], waited)
+            self._idle.notify_all()
+
+    def info(self):
+        """ Returns a dict describing the backlog of the executor """
+        with self._lock:
+            done = self.stats['done']
+            return {'threads': len(self._threads),
+                    'waiting': self._outstanding,
+                    'max_waiting': self.stats['max_depth'],
+                    'done': done,
+                    'failed': self.stats['failed'],
+                    'wait_mean': self.stats['wait_total'] / max(done, 1),
+                    'wait_max': self.stats['wait_max']}
+
+
+def getPostProcessExecutor():
+    """ Returns the PostProcessExecutor of this session, created the first time it's asked for """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = PostProcessExecutor()
+        return _executor
+
+
+def shutdownPostProcessExecutor():
+    """ Finish the postprocessing of the subjobs still waiting and drop the executor """
+    global _executor
+    with _executor_lock:
+        executor = _executor
+        _executor = None
+    if executor is not None:
+        executor.shutdown()
+
+
+def requeuePendingPostProcessing(reg_slice):
+    """ Hand the subjobs a previous session left completing, waiting for their postprocessing, to the executor
+    Args:
+        reg_slice (RegistrySlice): the jobs, only the master jobs whose index cache shows a completing subjob are loaded
+    """
+    masters = []
+    for status in ['submitting', 'submitted', 'running', 'completing']:
+        reg_slice.do_select(lambda this_id, obj: masters.append(obj), status=status)
+
+    for master in masters:
+        # This runs at every startup, so the subjob statuses stored in the index decide which jobs need loading
+        subjob_statuses = master._index_cache.get('subjobs:status')
+        if subjob_statuses is not None and 'completing' not in subjob_statuses:
+            continue
+        try:
+            if not master.subjobs:
+                continue
+            if hasattr(master.subjobs, 'getSJIdsWithStatus'):
+                subjob_ids = master.subjobs.getSJIdsWithStatus(['completing'])
+            else:
+                subjob_ids = [sj.id for sj in master.subjobs if sj.status == 'completing']
+            for subjob_id in subjob_ids:
+                subjob = master.subjobs[subjob_id]
+                if not subjob.postprocess_pending:
+                    continue
+                logger.info("Completing Job %s left waiting for its postprocessors" % subjob.getFQID('.'))
+                if PostProcessExecutor.enabled():
+                    getPostProcessExecutor().submit(subjob)
+                else:
+                    subjob._finishPostProcessing()
+        except Exception as err:
+            logger.error("Failed to complete the subjobs of Job %s: %s" % (master.getFQID('.'), err))
+
+
+def postProcessingStats():
+    """ Returns the state of the executor and, per type of postprocessor, how many times it ran, the total time taken,
+    its mean and its maximum """
+    with _executor_lock:
+        executor = _executor
+    timings = {}
+    with _timings_lock:
+        for name, timing in _timings.iteritems():
+            timings[name] = dict(timing, mean=timing['total'] / max(timing['runs'], 1))
+    result = {'postprocessors': timings}
+    result['executor'] = executor.info() if executor is not None else {}
+    return result
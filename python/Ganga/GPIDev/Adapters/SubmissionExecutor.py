@@ -0,0 +1,187 @@
+"""
+Submission of the subjobs of a job in parallel, used by IBackend.master_submit(parallel_submit=True).
+
+Each subjob handed to the executor gets a SubmissionFuture which is done as soon as its submission succeeded or
+failed for good, so the caller waits for exactly the subjobs it submitted instead of rescanning their status.
+  - at most [Configuration]SubmitMaxInFlight submissions run at the same time for a given backend type, over all the
+    jobs being submitted, the option is read each time a submission starts
+  - a submission for which submit() returns False, i.e. the backend says the job wasn't submitted, is tried again up
+    to [Configuration]SubmitRetries times, waiting [Configuration]SubmitRetryBackoff seconds before the first retry
+    and twice as long before each of the next ones. One which raises isn't tried again, as the backend may have taken
+    the job before failing (e.g. to read its id) and submitting it again would make a duplicate
+  - each future records how many attempts were made and how long the submission took
+"""
+
+import time
+import threading
+import Queue
+
+from Ganga.Utility.Config import getConfig
+from Ganga.Utility.logging import getLogger
+
+logger = getLogger()
+
+# backend name -> _InFlightLimit
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+class _InFlightLimit(object):
+
+    """ Limits the submissions in flight to a type of backend to [Configuration]SubmitMaxInFlight, used as a context
+    manager around each submission """
+
+    def __init__(self):
+        super(_InFlightLimit, self).__init__()
+        self._cond = threading.Condition()
+        self._running = 0
+
+    def __enter__(self):
+        with self._cond:
+            while self._running >= max(1, getConfig('Configuration')['SubmitMaxInFlight']):
+                # Woken up when a submission ends, or after a while to see a change of the option
+                self._cond.wait(1.)
+            self._running += 1
+
+    def __exit__(self, *args):
+        with self._cond:
+            self._running -= 1
+            self._cond.notify()
+
+
+def _getInFlightLimit(backend_name):
+    """ Returns the limit shared by all the submissions to a type of backend
+    Args:
+        backend_name (str): name of the backend class, e.g. 'LSF'
+    """
+    with _in_flight_lock:
+        if backend_name not in _in_flight:
+            _in_flight[backend_name] = _InFlightLimit()
+        return _in_flight[backend_name]
+
+
+class SubmissionFuture(object):
+
+    """ The outcome of the submission of one subjob """
+
+    def __init__(self, subjob, subjobconfig):
+        """
+        Args:
+            subjob (Job): the subjob to submit
+            subjobconfig (object): its config from the runtime handler
+        """
+        super(SubmissionFuture, self).__init__()
+        self.subjob = subjob
+        self.subjobconfig = subjobconfig
+        self.submitted = False
+        self.error = None
+        self.attempts = 0
+        self.latency = None
+        self._done = threading.Event()
+
+    def done(self):
+        """ Whether the submission has finished, successfully or not """
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """ Wait for the submission to finish, returns whether it has
+        Args:
+            timeout (float): seconds to wait at most, None to wait until it's done
+        """
+        self._done.wait(timeout)
+        return self._done.is_set()
+
+    def _finish(self, submitted, error, start):
+        self.submitted = submitted
+        self.error = error
+        self.latency = time.time() - start
+        self._done.set()
+
+
+class SubmissionExecutor(object):
+
+    """
+    Submits subjobs from a few threads of its own, see the description of the module
+    """
+
+    def __init__(self, submit_function, backend_name):
+        """
+        Args:
+            submit_function (function): called as submit_function(subjob, subjobconfig), returns whether it succeeded
+            backend_name (str): the type of backend submitted to, for the limit of submissions in flight
+        """
+        super(SubmissionExecutor, self).__init__()
+        self._submit_function = submit_function
+        self._backend_name = backend_name
+        self._queue = Queue.Queue()
+        self._threads = []
+
+    def submit(self, subjob, subjobconfig):
+        """ Queue the submission of a subjob, returns its SubmissionFuture
+        Args:
+            subjob (Job): the subjob to submit
+            subjobconfig (object): its config from the runtime handler
+        """
+        future = SubmissionFuture(subjob, subjobconfig)
+        self._queue.put(future)
+        if len(self._threads) < max(1, getConfig('Configuration')['SubmitMaxInFlight']):
+            thread = threading.Thread(target=self._work, name='Submit_%s_%s' % (self._backend_name, len(self._threads)))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        return future
+
+    def shutdown(self):
+        """ Let the threads exit once the queued submissions are done """
+        for _ in self._threads:
+            self._queue.put(None)
+
+    def _work(self):
+        while True:
+            future = self._queue.get()
+            if future is None:
+                return
+            self._run(future)
+
+    def _run(self, future):
+        """ Submit a subjob, retrying if the backend says it wasn't submitted """
+        config = getConfig('Configuration')
+        retries = max(0, config['SubmitRetries'])
+        backoff = config['SubmitRetryBackoff']
+        limit = _getInFlightLimit(self._backend_name)
+        start = time.time()
+        while True:
+            future.attempts += 1
+            with limit:
+                try:
+                    if self._submit_function(future.subjob, future.subjobconfig):
+                        future._finish(True, None, start)
+                        return
+                except Exception as err:
+                    # Not known to have failed before the backend took the job, so not tried again
+                    logger.debug("Submission of %s raised: %s" % (future.subjob.getFQID('.'), err))
+                    future._finish(False, err, start)
+                    return
+            if future.attempts > retries:
+                break
+            logger.debug("Submission of %s failed, trying again in %ss" % (future.subjob.getFQID('.'), backoff))
+            time.sleep(backoff)
+            backoff *= 2
+        future._finish(False, None, start)
+
+
+def waitForAll(futures):
+    """ Wait until all the submissions are done, returns (submitted, failed) lists of futures
+    Args:
+        futures (list): SubmissionFutures
+    """
+    for future in futures:
+        future.wait()
+    submitted = [f for f in futures if f.submitted]
+    failed = [f for f in futures if not f.submitted]
+    if futures:
+        latencies = [f.latency for f in futures]
+        logger.debug("Submitted %s of %s subjobs, latency mean %.2fs max %.2fs, %s retries" %
+                      (len(submitted), len(futures), sum(latencies) / len(latencies), max(latencies),
+                       sum(f.attempts - 1 for f in futures)))
+    return submitted, failed
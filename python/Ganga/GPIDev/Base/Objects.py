@@ -20,6 +20,7 @@ from copy import deepcopy, copy
 from inspect import isclass
 
 from Ganga.GPIDev.Schema import Schema, Item, ComponentItem, SharedItem
+from Ganga.GPIDev.Schema.Schema import SchemaTable, newDefaultValue, _DEFAULT_STORE, _DEFAULT_STORE_COPY
 
 from Ganga.Core.exceptions import GangaValueError, GangaException
 
@@ -244,6 +245,26 @@ class Node(object):
 ##########################################################################
 
 
+class LazyValue(object):
+    """
+    Base class of placeholders which may be stored in the _data of a GangaObject in place of a value
+    which is expensive to construct (e.g. a large part of an XML file which has not been parsed yet).
+    The Descriptor replaces the placeholder by the real value on first access, see GangaObject._materialiseAttribute
+    """
+    __metaclass__ = abc.ABCMeta
+    __slots__ = ()
+
+    @abc.abstractmethod
+    def materialise(self):
+        """
+        Construct and return the real value this placeholder stands in for.
+        This is called once, with the lock of the root object held, and the value returned is stored in place of the
+        placeholder. If the value can't be constructed as it was when the placeholder was made this must raise a
+        GangaException rather than return something else
+        """
+        pass
+
+
 def synchronised_get_descriptor(get_function):
     """
     This decorator should only be used on ``__get__`` method of the ``Descriptor``.
@@ -278,6 +299,27 @@ def synchronised_set_descriptor(set_function):
     return set_decorator
 
 
+# The value being assigned by _setFreshAttribute, if any
+_fresh_value = threading.local()
+
+
+def _setFreshAttribute(obj, name, value):
+    """
+    Assign a value which nothing else refers to, e.g. a default which has just been built. The descriptor would
+    otherwise assign a copy of it, which for components means building the whole tree of objects again
+    Args:
+        obj (GangaObject): the object whose attribute is set
+        name (str): the name of the attribute
+        value (unknown): the new value
+    """
+    previous = getattr(_fresh_value, 'value', None)
+    _fresh_value.value = value
+    try:
+        setattr(obj, name, value)
+    finally:
+        _fresh_value.value = previous
+
+
 class Descriptor(object):
 
     """
@@ -324,10 +366,30 @@ class Descriptor(object):
         if self._getter_name:
             raise AttributeError('cannot modify or delete "%s" property (declared as "getter")' % _getName(self))
 
-    @synchronised_get_descriptor
     def __get__(self, obj, cls):
         """
         Get method of Descriptor
+        Values already in memory are returned straight away: reading one entry of _data is atomic and writers replace
+        whole values, so the lock isn't needed and neither is the walk up to the root object to find it.
+        Anything else (getters, deferred values, loading from disk, defaults) goes through _locked_get
+        Args:
+            obj (GangaObject): This is the object which controls the attribute of interest
+            cls (class): This is the class of the Ganga Object which is being called
+        """
+        if obj is not None and self._getter_name is None:
+            try:
+                value = obj._data[self._name]
+            except KeyError:
+                pass
+            else:
+                if not isinstance(value, LazyValue):
+                    return value
+        return self._locked_get(obj, cls)
+
+    @synchronised_get_descriptor
+    def _locked_get(self, obj, cls):
+        """
+        Get method of Descriptor for the values which aren't simply in memory
         This wraps the object in question with a read-lock which ensures object onsistency across multiple threads
         Args:
             obj (GangaObject): This is the object which controls the attribute of interest
@@ -349,9 +411,14 @@ class Descriptor(object):
         # This access should not cause the object to be loaded
         obj_data = obj._data
         try:
-            return obj_data[name]
+            value = obj_data[name]
         except KeyError:
             pass
+        else:
+            # Values which were deferred on loading are constructed now
+            if isinstance(value, LazyValue):
+                value = obj._materialiseAttribute(name, value)
+            return value
 
         # Then try to get it from the index cache
         obj_index = obj._index_cache
@@ -455,6 +522,10 @@ class Descriptor(object):
                 from Ganga.GPIDev.Base.Proxy import GangaAttributeError
                 raise GangaAttributeError('%s: attempt to assign an incompatible object %s to the property in category "%s found cat: %s"' % (name, _getName(v), item['category'], v._category))
 
+        # A value just built for this attribute doesn't need to be copied
+        if v is getattr(_fresh_value, 'value', None):
+            return v
+
         v_copy = deepcopy(v)
 
         return v_copy
@@ -505,6 +576,12 @@ class Descriptor(object):
         if not basic:
             new_value = Descriptor.cleanValue(obj, val, _set_name)
 
+        # Setting a simple attribute to the value it already has changes nothing to be written to disk
+        if basic:
+            old_value = obj._data.get(_set_name)
+            if type(old_value) is type(new_value) and old_value == new_value:
+                return
+
         obj.setSchemaAttribute(_set_name, new_value)
 
         obj._setDirty()
@@ -678,6 +755,9 @@ class ObjectMetaclass(abc.ABCMeta):
         # create reference in schema to the pluginclass
         this_schema._pluginclass = cls
 
+        # what populate_from_schema goes through to give new objects their default values
+        this_schema._table = SchemaTable(this_schema)
+
         # if we've not even declared this we don't want to use it!
         if not cls._declared_property('hidden') or cls._declared_property('enable_plugin'):
             allPlugins.add(cls, cls._category, _getName(cls))
@@ -761,11 +841,17 @@ class GangaObject(Node):
         """
         Populate the data dict from the schema defaults
         """
-        self._data_dict = dict.fromkeys(self._schema.datadict)
-        for attr, item in self._schema.allItems():
-            ## If an object is hidden behind a getter method we can't assign a parent or defvalue so don't bother - rcurrie
-            if item.getProperties()['getter'] is None:
-                setattr(self, attr, self._schema.getDefaultValue(attr))
+        data = self._data_dict = dict.fromkeys(self._schema.datadict)
+        entries = self._schema.getDefaultsTable()
+        for attr, how, value in entries:
+            if how == _DEFAULT_STORE:
+                data[attr] = value
+            elif how == _DEFAULT_STORE_COPY:
+                data[attr] = deepcopy(value)
+            else:
+                _setFreshAttribute(self, attr, newDefaultValue(how, value))
+        if entries:
+            self._setDirty()
 
     @synchronised
     def accept(self, visitor):
@@ -872,6 +958,9 @@ class GangaObject(Node):
                 if isinstance(this_attr, Node) and name not in do_not_copy:
                     if this_attr._getParent() is not self:
                         this_attr._setParent(self)
+            elif isinstance(item, ComponentItem):
+                # Assigning a component makes a copy of it, copying it beforehand as well would copy it twice
+                setattr(self, name, getattr(_srcobj, name))
             else:
                 copy_obj = deepcopy(getattr(_srcobj, name))
                 setattr(self, name, copy_obj)
@@ -942,6 +1031,30 @@ class GangaObject(Node):
         if isinstance(attrib_value, Node) and attrib_value._getParent() is not self:
             self._data[attrib_name]._setParent(self)
 
+    def _materialiseAttribute(self, attrib_name, lazy_value):
+        # type: (str, LazyValue) -> Any
+        """
+        Replace the placeholder stored for a schema attribute by its real value.
+        This is not a modification of the object so it is not marked as dirty.
+
+        Args:
+            attrib_name (str): the name of the schema attribute
+            lazy_value (LazyValue): the placeholder currently stored for it
+        """
+        value = lazy_value.materialise()
+        self.setSchemaAttribute(attrib_name, value)
+        return value
+
+    def _hasLazyAttribute(self, attrib_name):
+        # type: (str) -> bool
+        """
+        Returns True if the value of this schema attribute has not been constructed yet
+
+        Args:
+            attrib_name (str): the name of the schema attribute
+        """
+        return isinstance(self._data.get(attrib_name), LazyValue)
+
     @property
     def _index_cache(self):
         """
@@ -1027,7 +1140,10 @@ class GangaObject(Node):
         if self._schema is not None:
             for name, item in self._schema.allItems():
                 if not item['copyable'] or name in do_not_copy or not hasattr(self, name):
-                    setattr(self_copy, name, self._schema.getDefaultValue(name))
+                    _setFreshAttribute(self_copy, name, self._schema.getDefaultValue(name))
+                elif isinstance(item, ComponentItem):
+                    # Assigning a component makes a copy of it
+                    setattr(self_copy, name, getattr(self, name))
                 else:
                     setattr(self_copy, name, deepcopy(getattr(self, name)))
 
@@ -1149,6 +1265,9 @@ class GangaObject(Node):
         """
         if self._schema and auto_load_deps:
             for k in self._schema.allItemNames():
+                # A value which hasn't been constructed yet can't have been modified
+                if self._hasLazyAttribute(k):
+                    continue
                 this_attr = getattr(self, k)
                 if isinstance(this_attr, Node):
                     if not this_attr._dirty:
@@ -13,6 +13,9 @@ from functools import partial
 from Ganga.Utility.logging import getLogger
 logger = getLogger(modulename=True)
 
+# Elements which never need to be copied
+_immutable_types = frozenset([str, unicode, int, long, float, bool, type(None)])
+
 
 def makeGangaList(_list, mapfunction=None, parent=None, preparable=False, extra_args=None):
     """Should be used for makeing full gangalists
@@ -317,6 +320,9 @@ class GangaList(GangaObject):
         #logger.info("memo: %s" % str(memo))
         #logger.info("self.len: %s" % str(len(self._list)))
         if self._list != []:
+            # Lists of strings and numbers (e.g. arguments) only need a new list
+            if all(type(elem) in _immutable_types for elem in self._list):
+                return makeGangaListByRef(_list=list(self._list), preparable=self._is_preparable)
             return makeGangaListByRef(_list=copy.deepcopy(self._list, memo), preparable=self._is_preparable)
         else:
             new_list = GangaList()
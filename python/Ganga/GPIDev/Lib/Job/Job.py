@@ -18,6 +18,7 @@ from Ganga.Core.GangaRepository.SubJobXMLList import SubJobXMLList
 from Ganga.GPIDev.Adapters.ApplicationRuntimeHandlers import allHandlers
 from Ganga.GPIDev.Adapters.IApplication import PostprocessStatusUpdate
 from Ganga.GPIDev.Adapters.IPostProcessor import MultiPostProcessor
+from Ganga.GPIDev.Adapters.PostProcessExecutor import PostProcessExecutor, getPostProcessExecutor
 from Ganga.GPIDev.Base import GangaObject
 from Ganga.GPIDev.Base.Proxy import addProxy, getName, getRuntimeGPIObject, isType, runtimeEvalString, stripProxy
 from Ganga.GPIDev.Lib.File import MassStorageFile, getFileConfigKeys
@@ -224,6 +225,7 @@ class Job(GangaObject):
                                      'do_auto_resubmit': SimpleItem(defvalue=False, doc='Automatically resubmit failed subjobs'),
                                      'metadata': ComponentItem('metadata', defvalue=MetadataDict(), doc='the metadata', protected=1, copyable=0),
                                      'fqid': SimpleItem(getter="getStringFQID", transient=1, protected=1, load_default=0, defvalue=None, optional=1, copyable=0, comparable=0, typelist=[str], doc='fully qualified job identifier', visitable=0),
+                                     'postprocess_pending': SimpleItem(defvalue=False, hidden=1, protected=1, copyable=0, comparable=0, typelist=[bool], doc='flag to show the job is completing and waiting for the PostProcessExecutor'),
                                      'been_queued': SimpleItem(transient=1, hidden=1, defvalue=False, optional=0, copyable=0, comparable=0, typelist=[bool], doc='flag to show job has been queued for postprocessing', visitable=0),
                                      'parallel_submit': SimpleItem(transient=1, defvalue=True, doc="Enable Submission of subjobs in parallel"),
                                      })
@@ -312,13 +314,14 @@ class Job(GangaObject):
         c = Job()
 
         c.time.newjob()
-        c.backend = copy.deepcopy(self.backend)
-        c.application = copy.deepcopy(self.application)
-        c.inputdata = copy.deepcopy(self.inputdata)
+        # Assigning a component makes a copy of it
+        c.backend = self.backend
+        c.application = self.application
+        c.inputdata = self.inputdata
         c.name = self.name
         c.comment = self.comment
-        c.postprocessors = copy.deepcopy(self.postprocessors)
-        c.splitter = copy.deepcopy(self.splitter)
+        c.postprocessors = self.postprocessors
+        c.splitter = self.splitter
         c.parallel_submit = self.parallel_submit
 
         # Continue as before
@@ -569,6 +572,15 @@ class Job(GangaObject):
             else:
                 raise JobStatusError('forbidden status transition of job %s from "%s" to "%s"' % (fqid, initial_status, newstatus))
 
+        deferred = False
+        if transition_update and newstatus == 'completed' and initial_status in ['submitted', 'running'] and \
+                ignore_failures is not True and self._deferPostProcessing():
+            # The PostProcessExecutor completes the subjob, its hooks and postprocessors included, by moving it on from
+            # completing with updateStatus('completed')
+            newstatus = 'completing'
+            state = self.status_graph[initial_status][newstatus]
+            deferred = True
+
         try:
             if state.hook:
                 try:
@@ -576,7 +588,7 @@ class Job(GangaObject):
                 except PostprocessStatusUpdate as x:
                     newstatus = x.status
 
-            if transition_update:
+            if transition_update and not deferred:
                 # we call this even if there was a hook
                 newstatus = self.transition_update(newstatus)
 
@@ -592,9 +604,22 @@ class Job(GangaObject):
                 logger.debug("Status changed from '%s' to '%s'. No new timestamp was written", initial_status, newstatus)
 
             # move to the new state AFTER hooks are called
-            self.status = newstatus
+            if deferred:
+                with self.const_lock:
+                    if self.status != initial_status:
+                        # Another thread (e.g. the monitoring loop and a runMonitoring() call) handed it over already
+                        logger.debug("Job %s is already %s, not deferring its postprocessors again", fqid, self.status)
+                        return
+                    # persisted with the status so that a later session knows to complete the subjob
+                    self.postprocess_pending = True
+                    self.status = newstatus
+            else:
+                self.status = newstatus
             logger.debug("Status changed from '%s' to '%s'" % (initial_status, self.status))
 
+            if deferred:
+                getPostProcessExecutor().submit(self)
+
         except Exception as x:
             self.status = initial_status
             log_user_exception()
@@ -607,6 +632,27 @@ class Job(GangaObject):
         if update_master and self.master is not None:
             self.master.updateMasterJobStatus()
 
+    def _deferPostProcessing(self):
+        """Whether the postprocessors of this job are to be run by the PostProcessExecutor as it completes"""
+        return self.master is not None and len(self.postprocessors) > 0 and PostProcessExecutor.enabled()
+
+    def _finishPostProcessing(self):
+        """
+        Complete a subjob left completing by updateStatus, through the usual transition from completing. Called by the
+        PostProcessExecutor, also for the subjobs left over by a previous session. Returns whether the subjob completed.
+        """
+        if self.status != 'completing' or not self.postprocess_pending:
+            # e.g. resubmitted in the meantime
+            return False
+        try:
+            self.updateStatus('completed')
+        except JobStatusError as err:
+            logger.error("Job %s failed to complete: %s" % (self.getFQID('.'), err))
+            self.updateStatus('failed')
+        finally:
+            self.postprocess_pending = False
+        return self.status == 'completed'
+
     def transition_update(self, new_status):
         """Propagate status transitions"""
 
@@ -724,7 +770,7 @@ class Job(GangaObject):
         """
 
         if isinstance(self.subjobs, SubJobXMLList):
-            stats = set(self.subjobs.getAllSJStatus())
+            stats = set(self.subjobs.getSJStatusCounts())
         else:
             stats = set(sj.status for sj in self.subjobs)
 
@@ -735,6 +781,12 @@ class Job(GangaObject):
         Update master job status based on the status of subjobs.
         This is an auxiliary method for implementing bulk subjob monitoring.
         """
+        # Subjobs postprocessed by the PostProcessExecutor update their master from its threads, only one of them may
+        # move the master on (and run its postprocessors)
+        with self.const_lock:
+            self._updateMasterJobStatus()
+
+    def _updateMasterJobStatus(self):
         stats = self.getSubJobStatuses()
 
         # ignore non-split jobs
@@ -1204,13 +1256,6 @@ class Job(GangaObject):
 
         return jobmasterconfig
 
-    @staticmethod
-    def _prepare_sj( rtHandler, i, app, sub_c, app_master_c, job_master_c, finished):
-        if app.is_prepared in [None, False]:
-            app.prepare()
-        finished[i] = rtHandler.prepare(app, sub_c, app_master_c, job_master_c)
-        return
-
     def _getJobSubConfig(self, subjobs):
 
         jobsubconfig = None
@@ -1230,20 +1275,9 @@ class Job(GangaObject):
                 if self.parallel_submit is False:
                     jobsubconfig = [rtHandler.prepare(sub_job.application, sub_conf, appmasterconfig, jobmasterconfig) for (sub_job, sub_conf) in zip(subjobs, appsubconfig)]
                 else:
-
-                    finished = {}
-
-                    from Ganga.Core.GangaThread.WorkerThreads import getQueues
-                    index=0
-                    for sub_j, sub_conf in zip(subjobs, appsubconfig):
-                        getQueues()._monitoring_threadpool.add_function(self._prepare_sj, (rtHandler, index, sub_j.application, sub_conf, appmasterconfig, jobmasterconfig, finished))
-                        index += 1
-
-                    while len(finished) != len(subjobs):
-                        time.sleep(0.25)
-
-                    for index in finished.keys():
-                        jobsubconfig.insert(index, finished[index])
+                    from Ganga.GPIDev.Lib.Job.SubjobPreparation import prepareSubjobs
+                    jobsubconfig = prepareSubjobs(rtHandler, [sub_j.application for sub_j in subjobs], appsubconfig,
+                                                  appmasterconfig, jobmasterconfig, self.getFQID('.'))
 
         else:
             #   I am a sub-job, lets calculate my config
@@ -0,0 +1,126 @@
+"""
+Run IRuntimeHandler.prepare for all the subjobs of a job submitted with parallel_submit.
+
+The preparations run in the monitoring thread pool. The results come back in the order of the subjobs whatever order
+the preparations finish in, and the caller waits on their completion rather than polling. An exception raised while
+preparing a subjob, GangaException or not, is raised again to the caller once all the preparations are over. If the
+thread pool isn't running or stops taking tasks (e.g. on shutdown) the subjobs it hasn't started are prepared by the
+calling thread.
+Progress is logged every [Configuration]SubjobPrepareProgressInterval seconds.
+"""
+
+import time
+import threading
+
+from Ganga.Utility.Config import getConfig
+from Ganga.Utility.logging import getLogger
+
+logger = getLogger()
+
+
+class _Preparation(object):
+
+    """ The outcome of the preparation of the subjobs, filled in as the workers finish """
+
+    def __init__(self, number):
+        self._cond = threading.Condition()
+        self.results = [None] * number
+        self.error = None
+        self.pending = number
+        self._claimed = [False] * number
+
+    def claim(self, index):
+        """ Returns True for the one thread which is to prepare a subjob """
+        with self._cond:
+            if self._claimed[index]:
+                return False
+            self._claimed[index] = True
+            return True
+
+    def done(self, result, index):
+        with self._cond:
+            self.results[index] = result
+            self.pending -= 1
+            self._cond.notifyAll()
+
+    def failed(self, err, index):
+        with self._cond:
+            if self.error is None:
+                self.error = err
+            self.pending -= 1
+            self._cond.notifyAll()
+
+    def wait(self, timeout):
+        """ Wait until all the subjobs are prepared or timeout seconds have passed, returns how many are left """
+        with self._cond:
+            if self.pending > 0:
+                self._cond.wait(timeout)
+            return self.pending
+
+
+def _prepareSubjob(preparation, index, rtHandler, app, sub_conf, app_master_conf, job_master_conf):
+    """ Prepare one subjob and record the outcome, this is what runs in the worker threads.
+    Every exception is recorded here as the thread pool only hands those which aren't GangaExceptions to a fallback
+    Args:
+        preparation (_Preparation): where the outcome goes
+        index (int): the position of the subjob
+        rtHandler (IRuntimeHandler): the runtime handler of the job
+        app (IApplication): the application of the subjob
+        sub_conf (object): the result of app.configure for the subjob
+        app_master_conf (object): the result of app.master_configure
+        job_master_conf (object): the result of rtHandler.master_prepare
+    """
+    if not preparation.claim(index):
+        return
+    try:
+        if app.is_prepared in [None, False]:
+            app.prepare()
+        result = rtHandler.prepare(app, sub_conf, app_master_conf, job_master_conf)
+    except Exception as err:
+        logger.debug("Preparing subjob %s failed: %s" % (index, err))
+        preparation.failed(err, index)
+    else:
+        preparation.done(result, index)
+
+
+def prepareSubjobs(rtHandler, apps, sub_confs, app_master_conf, job_master_conf, fqid=''):
+    """ Returns the result of rtHandler.prepare for each subjob, in the order of the subjobs
+    Args:
+        rtHandler (IRuntimeHandler): the runtime handler of the job
+        apps (list): the applications of the subjobs
+        sub_confs (list): the result of app.configure for each subjob
+        app_master_conf (object): the result of app.master_configure
+        job_master_conf (object): the result of rtHandler.master_prepare
+        fqid (str): id of the job, for the progress messages
+    """
+    from Ganga.Core.GangaThread.WorkerThreads import getQueues
+
+    tasks = [(rtHandler, app, sub_conf, app_master_conf, job_master_conf) for app, sub_conf in zip(apps, sub_confs)]
+    preparation = _Preparation(len(tasks))
+
+    queues = getQueues()
+    thread_pool = queues._monitoring_threadpool if queues is not None else None
+
+    start = time.time()
+    for index, task in enumerate(tasks):
+        # A frozen pool drops the task without telling, so don't hand it over
+        if thread_pool is None or thread_pool.isfrozen():
+            _prepareSubjob(preparation, index, *task)
+        else:
+            thread_pool.add_function(_prepareSubjob, (preparation, index) + task,
+                                     name="Prepare subjob %s.%s" % (fqid, index))
+
+    interval = getConfig('Configuration')['SubjobPrepareProgressInterval']
+    while preparation.wait(interval) > 0:
+        if thread_pool is not None and thread_pool.isfrozen():
+            # The tasks not started yet may have been purged from the queue, whichever thread gets to them first runs them
+            for index, task in enumerate(tasks):
+                _prepareSubjob(preparation, index, *task)
+            continue
+        logger.info("Prepared %s of %s subjobs" % (len(tasks) - preparation.pending, len(tasks)))
+
+    logger.debug("Prepared %s subjobs of job %s in %.1fs" % (len(tasks), fqid, time.time() - start))
+
+    if preparation.error is not None:
+        raise preparation.error
+    return preparation.results
@@ -11,7 +11,7 @@ from Ganga.Utility.external.OrderedDict import OrderedDict as oDict
 from Ganga.Core.exceptions import GangaException
 from Ganga.Core.GangaRepository.Registry import Registry, RegistryKeyError, RegistryAccessError, RegistryFlusher
 
-from Ganga.GPIDev.Base.Proxy import stripProxy, isType
+from Ganga.GPIDev.Base.Proxy import stripProxy, isType, getName
 
 import Ganga.Utility.logging
 
@@ -49,6 +49,10 @@ class JobRegistry(Registry):
             #print("cv: %s" % str(cv))
             cache[cv] = getattr(obj, cv)
             #logger.info("Setting: %s = %s" % (str(cv), str(cache[cv])))
+        # What select() compares components by, these keys mustn't be attribute names as the index cache stands in for
+        # the attributes of objects which aren't loaded
+        for component in ['backend', 'application']:
+            cache["class:" + component] = getName(getattr(obj, component))
         this_slice = JobRegistrySlice("jobs")
         for dpv in this_slice._display_columns:
             #logger.debug("Storing: %s" % str(dpv))
@@ -62,9 +66,8 @@ class JobRegistry(Registry):
         # store subjob status
         if hasattr(obj, "subjobs"):
             cache["subjobs:status"] = []
-            if hasattr(obj.subjobs, "getAllCachedData"):
-                for sj in obj.subjobs.getAllCachedData():
-                    cache["subjobs:status"].append(sj['status'])
+            if hasattr(obj.subjobs, "getAllSJStatus"):
+                cache["subjobs:status"] = obj.subjobs.getAllSJStatus()
             else:
                 for sj in obj.subjobs:
                     cache["subjobs:status"].append(sj.status)
@@ -72,6 +75,9 @@ class JobRegistry(Registry):
         #print("Cache: %s" % str(cache))
         return cache
 
+    def getIndexedAttributes(self):
+        return {'status': 'status', 'name': 'name', 'backend': 'class:backend', 'application': 'class:application'}
+
     def startup(self):
         self._needs_metadata = True
         super(JobRegistry, self).startup()
@@ -19,6 +19,47 @@ logger = getLogger()
 
 config = Ganga.Utility.Config.getConfig('Display')
 
+
+class _SelectPredicate(object):
+
+    """ One attribute=value condition of a select(), worked out once for all the objects it is tested on """
+
+    def __init__(self, attr, value, item):
+        """
+        Args:
+            attr (str): the attribute
+            value (unknown): the value given to select(), a pattern with wildcards for strings
+            item (Item): the schema item of the attribute
+        """
+        self.attr = attr
+        self.is_component = item.isA(ComponentItem)
+        if self.is_component:
+            ## TODO we need to distinguish between passing a Class type and a defined class instance
+            ## If we passed a class type to select it should look only for classes which are of this type
+            ## If we pass a class instance a compartison of the internal attributes should be performed
+            from Ganga.GPIDev.Base.Filters import allComponentFilters
+            filtered_value = allComponentFilters[item['category']](value, item)
+            self._value = getName(filtered_value) if filtered_value is not None else getName(value)
+        elif isinstance(value, str):
+            self._regex = re.compile(fnmatch.translate(value))
+        else:
+            self._value = value
+        self._is_pattern = not self.is_component and isinstance(value, str)
+
+    def valueOf(self, obj):
+        """ Returns the value of the attribute of obj in the form matches() takes, the class name for components """
+        value = getattr(obj, self.attr)
+        if self.is_component:
+            return getName(value)
+        return value
+
+    def matches(self, value):
+        """ Whether a value of the attribute, as returned by valueOf, is selected """
+        if self._is_pattern:
+            return self._regex.match(str(value)) is not None
+        return value == self._value
+
+
 class RegistrySlice(object):
 
     def __init__(self, name, display_prefix):
@@ -198,92 +239,85 @@ class RegistrySlice(object):
                 maxid = sys.maxsize
             select = select_by_range
 
-        for this_id in self.objects.keys():
+        # The conditions are worked out once for each class of object rather than for each object
+        predicates_by_schema = {}
+
+        def getPredicates(obj):
+            schema = obj._schema
+            if schema not in predicates_by_schema:
+                predicates = []
+                for a in attrs:
+                    if a == 'ids':
+                        continue
+                    try:
+                        item = schema.getItem(a)
+                        logger.debug("Here: %s, is item: %s" % (a, type(item)))
+                    except KeyError as err:
+                        from Ganga.GPIDev.Base import GangaAttributeError
+                        logger.debug("KeyError getting item: '%s' from schema" % a)
+                        raise GangaAttributeError('undefined select attribute: %s' % a)
+                    predicates.append(_SelectPredicate(a, attrs[a], item))
+                predicates_by_schema[schema] = predicates
+            return predicates_by_schema[schema]
+
+        all_ids = self.objects.keys()
+
+        # Objects which aren't loaded are only looked at if the values in their index cache may match
+        query_index = None
+        candidates = None
+        if self.name != 'box':
+            query_index = getattr(getattr(self.objects, 'repository', None), 'query_index', None)
+        if query_index is not None and all_ids:
+            for predicate in getPredicates(self.objects[all_ids[0]]):
+                if predicate.attr in query_index.fields:
+                    matching = query_index.candidates(predicate.attr, predicate.matches)
+                    candidates = matching if candidates is None else candidates & matching
+
+        for this_id in all_ids:
+            if not select(int(this_id)):
+                continue
+            if candidates is not None and this_id not in candidates and this_id in query_index:
+                continue
             obj = self.objects[this_id]
-            logger.debug("id, obj: %s, %s" % (this_id, obj))
-            if select(int(this_id)):
-                logger.debug("Selected: %s" % this_id)
-                selected = True
-                if self.name == 'box':
-                    name_str = obj._getRegistry()._getName(obj)
-                else:
-                    name_str = ''
+            selected = True
+            if self.name == 'box':
+                name_str = obj._getRegistry()._getName(obj)
                 for a in attrs:
-                    if self.name == 'box':
-                        attrvalue = attrs[a]
-                        if a == 'name':
-                            if not fnmatch.fnmatch(name_str, attrvalue):
-                                selected = False
-                                break
-                        elif a == 'application':
-                            if hasattr(obj, 'application'):
-                                if not getName(obj.application) == attrvalue:
-                                    selected = False
-                                    break
-                            else:
-                                selected = False
-                                break
-                        elif a == 'type':
-                            if not getName(obj) == attrvalue:
+                    attrvalue = attrs[a]
+                    if a == 'name':
+                        if not fnmatch.fnmatch(name_str, attrvalue):
+                            selected = False
+                            break
+                    elif a == 'application':
+                        if hasattr(obj, 'application'):
+                            if not getName(obj.application) == attrvalue:
                                 selected = False
                                 break
                         else:
-                            from Ganga.GPIDev.Base import GangaAttributeError
-                            raise GangaAttributeError(
-                                'undefined select attribute: %s' % a)
+                            selected = False
+                            break
+                    elif a == 'type':
+                        if not getName(obj) == attrvalue:
+                            selected = False
+                            break
                     else:
-
-                        if a == 'ids':
-                            if int(this_id) not in attrs['ids']:
-                                selected = False
-                                break
-                        else:
-                            try:
-                                item = obj._schema.getItem(a)
-                                logger.debug("Here: %s, is item: %s" % (a, type(item)))
-                            except KeyError as err:
-                                from Ganga.GPIDev.Base import GangaAttributeError
-                                logger.debug("KeyError getting item: '%s' from schema" % a)
-                                raise GangaAttributeError('undefined select attribute: %s' % a)
-                            else:
-                                attrvalue = attrs[a]
-
-                                if item.isA(ComponentItem):
-                                    ## TODO we need to distinguish between passing a Class type and a defined class instance
-                                    ## If we passed a class type to select it should look only for classes which are of this type
-                                    ## If we pass a class instance a compartison of the internal attributes should be performed
-                                    from Ganga.GPIDev.Base.Filters import allComponentFilters
-
-                                    cfilter = allComponentFilters[item['category']]
-                                    filtered_value = cfilter(attrs[a], item)
-                                    from Ganga.GPIDev.Base.Proxy import getName
-                                    if not filtered_value is None:
-                                        attrvalue = getName(filtered_value)
-                                    else:
-                                        attrvalue = getName(attrvalue)
-
-                                    if getName(getattr(obj, a)) != attrvalue:
-                                        selected = False
-                                        break
-                                else:
-                                    if isinstance(attrvalue, str):
-                                        regex = fnmatch.translate(attrvalue)
-                                        reobj = re.compile(regex)
-                                        # Compare the type of the attribute
-                                        # against attrvalue
-                                        if not reobj.match(str(getattr(obj, a))):
-                                            selected = False
-                                    else:
-                                        if getattr(obj, a) != attrvalue:
-                                            selected = False
-                                            break
-                if selected:
-                    logger.debug("Actually Selected")
-                    callback(this_id, obj)
-                else:
-                    logger.debug("NOT Actually Selected")
+                        from Ganga.GPIDev.Base import GangaAttributeError
+                        raise GangaAttributeError(
+                            'undefined select attribute: %s' % a)
             else:
-                logger.debug("NOT Selected: %s" % this_id)
+                if 'ids' in attrs and int(this_id) not in attrs['ids']:
+                    selected = False
+                else:
+                    for predicate in getPredicates(obj):
+                        # The index cache gives the values of objects which aren't loaded without loading them
+                        known, value = query_index.value(this_id, predicate.attr) if query_index is not None else (False, None)
+                        if not known:
+                            value = predicate.valueOf(obj)
+                        if not predicate.matches(value):
+                            selected = False
+                            break
+            if selected:
+                callback(this_id, obj)
 
     def copy(self, keep_going):
         this_slice = self.__class__("copy of %s" % self.name)
@@ -35,6 +35,12 @@ _stored_defaults = {}
 _stored_options = {}
 _stored_configs = {}
 
+# How the default value of an attribute is made for a new object, see SchemaTable
+_DEFAULT_AS_IS, _DEFAULT_STORE, _DEFAULT_COPY, _DEFAULT_STORE_COPY, _DEFAULT_CALL, _DEFAULT_NEW_OBJECT = range(6)
+
+# Default values of these types are never copied
+_immutable_types = frozenset([str, unicode, int, long, float, bool, type(None)])
+
 #
 # Ganga Public Interface Schema
 #
@@ -102,12 +108,13 @@ class Schema(object):
     # datadict: dictionary of properties (schema items) Defaults to '{}'
     # version: the version information
 
-    __slots__ = ('datadict', 'version', '_pluginclass')
+    __slots__ = ('datadict', 'version', '_pluginclass', '_table')
 
     def __init__(self, version, datadict=None):
         self.datadict = datadict or {}
         self.version = version
         self._pluginclass = None
+        self._table = None
 
     def __getitem__(self, name):
         try:
@@ -229,7 +236,10 @@ class Schema(object):
         self, myself a Schema
         make_copy, should I return the default object of a deepcopy of it?
         """
-        returnable = self._getDefaultValueInternal(attr)
+        how, returnable = self._getDefaultRecipe(attr)
+        if how == _DEFAULT_CALL:
+            # Components given by name or class are built by each call, there is no need to build another one
+            return returnable()
         if make_copy and returnable is not None:
             from Ganga.GPIDev.Base.Objects import GangaObject
             if isinstance(returnable, GangaObject):
@@ -243,6 +253,14 @@ class Schema(object):
         """ Get the default value of a schema item, both simple and component.
         If check is True then val is used instead of default value: this is used to check if the val may be used as a default value (e.g. if it is OK to use it as a value in the config file)
         """
+        how, value = self._getDefaultRecipe(attr, val, check)
+        if how == _DEFAULT_CALL:
+            return value()
+        return value
+
+    def _getDefaultRecipe(self, attr, val=None, check=False):
+        """ As _getDefaultValueInternal, returns (_DEFAULT_CALL, class) for the components built by calling their
+        class and (_DEFAULT_AS_IS, default value) for anything else """
         def_name = defaultConfigSectionName(self.name)
 
         item = self.getItem(attr)
@@ -315,7 +333,7 @@ class Schema(object):
                             assert(item['optional'])
                         except AssertionError:
                             raise SchemaError("This item '%s' is not a sequence, doesn't have a load_default and is not optional. This is unsupported!" % type(item))
-                        return None
+                        return _DEFAULT_AS_IS, None
 
                 # if a defvalue of a component item is an object (not string) just process it as for SimpleItems (useful for FileItems)
                 # otherwise do a lookup via plugin registry
@@ -331,13 +349,99 @@ class Schema(object):
 
                     if category not in _found_components or has_modified:
                         _found_components[category] = allPlugins.find(category, defvalue)
-                    return _found_components[category]()
+                    return _DEFAULT_CALL, _found_components[category]
                 if isclass(defvalue):
-                    return defvalue()
+                    return _DEFAULT_CALL, defvalue
 
         # If needed/requested make a copy of the function elsewhwre
-        return defvalue
+        return _DEFAULT_AS_IS, defvalue
+
+    def getDefaultsTable(self):
+        """ Returns the entries of the SchemaTable of the class, the defaults are resolved again if their config section
+        has changed since they were last resolved """
+        table = self._table
+        if table is None:
+            table = self._table = SchemaTable(self)
+        return table.entries()
+
+
+class SchemaTable(object):
 
+    """
+    The attributes of a class which new objects get a default value for, in order, with how to make each value.
+    The ObjectMetaclass builds one for each class. The defaults are looked up in the [defaults_<class>] config section
+    when the first object is made and again only once that section has changed, so making an object doesn't go back to
+    the config or copy immutable defaults
+    """
+
+    __slots__ = ('schema', 'items', '_config', '_resolved')
+
+    def __init__(self, schema):
+        """
+        Args:
+            schema (Schema): the schema of the class
+        """
+        self.schema = schema
+        # Attributes with a getter have no storage so they get no default
+        self.items = tuple((name, item) for name, item in schema.allItems() if item['getter'] is None)
+        self._config = None
+        # (generation of the config section, entries)
+        self._resolved = None
+
+    def entries(self):
+        """ Returns a (name, how, value) tuple for each attribute, newDefaultValue(how, value) makes the default """
+        # Until the bootstrap is over the config may change without telling us
+        if not Config._after_bootstrap:
+            return self._resolve()
+        if self._config is None:
+            try:
+                self._config = Config.getConfig(defaultConfigSectionName(self.schema.name))
+            except KeyError:
+                # The defaults only come from the schema
+                self._config = False
+        generation = self._config.generation if self._config else 0
+        resolved = self._resolved
+        if resolved is None or resolved[0] != generation:
+            resolved = self._resolved = (generation, self._resolve())
+        return resolved[1]
+
+    def _resolve(self):
+        """ Work out the entries from the current defaults """
+        from Ganga.GPIDev.Base.Objects import GangaObject
+        cls = self.schema._pluginclass
+        # The class has nothing to say about the values set
+        plain_setattr = cls is None or cls.__setattr__ is object.__setattr__
+        entries = []
+        for name, item in self.items:
+            how, value = self.schema._getDefaultRecipe(name)
+            if how == _DEFAULT_AS_IS:
+                # Values can be stored without going through the descriptor if it would store them unchanged
+                store = plain_setattr and not isinstance(item, ComponentItem) and not item['checkset'] and not item['filter']
+                if isinstance(value, GangaObject):
+                    how = _DEFAULT_NEW_OBJECT
+                elif type(value) not in _immutable_types:
+                    # Sequences are turned into GangaLists
+                    how = _DEFAULT_STORE_COPY if store and not item['sequence'] else _DEFAULT_COPY
+                elif store and not (isinstance(value, str) and value):
+                    # Non-empty strings may be evaluated by the descriptor
+                    how = _DEFAULT_STORE
+            entries.append((name, how, value))
+        return tuple(entries)
+
+
+def newDefaultValue(how, value):
+    """ Returns the default value of an attribute for a new object, which nothing else refers to unless it is immutable
+    Args:
+        how (int): how to make the value, from SchemaTable.entries
+        value (unknown): the default or the class of the default, from SchemaTable.entries
+    """
+    if how == _DEFAULT_AS_IS or how == _DEFAULT_STORE:
+        return value
+    if how == _DEFAULT_COPY or how == _DEFAULT_STORE_COPY:
+        return copy.deepcopy(value)
+    if how == _DEFAULT_CALL:
+        return value()
+    return value.__class__.getNew(should_init=True)
 
 # Items in schema may be either Components,Simples, Files or BindingItems.
 #
@@ -464,34 +464,27 @@ class Batch(IBackend):
         reactualCE = re.compile(r'^ACTUALCE: (?P<actualCE>\S+)', re.M)
         reexit = re.compile(r'^EXITCODE: (?P<exitcode>\d+)', re.M)
 
+        from Ganga.Core.MonitoringComponent.StatusFileWatcher import getStatusFileWatcher
+        watcher = getStatusFileWatcher()
+
         def get_last_alive(f):
             """Time since the statusfile was last touched in seconds"""
-            import os.path
             import time
             talive = 0
             try:
-                talive = time.time() - os.path.getmtime(f)
+                talive = time.time() - watcher.lastModified(f)
             except OSError as x:
                 logger.debug('Problem reading status file: %s (%s)', f, str(x))
 
             return talive
 
-        def get_status(f):
-            """Give (pid,queue,actualCE,exit code) for job"""
+        def parse_status(stat):
+            """Give (pid,queue,actualCE,exit code) from the content of the status file"""
 
             pid, queue, actualCE, exitcode = None, None, None, None
 
-            import re
-            statusfile = None
-            try:
-                statusfile = open(f)
-                stat = statusfile.read()
-            except IOError as x:
-                logger.debug('Problem reading status file: %s (%s)', f, str(x))
+            if stat is None:
                 return pid, queue, actualCE, exitcode
-            finally:
-                if statusfile:
-                    statusfile.close()
 
             mpid = repid.search(stat)
             if mpid:
@@ -512,16 +505,37 @@ class Batch(IBackend):
             return pid, queue, actualCE, exitcode
 
         from Ganga.Utility.Config import getConfig
+        from Ganga.Lib.Batch.BulkStatusQuery import getBulkStatusQuery, parseStatusLines
+
+        # State of all the jobs of the user according to the batch system, from a single listing shared by the whole poll
+        batch_states = None
+        if jobs:
+            config = getConfig(getName(jobs[0].backend))
+            if config['status_str']:
+                batch_states = getBulkStatusQuery().getStates(config['status_str'],
+                                                              lambda output: parseStatusLines(output, config['status_res_pattern']))
+
         for j in jobs:
+            batch_state = None
+            if batch_states is not None and j.backend.id:
+                raw_state = batch_states.get(str(j.backend.id))
+                if raw_state is not None:
+                    batch_state = getConfig(getName(j.backend))['status_map'].get(raw_state)
+                    if j.backend.status != raw_state:
+                        j.backend.status = raw_state
+                if j.status == 'submitted' and batch_state == 'submitted':
+                    # Still queued, there is nothing in the status files yet
+                    continue
+
             stripProxy(j)._getSessionLock()
             outw = j.getOutputWorkspace()
 
             statusfile = os.path.join(outw.getPath(), '__jobstatus__')
             heartbeatfile = os.path.join(outw.getPath(), '__heartbeat__')
-            pid, queue, actualCE, exitcode = get_status(statusfile)
+            pid, queue, actualCE, exitcode = watcher.read(statusfile, parse_status)
 
             if j.status == 'submitted':
-                if pid or queue:
+                if pid or queue or batch_state == 'running':
                     j.updateStatus('running')
 
                     if pid:
@@ -541,7 +555,8 @@ class Batch(IBackend):
                         j.updateStatus('completed')
                     else:
                         j.updateStatus('failed')
-                else:
+                    watcher.forget(outw.getPath())
+                elif batch_state != 'running':
                     # Job is still running. Check if alive
                     time = get_last_alive(heartbeatfile)
                     config = getConfig(getName(j.backend))
@@ -549,6 +564,7 @@ class Batch(IBackend):
                         logger.warning(
                             'Job %s has disappeared from the batch system.', str(j.getFQID('.')))
                         j.updateStatus('failed')
+                        watcher.forget(outw.getPath())
 
 #_________________________________________________________________________
 
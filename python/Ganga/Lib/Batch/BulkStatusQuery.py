@@ -0,0 +1,120 @@
+"""
+One status listing of the batch system (bjobs, qstat, condor_q...) shared by all the jobs monitored in a poll.
+
+The monitoring calls updateMonitoringInformation of a backend for blocks of [PollThread]numParallelJobs jobs,
+possibly from several threads at once. Rather than running a command for every job or every block, the output
+of the listing command is kept for [PollThread]batchStatusMaxAge seconds and parsed once into {batch id: state}.
+A listing which takes longer than [PollThread]batchStatusTimeout seconds is killed and counts as failed, the backends
+then fall back to checking their jobs one by one.
+"""
+
+import os
+import re
+import time
+import threading
+import subprocess
+
+from Ganga.Utility.Config import getConfig
+from Ganga.Utility.logging import getLogger
+from Ganga.Utility.execute import start_timer
+
+logger = getLogger()
+
+
+def parseStatusLines(output, pattern):
+    """ Returns {id: state} for all the lines of the output matching the pattern
+    Args:
+        output (str): output of the listing command
+        pattern (str): regular expression with the named groups 'id' and 'status'
+    """
+    states = {}
+    for m in re.finditer(pattern, output, re.M):
+        states[m.group('id')] = m.group('status')
+    return states
+
+
+class BulkStatusQuery(object):
+
+    """
+    Runs batch system listing commands, at most once every max_age seconds for a given command
+    """
+
+    def __init__(self):
+        super(BulkStatusQuery, self).__init__()
+        self._lock = threading.Lock()
+        # command -> lock held while the command runs, callers asking for the same listing wait for it
+        self._command_locks = {}
+        # command -> (time the command was run, {id: state} or None if it failed)
+        self._results = {}
+        self.stats = {'queries': 0, 'cached': 0, 'failures': 0, 'timeouts': 0}
+
+    def _run(self, command, timeout):
+        """ Returns the output of the command or None if it failed or timed out
+        Args:
+            command (str): the shell command listing the jobs
+            timeout (float): seconds after which the command is killed, None to wait for it
+        """
+        logger.debug("Querying the batch system: %s" % command)
+        try:
+            # In a session of its own so that the timer kills the whole process group
+            proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    preexec_fn=os.setsid)
+        except OSError as err:
+            logger.debug("Batch status query '%s' failed: %s" % (command, err))
+            return None
+        timer, timed_out = start_timer(proc, timeout)
+        output, error = proc.communicate()
+        timer.cancel()
+        if timed_out.isSet():
+            logger.warning("Batch status query '%s' took more than %ss and was killed" % (command, timeout))
+            self.stats['timeouts'] += 1
+            return None
+        if proc.returncode != 0:
+            logger.debug("Batch status query '%s' exited with %s: %s" % (command, proc.returncode, error))
+            return None
+        return output
+
+    def getStates(self, command, parser, max_age=None, timeout=None):
+        """ Returns the {id: state} parsed from the output of the command, or None if the command failed or timed out
+        Args:
+            command (str): the shell command listing the jobs
+            parser (function): turns the output of the command into {id: state}
+            max_age (float): how old a previous result can be, [PollThread]batchStatusMaxAge by default
+            timeout (float): seconds after which the command is killed, [PollThread]batchStatusTimeout by default
+        """
+        if max_age is None:
+            max_age = getConfig('PollThread')['batchStatusMaxAge']
+        if timeout is None:
+            timeout = getConfig('PollThread')['batchStatusTimeout']
+
+        with self._lock:
+            command_lock = self._command_locks.setdefault(command, threading.Lock())
+
+        with command_lock:
+            result = self._results.get(command)
+            if result is not None and time.time() - result[0] < max_age:
+                self.stats['cached'] += 1
+                return result[1]
+
+            query_time = time.time()
+            output = self._run(command, timeout)
+            self.stats['queries'] += 1
+            if output is None:
+                self.stats['failures'] += 1
+                states = None
+            else:
+                states = parser(output)
+            self._results[command] = (query_time, states)
+            return states
+
+    def clear(self):
+        """ Forget all the previous results """
+        with self._lock:
+            self._results = {}
+
+_bulk_status_query = BulkStatusQuery()
+
+
+def getBulkStatusQuery():
+    """ Returns the BulkStatusQuery shared by all the backends """
+    return _bulk_status_query
@@ -44,22 +44,33 @@ class FileChecker(IFileChecker):
         filepaths = self.findFiles(job)
         if not len(filepaths):
             raise PostProcessException('None of the files to check exist, FileChecker will do nothing!')
+        patterns = [(searchString, re.compile(searchString)) for searchString in self.searchStrings]
+        # All the search strings together, a line not matching this matches none of them. Only used if none of them
+        # has groups, as a back reference could refer to the wrong group once they're put together.
+        anyPattern = None
+        if not any(pattern.groups for searchString, pattern in patterns):
+            anyPattern = re.compile('|'.join('(?:%s)' % searchString for searchString in self.searchStrings))
         for filepath in filepaths:
-            for searchString in self.searchStrings:
-                stringFound = False
-                # self.findFiles() guarantees that file at filepath exists,
-                # hence no exception handling
-                with open(filepath) as file:
-                    for line in file:
-                        if re.search(searchString, line):
+            # Each file is read once whatever the number of search strings, until the outcome is known
+            notFound = list(patterns)
+            # self.findFiles() guarantees that file at filepath exists,
+            # hence no exception handling
+            with open(filepath) as file:
+                for line in file:
+                    if anyPattern is not None and not anyPattern.search(line):
+                        continue
+                    for searchString, pattern in list(notFound):
+                        if pattern.search(line):
                             if self.failIfFound is True:
                                 logger.info(
                                     'The string %s has been found in file %s, FileChecker will fail job(%s)', searchString, filepath, job.fqid)
                                 return self.failure
-                            stringFound = True
-                if not stringFound and self.failIfFound is False:
-                    logger.info('The string %s has not been found in file %s, FileChecker will fail job(%s)', searchString, filepath, job.fqid)
-                    return self.failure
+                            notFound.remove((searchString, pattern))
+                    if not notFound:
+                        break
+            if notFound and self.failIfFound is False:
+                logger.info('The string %s has not been found in file %s, FileChecker will fail job(%s)', notFound[0][0], filepath, job.fqid)
+                return self.failure
         return self.result
 
 
@@ -69,6 +69,7 @@ from Ganga.Utility.ColourText import Foreground, Effects
 
 import Ganga.Utility.logging
 from Ganga.Utility.Config import getConfig
+from Ganga.Lib.Batch.BulkStatusQuery import getBulkStatusQuery
 
 import commands
 import inspect
@@ -186,6 +187,10 @@ class Condor(IBackend):
                         self.id = qoutput
                     break
 
+        if self.id:
+            # A listing of the queue made before the job existed would show it as finished
+            getBulkStatusQuery().clear()
+
         return not self.id is ""
 
     def resubmit(self):
@@ -449,29 +454,47 @@ class Condor(IBackend):
                 "-format \"%d \" JobStatus",
                 "-format \"%f\\n\" RemoteUserCpu"
             ])
-        status, output = commands.getstatusoutput(queryCommand)
-        if 0 != status:
-            logger.error("Problem retrieving status for Condor jobs")
-            return
 
-        if ("All queues are empty" == output):
-            infoList = []
-        else:
-            infoList = output.split("\n")
-
-        allDict = {}
-        for infoString in infoList:
-            tmpList = infoString.split()
-            id, host, status, cputime = ("", "", "", "")
-            if 3 == len(tmpList):
-                id, status, cputime = tmpList
-            if 4 == len(tmpList):
-                id, host, status, cputime = tmpList
-            if id:
-                allDict[id] = {}
-                allDict[id]["status"] = Condor.statusDict[status]
-                allDict[id]["cputime"] = cputime
-                allDict[id]["host"] = host
+        def parse_queue(output):
+            """Give {GlobalJobId: {'status', 'cputime', 'host'}} from the output of condor_q"""
+            if ("All queues are empty" == output):
+                infoList = []
+            else:
+                infoList = output.split("\n")
+
+            allDict = {}
+            for infoString in infoList:
+                tmpList = infoString.split()
+                id, host, status, cputime = ("", "", "", "")
+                if 3 == len(tmpList):
+                    id, status, cputime = tmpList
+                if 4 == len(tmpList):
+                    id, host, status, cputime = tmpList
+                if id:
+                    allDict[id] = {}
+                    allDict[id]["status"] = Condor.statusDict.get(status, status)
+                    allDict[id]["cputime"] = cputime
+                    allDict[id]["host"] = host
+            return allDict
+
+        # The queue is listed once and shared by all the blocks of jobs monitored in this poll
+        allDict = getBulkStatusQuery().getStates(queryCommand, parse_queue)
+        if allDict is None:
+            # The listing failed or timed out, ask about the jobs of this block one by one
+            allDict = {}
+            for id in idList:
+                jobInfo = getBulkStatusQuery().getStates(" ".join([queryCommand, id.split("#")[-1]]), parse_queue)
+                if jobInfo is None:
+                    logger.error("Problem retrieving status for Condor jobs")
+                    return
+                allDict.update(jobInfo)
+
+        # GlobalJobId is <schedd>#<cluster>.<proc>#<timestamp>
+        localToGlobal = {}
+        for globalId in allDict:
+            idElements = globalId.split("#")
+            if 3 == len(idElements):
+                localToGlobal[idElements[1]] = globalId
 
         fg = Foreground()
         fx = Effects()
@@ -489,16 +512,7 @@ class Condor(IBackend):
             globalId = id
 
             if globalId == localId:
-                queryCommand = " ".join\
-                    ([
-                        "condor_q -global" if getConfig(
-                            "Condor")["query_global_queues"] else "condor_q",
-                        "-format \"%s\" GlobalJobId",
-                        id
-                    ])
-                status, output = commands.getstatusoutput(queryCommand)
-                if 0 == status:
-                    globalId = output
+                globalId = localToGlobal.get(localId, localId)
 
             if globalId in allDict.keys():
                 status = allDict[globalId]["status"]
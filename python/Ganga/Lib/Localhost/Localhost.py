@@ -283,28 +283,21 @@ class Localhost(IBackend):
     @staticmethod
     def updateMonitoringInformation(jobs):
 
-        def get_exit_code(f):
-            import re
-            with open(f) as statusfile:
-                stat = statusfile.read()
-            m = re.compile(
-                r'^EXITCODE: (?P<exitcode>-?\d*)', re.M).search(stat)
-
-            if m is None:
-                return None
-            else:
-                return int(m.group('exitcode'))
-
-        def get_pid(f):
-            import re
-            with open(f) as statusfile:
-                stat = statusfile.read()
-            m = re.compile(r'^PID: (?P<pid>\d*)', re.M).search(stat)
-
-            if m is None:
-                return None
-            else:
-                return int(m.group('pid'))
+        def parse_status(stat):
+            """Give (pid, exit code) from the content of the status file"""
+            pid, exitcode = None, None
+            if stat is None:
+                return pid, exitcode
+            m = re.search(r'^PID: (?P<pid>\d*)', stat, re.M)
+            if m is not None and m.group('pid'):
+                pid = int(m.group('pid'))
+            m = re.search(r'^EXITCODE: (?P<exitcode>-?\d*)', stat, re.M)
+            if m is not None and m.group('exitcode'):
+                exitcode = int(m.group('exitcode'))
+            return pid, exitcode
+
+        from Ganga.Core.MonitoringComponent.StatusFileWatcher import getStatusFileWatcher
+        watcher = getStatusFileWatcher()
 
         logger.debug('local ping: %s', str(jobs))
 
@@ -314,18 +307,13 @@ class Localhost(IBackend):
             # try to get the application exit code from the status file
             try:
                 statusfile = os.path.join(outw.getPath(), '__jobstatus__')
+                pid, exitcode = watcher.read(statusfile, parse_status)
                 if j.status == 'submitted':
-                    pid = get_pid(statusfile)
                     if pid:
                         j.backend.id = pid
                         #logger.info('Local job %s status changed to running, pid=%d',j.getFQID('.'),pid)
                         j.updateStatus('running')  # bugfix: 12194
-                exitcode = get_exit_code(statusfile)
-                with open(statusfile) as status_file:
-                    logger.debug('status file: %s %s', statusfile, status_file.read())
-            except IOError as x:
-                logger.debug('problem reading status file: %s (%s)', statusfile, str(x))
-                exitcode = None
+                logger.debug('status file: %s pid=%s exitcode=%s', statusfile, pid, exitcode)
             except Exception as x:
                 logger.critical('problem during monitoring: %s', str(x))
                 import traceback
@@ -358,6 +346,7 @@ class Localhost(IBackend):
                     j.updateStatus('completed')
                 else:
                     j.updateStatus('failed')
+                watcher.forget(outw.getPath())
 
                 #logger.info('Local job %s finished with exitcode %d',j.getFQID('.'),exitcode)
 
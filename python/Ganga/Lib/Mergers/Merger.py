@@ -16,11 +16,19 @@ from Ganga.Utility.Plugin import allPlugins
 from Ganga.Utility.logging import getLogger
 import commands
 import os
+import pipes
+import shutil
 import string
 import copy
+import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
 
 logger = getLogger()
 
+# Serialises the updates of the lists of files waiting for an incremental merge by RootMerger
+_incremental_lock = threading.Lock()
+
 
 def getMergerObject(file_ext):
     """Returns an instance of the correct merger tool, or None if there is not one"""
@@ -92,7 +100,12 @@ class TextMerger(IMerger):
     For large text files it may be desirable to compress the merge
     result using gzip. This can be done by setting the compress
     flag on the TextMerger object. In this case, the merged file
-    will have a '.gz' appended to its filename.
+    will have a '.gz' appended to its filename. Setting compress_threads
+    compresses blocks of the output from several threads at once, the result
+    is still read by gzip as usual.
+
+    tm.compress = True #False by default
+    tm.compress_threads = 4 #1 by default
 
     A summary of all the files merged will be created for each entry in files.
     This will be created when the merge of those files completes
@@ -106,38 +119,47 @@ class TextMerger(IMerger):
     _schema = IMerger._schema.inherit_copy()
     _schema.datadict['compress'] = SimpleItem(
         defvalue=False, doc='Output should be compressed with gzip.')
+    _schema.datadict['compress_threads'] = SimpleItem(
+        defvalue=1, doc='Number of threads compressing the output at the same time.', typelist=[int])
 
     def mergefiles(self, file_list, output_file):
 
         import time
+        import gzip
+        from Ganga.Utility.files import copy_stream, ParallelGzipWriter
 
         if self.compress or output_file.lower().endswith('.gz'):
             # use gzip
-            import gzip
             if not output_file.lower().endswith('.gz'):
                 output_file += '.gz'
-            out_file = gzip.GzipFile(output_file, 'w')
+            if self.compress_threads > 1:
+                out_file = ParallelGzipWriter(output_file, threads=self.compress_threads)
+            else:
+                out_file = gzip.GzipFile(output_file, 'w')
         else:
             out_file = open(output_file, 'w')
 
-        out_file.write('# Ganga TextMergeTool - %s #\n' % time.asctime())
-        for f in file_list:
-
-            if not f.lower().endswith('.gz'):
-                in_file = open(f)
-            else:
-                import gzip
-                in_file = gzip.GzipFile(f)
+        try:
+            out_file.write('# Ganga TextMergeTool - %s #\n' % time.asctime())
+            for f in file_list:
 
-            out_file.write('# Start of file %s #\n' % str(f))
-            out_file.write(in_file.read())
-            out_file.write('\n')
+                if not f.lower().endswith('.gz'):
+                    in_file = open(f)
+                else:
+                    in_file = gzip.GzipFile(f)
 
-            in_file.close()
+                out_file.write('# Start of file %s #\n' % str(f))
+                # The files are copied a piece at a time as they may be too large to read into memory
+                try:
+                    copy_stream(in_file, out_file)
+                finally:
+                    in_file.close()
+                out_file.write('\n')
 
-        out_file.write('# Ganga Merge Ended Successfully #\n')
-        out_file.flush()
-        out_file.close()
+            out_file.write('# Ganga Merge Ended Successfully #\n')
+            out_file.flush()
+        finally:
+            out_file.close()
 
 
 class RootMerger(IMerger):
@@ -179,6 +201,22 @@ class RootMerger(IMerger):
     If ignorefailed or overwrite are set then they override the
     values set on the merge object.
 
+    hadd is given at most fanin files at a time. More files are merged as a
+    tree: groups of fanin files are merged into partial results, up to
+    parallel of them at the same time, which are merged in turn.
+
+    rm.fanin = 64 #default
+    rm.parallel = 4 #default
+
+    If the incremental flag is set, the files of the subjobs are merged into
+    partial results in groups of fanin as the subjobs complete, so only the
+    partial results and the files of the last subjobs are left to merge when
+    the job completes. The partial results are kept next to the output file
+    in a directory with the '.incremental' extension appended, which is
+    removed once the merge is done.
+
+    rm.incremental = True #False by default
+
     A summary of all the files merged will be created for each entry in files.
     This will be created when the merge of those files completes
     successfully. The name of this is the same as the output file, with the
@@ -195,9 +233,111 @@ class RootMerger(IMerger):
     _schema = IMerger._schema.inherit_copy()
     _schema.datadict['args'] = SimpleItem(defvalue=None, doc='Arguments to be passed to hadd.',
                                           typelist=[str, None])
-
-    def mergefiles(self, file_list, output_file):
-
+    _schema.datadict['fanin'] = SimpleItem(defvalue=64, doc='Maximum number of files given to one hadd, more files are '
+                                           'merged as a tree of partial merges.', typelist=[int])
+    _schema.datadict['parallel'] = SimpleItem(defvalue=4, doc='Number of partial merges run at the same time.',
+                                              typelist=[int])
+    _schema.datadict['incremental'] = SimpleItem(defvalue=False, doc='Merge the files of the subjobs into partial '
+                                                 'results as they complete.')
+
+    def execute(self, job, newstatus):
+        """
+        Merge the files of a subjob which completed into a partial result if incremental is set, otherwise as any merger
+        """
+        if self.incremental and job.master is not None:
+            if newstatus == 'completed':
+                try:
+                    self.mergeIncrement(job)
+                except PostProcessException as err:
+                    # The files not in a partial result are merged when the job completes
+                    logger.warning('Incremental merge of the output of Job %s failed: %s', job.fqid, err)
+            return True
+        return super(RootMerger, self).execute(job, newstatus)
+
+    def mergeIncrement(self, job):
+        """
+        Add the files of a completed subjob to those waiting to be merged into partial results of the merge of its
+        master job, and merge them once there are fanin of them
+        Args:
+            job (Job): the subjob
+        """
+        import glob
+        merge_cmd = None
+        for f in self.files:
+            for matchedFile in glob.glob(os.path.join(job.outputdir, f)):
+                output_file = os.path.join(job.master.outputdir, os.path.relpath(matchedFile, job.outputdir))
+                state_dir = output_file + '.incremental'
+                pending_file = os.path.join(state_dir, 'pending')
+                with _incremental_lock:
+                    if not os.path.isdir(state_dir):
+                        os.makedirs(state_dir)
+                    batch = []
+                    if os.path.exists(pending_file):
+                        with open(pending_file) as pending:
+                            batch = [line.strip() for line in pending if line.strip()]
+                    # The postprocessors of a subjob may run again (e.g. after a resubmit) before the batch is merged
+                    if matchedFile in batch:
+                        continue
+                    with open(pending_file, 'a') as pending:
+                        pending.write('%s\n' % matchedFile)
+                    batch.append(matchedFile)
+                    if len(batch) < max(2, self.fanin):
+                        continue
+                    os.remove(pending_file)
+
+                if merge_cmd is None:
+                    merge_cmd = self._haddCommand()
+                fd, partial = tempfile.mkstemp(prefix='partial_', suffix='.root', dir=state_dir)
+                os.close(fd)
+                try:
+                    self._runMerges(merge_cmd, [(partial, batch)], partial + '.hadd_output')
+                except PostProcessException:
+                    os.remove(partial)
+                    raise
+                # The partial result is only used once the list of what it contains has been written out
+                with open(partial + '.inputs.new', 'w') as inputs:
+                    inputs.write(''.join('%s\n' % path for path in batch))
+                os.rename(partial + '.inputs.new', partial + '.inputs')
+
+    def _withPartials(self, file_list, output_file):
+        """
+        Returns the files to merge into output_file, using the partial results of the incremental merge in place of
+        the files they contain where they are still valid
+        Args:
+            file_list (list): the files to merge
+            output_file (str): the result of the merge
+        """
+        state_dir = output_file + '.incremental'
+        if not os.path.isdir(state_dir):
+            return file_list
+
+        to_merge = set(file_list)
+        covered = set()
+        partials = []
+        for inputs_file in sorted(os.listdir(state_dir)):
+            if not inputs_file.endswith('.inputs'):
+                continue
+            inputs_file = os.path.join(state_dir, inputs_file)
+            with open(inputs_file) as inputs:
+                contents = [line.strip() for line in inputs if line.strip()]
+            partial = inputs_file[:-len('.inputs')]
+            if not os.path.exists(partial):
+                continue
+            made = os.path.getmtime(inputs_file)
+            # A file which has gone, been merged into another partial result or changed since (e.g. the subjob was
+            # run again) or which was merged twice into it means this partial result can't be used
+            if len(set(contents)) != len(contents) or \
+                    any(path not in to_merge or path in covered or os.path.getmtime(path) > made for path in contents):
+                continue
+            covered.update(contents)
+            partials.append(partial)
+
+        return partials + [path for path in file_list if path not in covered]
+
+    def _haddCommand(self):
+        """
+        Returns the hadd command to which the output and input files are added
+        """
         from Ganga.Utility.root import getrootprefix, checkrootprefix
         rc, rootprefix = getrootprefix()
 
@@ -219,22 +359,72 @@ class RootMerger(IMerger):
         if not default_arguments in merge_cmd:
             merge_cmd += ' %s ' % default_arguments
 
-        # add the list of files, output file first
-        arg_list = [output_file]
-        arg_list.extend(file_list)
-        merge_cmd += string.join(arg_list, ' ')
+        return merge_cmd
+
+    def _runMerges(self, merge_cmd, merges, log_file):
+        """
+        Run hadd for each of merges, up to parallel of them at the same time
+        Args:
+            merge_cmd (str): the hadd command
+            merges (list): (output file, list of input files) pairs
+            log_file (str): the output of hadd is appended to this file
+        """
+        def run(merge):
+            output_file, file_list = merge
+            # add the list of files, output file first, quoted as the gangadir may contain spaces
+            cmd = merge_cmd + string.join([pipes.quote(path) for path in [output_file] + list(file_list)], ' ')
+            rc, out = commands.getstatusoutput(cmd)
+            return cmd, rc, out
+
+        if len(merges) == 1:
+            results = [run(merges[0])]
+        else:
+            pool = ThreadPool(max(1, min(self.parallel, len(merges))))
+            try:
+                results = pool.map(run, merges)
+            finally:
+                pool.close()
+                pool.join()
+
+        with open(log_file, 'a') as log:
+            for cmd, rc, out in results:
+                log.write('# -- Hadd output -- #\n')
+                log.write('%s\n' % out)
+
+        for cmd, rc, out in results:
+            if rc:
+                logger.error(out)
+                raise PostProcessException(
+                    'The ROOT merge failed to complete. The command used was %s.' % cmd)
+
+    def mergefiles(self, file_list, output_file):
 
-        rc, out = commands.getstatusoutput(merge_cmd)
+        merge_cmd = self._haddCommand()
+        file_list = self._withPartials(file_list, output_file)
 
         log_file = '%s.hadd_output' % output_file
-        with open(log_file, 'w') as log:
-            log.write('# -- Hadd output -- #\n')
-            log.write('%s\n' % out)
+        if os.path.exists(log_file):
+            os.remove(log_file)
 
-        if rc:
-            logger.error(out)
-            raise PostProcessException(
-                'The ROOT merge failed to complete. The command used was %s.' % merge_cmd)
+        # Merge groups of at most fanin files into partial results until there are few enough left for a last merge
+        fanin = max(2, self.fanin)
+        tmp_dir = None
+        try:
+            level = 0
+            while len(file_list) > fanin:
+                if tmp_dir is None:
+                    tmp_dir = tempfile.mkdtemp(prefix='.hadd_', dir=os.path.dirname(output_file))
+                batches = [file_list[i:i + fanin] for i in range(0, len(file_list), fanin)]
+                outputs = [os.path.join(tmp_dir, 'partial_%i_%i.root' % (level, i)) for i in range(len(batches))]
+                self._runMerges(merge_cmd, zip(outputs, batches), log_file)
+                file_list = outputs
+                level += 1
+            self._runMerges(merge_cmd, [(output_file, file_list)], log_file)
+        finally:
+            if tmp_dir is not None:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        shutil.rmtree(output_file + '.incremental', ignore_errors=True)
 
 
 class CustomMerger(IMerger):
@@ -4,7 +4,6 @@
 # $Id: ArgSplitter.py,v 1.1 2008-07-17 16:40:59 moscicki Exp $
 ###############################################################################
 
-import copy
 from Ganga.GPIDev.Adapters.ISplitter import ISplitter, SplittingError
 from Ganga.GPIDev.Base.Proxy import stripProxy
 from Ganga.GPIDev.Schema import Schema, Version, SimpleItem
@@ -56,8 +55,9 @@ class ArgSplitter(ISplitter):
 
         for arg in self.args:
             j = self.createSubjob(job,['application'])
-            # Add new arguments to subjob
-            app = copy.deepcopy(job.application)
+            # Assigning the application gives the subjob its own copy, add the new arguments to it
+            j.application = job.application
+            app = j.application
             if hasattr(app, 'args'):
                 app.args = arg
             elif hasattr(app, 'extraArgs'):
@@ -65,7 +65,6 @@ class ArgSplitter(ISplitter):
             else:
                 raise SplittingError('Application has neither args or extraArgs in its schema') 
                     
-            j.application = app
             logger.debug('Arguments for split job is: ' + str(arg))
             subjobs.append(stripProxy(j))
 
@@ -454,7 +454,7 @@ class PackageConfig(object):
 
     """
 
-    __slots__ = ('name', 'options', 'docstring', 'hidden', 'cfile', '_user_handlers', '_session_handlers', 'is_open', '_config_made', 'hasModified', '__dict__')
+    __slots__ = ('name', 'options', 'docstring', 'hidden', 'cfile', '_user_handlers', '_session_handlers', 'is_open', '_config_made', '_hasModified', 'generation', '__dict__')
 
     def __init__(self, name, docstring, **meta):
         """ Arguments:
@@ -482,8 +482,19 @@ class PackageConfig(object):
         # sanity check to force using makeConfig()
         self._config_made = False
 
+        self.generation = 0
         self.hasModified = False
 
+    def _getHasModified(self):
+        return self._hasModified
+
+    def _setHasModified(self, value):
+        # Whatever keeps values worked out from this section compares the generation to know when they are out of date
+        self._hasModified = value
+        self.generation += 1
+
+    hasModified = property(_getHasModified, _setHasModified)
+
     def _addOpenOption(self, name, value):
         self.addOption(name, value, "", override=True)
 
@@ -12,6 +12,9 @@ import os
 import glob
 import stat
 import shutil
+import struct
+import time
+import zlib
 from Ganga.Utility.logging import getLogger
 
 _stored_expanded_paths = {}
@@ -136,6 +139,101 @@ def remove_prefix(fn, path_list):
 
     return fn
 
+
+# Size of the pieces files are copied and compressed in
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def copy_stream(src, dest, chunk_size=COPY_CHUNK_SIZE):
+    """Copy the rest of the open file src to the end of the open file dest without holding all of it in memory.
+
+    If both are plain files and os.sendfile is available the data is copied by the kernel, otherwise in chunks.
+    """
+    if hasattr(os, 'sendfile') and isinstance(src, file) and isinstance(dest, file):
+        dest.flush()
+        offset = src.tell()
+        size = os.fstat(src.fileno()).st_size
+        while offset < size:
+            sent = os.sendfile(dest.fileno(), src.fileno(), offset, min(size - offset, 64 * chunk_size))
+            if not sent:
+                break
+            offset += sent
+        src.seek(offset)
+        return
+    shutil.copyfileobj(src, dest, chunk_size)
+
+
+def _gzip_member(data, level):
+    """Returns data compressed as a complete gzip member"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(data) + compressor.flush()
+    header = '\037\213\010\000' + struct.pack('<I', int(time.time()) & 0xffffffff) + '\000\377'
+    trailer = struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data) & 0xffffffff)
+    return header + body + trailer
+
+
+class ParallelGzipWriter(object):
+
+    """A file-like object writing gzip compressed data, compressing blocks of it from several threads at once.
+
+    Each block is written as a gzip member of its own, a gzip file made of several members decompresses to the
+    concatenation of them (RFC 1952) so the result is read by gzip, zcat and gzip.GzipFile as any other.
+    zlib doesn't hold the GIL while compressing so the threads compress in parallel.
+    """
+
+    def __init__(self, filename, threads=4, block_size=4 * COPY_CHUNK_SIZE, level=9):
+        """
+        Args:
+            filename (str): the file to write
+            threads (int): number of blocks compressed at the same time
+            block_size (int): amount of data in each block
+            level (int): the zlib compression level
+        """
+        from multiprocessing.pool import ThreadPool
+        self._file = open(filename, 'wb')
+        self._pool = ThreadPool(max(1, threads))
+        self._threads = max(1, threads)
+        self._block_size = block_size
+        self._level = level
+        self._buffer = []
+        self._buffered = 0
+        self._compressing = []
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self._block_size:
+            self._compress()
+
+    def _compress(self):
+        data = ''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        for start in range(0, len(data), self._block_size):
+            self._compressing.append(self._pool.apply_async(_gzip_member, (data[start:start + self._block_size],
+                                                                           self._level)))
+        # Keep the blocks in memory bounded, the members are written out in order
+        while len(self._compressing) > 2 * self._threads:
+            self._file.write(self._compressing.pop(0).get())
+
+    def flush(self):
+        if self._buffered:
+            self._compress()
+        while self._compressing:
+            self._file.write(self._compressing.pop(0).get())
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._pool.close()
+            self._pool.join()
+            self._file.close()
+
+
 if __name__ == "__main__":
 
     workdir = 'test_recursive_copy'
@@ -0,0 +1,166 @@
+##########################################################################
+# Ganga Project. http://cern.ch/ganga
+##########################################################################
+
+"""
+Minimal wrapper around the Linux inotify API (via ctypes) used to learn which
+directories have changed without re-reading them.
+
+Change notification only covers changes made through the local kernel, so
+it cannot see modifications made on other hosts of a network filesystem.
+Callers should always be prepared to fall back to polling.
+"""
+
+import os
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from Ganga.Utility.logging import getLogger
+
+logger = getLogger()
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+IN_DIR_CHANGES = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+IN_FILE_CHANGES = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+_event_header = struct.Struct('iIII')
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        libname = ctypes.util.find_library('c')
+        _libc = ctypes.CDLL(libname or 'libc.so.6', use_errno=True)
+        # Make sure the symbols we need exist (raises AttributeError if not)
+        _libc.inotify_init1
+        _libc.inotify_add_watch
+        _libc.inotify_rm_watch
+    return _libc
+
+
+def available():
+    """ Returns True if inotify can be used on this system """
+    try:
+        watcher = InotifyWatcher()
+    except (OSError, AttributeError) as err:
+        logger.debug("inotify not available: %s" % err)
+        return False
+    watcher.close()
+    return True
+
+
+class InotifyWatcher(object):
+
+    """
+    A set of inotify watches sharing one file descriptor.
+    Events are collected with read_events() which never blocks longer than the given timeout.
+    Raises OSError/AttributeError on construction if inotify is not available.
+    """
+
+    def __init__(self):
+        super(InotifyWatcher, self).__init__()
+        libc = _get_libc()
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._paths = {}
+        self._wds = {}
+        self.overflowed = False
+
+    def fileno(self):
+        return self._fd
+
+    def add_watch(self, path, mask=IN_DIR_CHANGES):
+        """ Watch path for the given events, returns True on success
+        Args:
+            path (str): The file or directory to watch
+            mask (int): The inotify events to watch for
+        """
+        if path in self._wds:
+            return True
+        wd = _get_libc().inotify_add_watch(self._fd, ctypes.c_char_p(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            err = ctypes.get_errno()
+            logger.debug("inotify_add_watch failed for '%s': %s" % (path, os.strerror(err)))
+            return False
+        self._paths[wd] = path
+        self._wds[path] = wd
+        return True
+
+    def rm_watch(self, path):
+        """ Stop watching path
+        Args:
+            path (str): The file or directory which is no longer of interest
+        """
+        wd = self._wds.pop(path, None)
+        if wd is not None:
+            self._paths.pop(wd, None)
+            _get_libc().inotify_rm_watch(self._fd, wd)
+
+    def watched(self):
+        """ Returns the paths currently being watched """
+        return self._wds.keys()
+
+    def read_events(self, timeout=0):
+        """ Returns a list of (watched path, name, mask) for all pending events
+        If the kernel queue overflowed the attribute 'overflowed' is set and events may have been lost
+        Args:
+            timeout (float): Seconds to wait for the first event
+        """
+        events = []
+        if self._fd is None:
+            return events
+        readable = select.select([self._fd], [], [], timeout)[0]
+        while readable:
+            try:
+                buf = os.read(self._fd, 65536)
+            except OSError as err:
+                if err.errno in (errno.EAGAIN, errno.EINTR):
+                    break
+                raise
+            offset = 0
+            while offset + _event_header.size <= len(buf):
+                wd, mask, cookie, length = _event_header.unpack_from(buf, offset)
+                offset += _event_header.size
+                name = buf[offset:offset + length].rstrip('\0')
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    self.overflowed = True
+                    continue
+                path = self._paths.get(wd)
+                if path is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # The watched path has gone away
+                    self._paths.pop(wd, None)
+                    self._wds.pop(path, None)
+                events.append((path, name, mask))
+            readable = select.select([self._fd], [], [], 0)[0]
+        return events
+
+    def close(self):
+        """ Release the inotify file descriptor and all watches """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._paths = {}
+            self._wds = {}
@@ -116,6 +116,12 @@ conf_config.addOption('gangadir', expandvars(None, '~/gangadir'),
                  'Location of local job repositories and workspaces. Default is ~/gangadir but in somecases (such as LSF CNAF) this needs to be modified to point to the shared file system directory.', filter=Ganga.Utility.Config.expandvars)
 conf_config.addOption('repositorytype', 'LocalXML', 'Type of the repository.', examples='LocalXML')
 conf_config.addOption('lockingStrategy', 'UNIX', 'Type of locking strategy which can be used. UNIX or FIXED . default = UNIX')
+conf_config.addOption('repositoryChangeDetection', 'mtime',
+                 "How a repository notices objects added or removed by other Ganga sessions. 'mtime' only re-lists directories whose modification time changed, 'inotify' uses Linux inotify to avoid even the stat calls (only safe if all sessions run on this host, falls back to 'mtime' if unavailable), 'rescan' re-lists the whole repository on every update")
+conf_config.addOption('lazyXMLAttributes', [],
+                 "Attributes of jobs loaded from an XML repository which are only parsed from disk when first accessed. Loading jobs with very large attributes (e.g. 'inputdata' or 'outputfiles' with many files) is much faster if they are deferred", examples="['inputdata', 'outputfiles']")
+conf_config.addOption('binaryRepositories', [],
+                 "Names of the registries (e.g. 'jobs', 'box', 'templates') whose objects are stored in a compact binary format instead of XML. This is much faster to write and read. Existing XML data is still read and is converted to the binary format when it's next saved. Older Ganga releases cannot read the binary format", examples="['jobs']")
 conf_config.addOption('workspacetype', 'LocalFilesystem',
                  'Type of workspace. Workspace is a place where input and output sandbox of jobs are stored. Currently the only supported type is LocalFilesystem.')
 conf_config.addOption('user', getpass.getuser(),
@@ -126,6 +132,19 @@ conf_config.addOption('SMTPHost', 'localhost', 'The SMTP server for notification
 conf_config.addOption('deleteUnusedShareDir', 'always',
                  'If set to ask the user is presented with a prompt asking whether Shared directories not associated with a persisted Ganga object should be deleted upon Ganga exit. If set to never, shared directories will not be deleted upon exit, even if they are not associated with a persisted Ganga object. If set to always (the default), then shared directories will always be deleted if not associated with a persisted Ganga object.')
 
+conf_config.addOption('SubjobPrepareProgressInterval', 10,
+                 'Seconds between the progress messages printed while the subjobs of a job are prepared')
+
+conf_config.addOption('SubmitMaxInFlight', 10,
+                 'Maximum number of subjobs being submitted at the same time to a type of backend when submitting with parallel_submit')
+conf_config.addOption('SubmitRetries', 2,
+                 'Number of times the submission of a subjob is tried again after it failed when submitting with parallel_submit')
+conf_config.addOption('SubmitRetryBackoff', 1.,
+                 'Seconds to wait before trying again to submit a subjob, doubled after each failed attempt')
+conf_config.addOption('PostProcessThreads', 4,
+                 'Number of completed subjobs whose postprocessors (checkers, mergers...) are run at the same time away '
+                 'from the monitoring thread, 0 runs them from the monitoring thread as each subjob completes')
+
 conf_config.addOption('autoGenerateJobWorkspace', False, 'Autogenerate workspace dirs for new jobs')
 
 conf_config.addOption('NoAfsToken', False, 'Do not require an AFS token when running on an AFS filesystem. Not recommended!')
@@ -230,6 +249,22 @@ poll_config.addOption('diskspace_poll_rate', 30, "The frequency in seconds for f
 poll_config.addOption('DiskSpaceChecker', "", "disk space checking callback. This function should return False when there is no disk space available, True otherwise")
 poll_config.addOption('max_shutdown_retries', 5, 'OBSOLETE: this option has no effect anymore')
 poll_config.addOption('numParallelJobs', 25, 'Number of Jobs to update the status for in parallel')
+poll_config.addOption('statusFileChangeDetection', 'mtime',
+                 "How Local and Batch jobs notice changes to the status files in their output workspace. 'poll' reads every status file on every monitoring pass, 'mtime' only reads the files whose modification time or size changed, 'inotify' watches the output workspaces with Linux inotify and wakes the monitoring up when a status file is written (falls back to 'mtime' if unavailable)")
+poll_config.addOption('batchStatusMaxAge', 10,
+                 'Seconds for which the job listing of a batch system (bjobs, qstat, condor_q) is re-used by the monitoring, so that it is run once per poll rather than for every block of jobs')
+poll_config.addOption('batchStatusTimeout', 60,
+                 'Seconds after which the job listing of a batch system is killed, the monitoring then checks the jobs one by one')
+poll_config.addOption('statusFileRecheckInterval', 60,
+                 'Seconds after which a status file is read again even if no change has been noticed, this covers writes made on other hosts of a network filesystem')
+poll_config.addOption('adaptive_polling', True,
+                 'Check each job at its own rate: soon after submission or after a change of state, then backing off up to the poll rate configured for its backend. If False all active jobs are handed to their backend at every monitoring step')
+poll_config.addOption('adaptive_min_poll_rate', 2,
+                 'Seconds before a job which was just submitted, or whose state just changed, is checked again by the adaptive polling')
+poll_config.addOption('adaptive_cost_factor', 10,
+                 'The adaptive polling keeps the interval between two checks of a backend above this factor times the time the last check took')
+poll_config.addOption('max_backend_calls_per_minute', 0,
+                 'Maximum number of calls to the backends (each for up to numParallelJobs jobs) made by the adaptive polling per minute, the most overdue jobs go first. 0 means no limit')
 
 poll_config.addOption('forced_shutdown_policy', 'session_type',
                  'If there are remaining background activities at exit such as monitoring, output download Ganga will attempt to wait for the activities to complete. You may select if a user is prompted to answer if he wants to force shutdown ("interactive") or if the system waits on a timeout without questions ("timeout"). The default is "session_type" which will do interactive shutdown for CLI and timeout for scripts.')
@@ -449,6 +484,14 @@ lsf_config.addOption('stdoutConfig', '-o %s/stdout', "String pattern for definin
 lsf_config.addOption('stderrConfig', '-e %s/stderr', "String pattern for defining the stderr")
 
 lsf_config.addOption('kill_str', 'bkill %s', "String used to kill job")
+
+lsf_config.addOption('status_str', 'bjobs -a -w', "String used to list the state of all jobs of the user, run once per poll. Empty to only use the status files")
+lsf_config.addOption('status_res_pattern', '^(?P<id>\d+)\s+\S+\s+(?P<status>[A-Z]+)\s',
+                 "String pattern for a line of the output of the status command")
+lsf_config.addOption('status_map', {'PEND': 'submitted', 'PSUSP': 'submitted', 'WAIT': 'submitted',
+                                    'RUN': 'running', 'USUSP': 'running', 'SSUSP': 'running',
+                                    'DONE': 'finished', 'EXIT': 'finished'},
+                 "Ganga state ('submitted', 'running' or 'finished') of each state shown by the status command")
 lsf_config.addOption('kill_res_pattern',
                  '(^Job <\d+> is being terminated)|(Job <\d+>: Job has already finished)|(Job <\d+>: No matching job found)',
                  "String pattern for replay from the kill command")
@@ -488,6 +531,13 @@ pbs_config.addOption('stdoutConfig', '-o %s/stdout', "String pattern for definin
 pbs_config.addOption('stderrConfig', '-e %s/stderr', "String pattern for defining the stderr")
 
 pbs_config.addOption('kill_str', 'qdel %s', "String used to kill job")
+
+pbs_config.addOption('status_str', 'qstat', "String used to list the state of all jobs of the user, run once per poll. Empty to only use the status files")
+pbs_config.addOption('status_res_pattern', '^(?P<id>\d+)\S*\s+\S+\s+\S+\s+\S+\s+(?P<status>[A-Z])\s',
+                 "String pattern for a line of the output of the status command")
+pbs_config.addOption('status_map', {'Q': 'submitted', 'H': 'submitted', 'W': 'submitted', 'T': 'submitted',
+                                    'R': 'running', 'E': 'running', 'S': 'running', 'C': 'finished'},
+                 "Ganga state ('submitted', 'running' or 'finished') of each state shown by the status command")
 pbs_config.addOption('kill_res_pattern', '(^$)|(qdel: Unknown Job Id)',
                  "String pattern for replay from the kill command")
 
@@ -534,6 +584,13 @@ sge_config.addOption('stdoutConfig', '-o %s/stdout', "String pattern for definin
 sge_config.addOption('stderrConfig', '-e %s/stderr', "String pattern for defining the stderr")
 
 sge_config.addOption('kill_str', 'qdel %s', "String used to kill job")
+
+sge_config.addOption('status_str', 'qstat', "String used to list the state of all jobs of the user, run once per poll. Empty to only use the status files")
+sge_config.addOption('status_res_pattern', '^\s*(?P<id>\d+)\s+\S+\s+\S+\s+\S+\s+(?P<status>\w+)\s',
+                 "String pattern for a line of the output of the status command")
+sge_config.addOption('status_map', {'qw': 'submitted', 'hqw': 'submitted', 'hRwq': 'submitted',
+                                    'r': 'running', 't': 'running', 'Rr': 'running', 'Rt': 'running', 's': 'running'},
+                 "Ganga state ('submitted', 'running' or 'finished') of each state shown by the status command")
 sge_config.addOption('kill_res_pattern', '(has registered the job +\d+ +for deletion)|(denied: job +"\d+" +does not exist)',
                  "String pattern for replay from the kill command")
 
@@ -886,6 +943,13 @@ Executable/* = Ganga.Lib.MonitoringServices.DummyMS.DummyMS
 reg_config = makeConfig('Registry','This config controls the speed of flushing objects to disk')
 reg_config.addOption('AutoFlusherWaitTime', 30, 'Time to wait between auto-flusher runs')
 reg_config.addOption('EnableAutoFlush', True, 'Enable Registry auto-flushing feature')
+reg_config.addOption('SubjobWriteAheadLog', False, 'Append the changes of subjobs of a job to a single log file (subjobs.wal) which is copied into the per-subjob data files later on, rather than rewriting every data file on each flush. Older Ganga releases do not read this log')
+reg_config.addOption('SubjobCacheMaxCount', 10000, 'Maximum number of subjobs of a job kept in memory once loaded, the least recently used unmodified subjobs are dropped and re-loaded from disk when needed. 0 for no limit')
+reg_config.addOption('SubjobCacheMaxSize', 200 * 1024 * 1024, 'Maximum size (estimated from their data on disk, in bytes) of the subjobs of a job kept in memory, see SubjobCacheMaxCount. 0 for no limit')
+reg_config.addOption('SubjobWriteAheadLogMaxSize', 64 * 1024 * 1024, 'Size in bytes above which the subjob log of a job is copied into the per-subjob data files and removed')
+reg_config.addOption('AsyncFlush', True, 'Write the objects flushed to disk from a background thread of each registry rather than from the thread flushing them, writes of the same object close in time are only done once')
+reg_config.addOption('AsyncFlushWindow', 0.5, 'Time in seconds the background writer waits for more objects to be flushed before writing them, see AsyncFlush')
+reg_config.addOption('AsyncFlushThreads', 4, 'Maximum number of objects the background writer writes at the same time, see AsyncFlush')
 
 cred_config = makeConfig('Credentials', 'This configures the credentials singleton')
 cred_config.addOption('CleanDelay', 1, 'Seconds between auto-clean of credentials when proxy externally destroyed')
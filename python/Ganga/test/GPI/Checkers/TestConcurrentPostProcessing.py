@@ -0,0 +1,93 @@
+from __future__ import absolute_import
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+from Ganga.testlib.decorators import add_config
+from Ganga.testlib.monitoring import run_until_state
+
+
+@add_config([('Configuration', 'PostProcessThreads', 2)])
+@pytest.mark.usefixtures('gpi')
+def test_subjob_checkers():
+    """ The checkers of the subjobs run away from the monitoring thread and fail the subjobs as before """
+    from Ganga.GPI import Job, Executable, ArgSplitter, FileChecker, monitoring
+
+    j = Job(application=Executable(exe='echo'))
+    j.splitter = ArgSplitter(args=[[str(i)] for i in range(6)])
+    j.postprocessors.append(FileChecker(files=['stdout'], searchStrings=['3', '5'], failIfFound=True))
+    j.submit()
+
+    assert run_until_state(j, 'failed', timeout=120, break_states=['completed'])
+    assert [sj.status for sj in j.subjobs] == ['completed'] * 3 + ['failed', 'completed', 'failed']
+
+    stats = monitoring.postprocessing()
+    assert stats['postprocessors']['FileChecker']['runs'] >= 6
+    assert stats['executor']['done'] == 6
+    assert stats['executor']['waiting'] == 0
+
+
+@add_config([('Configuration', 'PostProcessThreads', 0)])
+@pytest.mark.usefixtures('gpi')
+def test_subjob_checkers_inline():
+    """ With no threads the checkers of the subjobs run as each subjob completes """
+    from Ganga.GPI import Job, Executable, ArgSplitter, FileChecker, monitoring
+
+    j = Job(application=Executable(exe='echo'))
+    j.splitter = ArgSplitter(args=[[str(i)] for i in range(3)])
+    j.postprocessors.append(FileChecker(files=['stdout'], searchStrings=['1'], failIfFound=True))
+    j.submit()
+
+    assert run_until_state(j, 'failed', timeout=120, break_states=['completed'])
+    assert [sj.status for sj in j.subjobs] == ['completed', 'failed', 'completed']
+    assert monitoring.postprocessing()['executor'] == {}
+
+
+@add_config([('Configuration', 'PostProcessThreads', 2), ('TestingFramework', 'AutoCleanup', 'False'),
+             ('PollThread', 'autostart', False)])
+@pytest.mark.usefixtures('gpi')
+class TestPendingPostProcessing(object):
+
+    def test_a_LeaveCompleting(self, mocker):
+        """ Subjobs whose postprocessing never ran are saved as completing """
+        from Ganga.GPI import Job, Executable, ArgSplitter, FileChecker
+        from Ganga.GPIDev.Adapters.PostProcessExecutor import PostProcessExecutor
+
+        # As if the session ended before the executor got to them
+        mocker.patch.object(PostProcessExecutor, 'submit')
+
+        j = Job(application=Executable(exe='echo'))
+        j.splitter = ArgSplitter(args=[[str(i)] for i in range(3)])
+        j.postprocessors.append(FileChecker(files=['stdout'], searchStrings=['1'], failIfFound=True))
+        j.submit()
+
+        assert run_until_state(j, 'completing', timeout=120)
+        assert [sj.status for sj in j.subjobs] == ['completing'] * 3
+
+        # Still running at the next startup, with no subjob to complete
+        busy = Job(application=Executable(exe='sleep'))
+        busy.splitter = ArgSplitter(args=[['120'], ['120']])
+        busy.submit()
+        assert run_until_state(busy, 'running', timeout=60)
+
+    def test_b_CompleteOnStartup(self):
+        """ The next session completes them, running their postprocessors """
+        from Ganga.GPI import jobs
+        from Ganga.GPIDev.Adapters.PostProcessExecutor import getPostProcessExecutor
+
+        # The running job was left alone as its index shows no subjob completing
+        busy = stripProxy(jobs(1))
+        assert not busy._getRegistry().has_loaded(busy)
+
+        assert getPostProcessExecutor().wait(60)
+        j = jobs(0)
+        assert [sj.status for sj in j.subjobs] == ['completed', 'failed', 'completed']
+        assert j.status == 'failed'
+
+    def test_c_Cleanup(self):
+        """ Remove the job """
+        from Ganga.GPI import jobs
+        from Ganga.Utility.Config import setConfigOption
+
+        jobs.remove()
+        setConfigOption('TestingFramework', 'AutoCleanup', 'True')
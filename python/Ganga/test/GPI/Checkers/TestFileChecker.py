@@ -61,3 +61,18 @@ class TestFileChecker(GangaUnitTest):
         self.c.check(self.jobslice[0])
         self.c.check(self.jobslice[1])
         self.c.check(self.jobslice[2])
+
+    def testFileChecker_severalStrings(self):
+
+        self.c.files = ['stdout']
+        self.c.searchStrings = ['1', '2']
+        self.c.failIfFound = False
+        self.assertFalse(self.c.check(self.jobslice[0]))
+        self.assertTrue(self.c.check(self.jobslice[2]))
+
+        self.c.failIfFound = True
+        self.assertFalse(self.c.check(self.jobslice[1]))
+        self.c.searchStrings = ['3', '^2$', r'(1)\1']
+        self.assertTrue(self.c.check(self.jobslice[2]))
+        self.c.searchStrings = ['3', r'(1)\d']
+        self.assertFalse(self.c.check(self.jobslice[2]))
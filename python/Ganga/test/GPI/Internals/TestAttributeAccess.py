@@ -0,0 +1,56 @@
+from __future__ import absolute_import
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+from Ganga.testlib.decorators import add_config
+
+
+class _CountingLock(object):
+
+    """ Stands in for the lock of a root object and counts how often it is taken """
+
+    def __init__(self, lock):
+        self.lock = lock
+        self.taken = 0
+
+    def acquire(self, *args, **kwargs):
+        self.taken += 1
+        return self.lock.acquire(*args, **kwargs)
+
+    def release(self):
+        return self.lock.release()
+
+    def __enter__(self):
+        self.taken += 1
+        return self.lock.__enter__()
+
+    def __exit__(self, *args):
+        return self.lock.__exit__(*args)
+
+
+# Nothing else takes the lock while the test counts
+@add_config([('PollThread', 'autostart', False)])
+@pytest.mark.usefixtures('gpi')
+def test_attribute_get_without_lock():
+    """ Reading attributes which are in memory doesn't take the lock of the root object, setting them does """
+    from Ganga.GPI import Job, ArgSplitter
+
+    j = Job(splitter=ArgSplitter(args=[[str(i)] for i in range(10)]))
+    j.submit()
+
+    raw_j = stripProxy(j)
+    subjobs = list(raw_j.subjobs)
+    assert all(sj._getRoot() is raw_j for sj in subjobs)
+
+    lock = raw_j._lock = _CountingLock(raw_j._lock)
+    try:
+        assert [sj.application.args for sj in subjobs] == [[str(i)] for i in range(10)]
+        assert subjobs[-1].application.exe == 'echo'
+        assert lock.taken == 0
+
+        subjobs[-1].application.env = {}
+        assert lock.taken > 0
+        assert subjobs[-1].application.env == {}
+    finally:
+        raw_j._lock = lock.lock
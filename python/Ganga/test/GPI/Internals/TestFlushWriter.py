@@ -0,0 +1,52 @@
+from __future__ import absolute_import
+
+import time
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+from Ganga.testlib.decorators import add_config
+
+
+def _read_data(repo, this_id):
+    with open(repo.get_fn(this_id)) as data_file:
+        return data_file.read()
+
+
+@add_config([('Registry', 'AsyncFlush', True), ('Registry', 'AsyncFlushWindow', 0.2)])
+@pytest.mark.usefixtures('gpi')
+def test_async_flush():
+    """ Objects flushed without waiting are written from the background once, and straight away by flush_all """
+
+    from Ganga.GPI import Job
+
+    j = Job(name='before')
+    raw_j = stripProxy(j)
+    registry = raw_j._getRegistry()
+    repo = registry.repository
+    writer = registry.flush_writer
+    this_id = raw_j._getRegistryID()
+
+    for name in ('one', 'two', 'three'):
+        j.name = name
+        registry._flush([raw_j], wait=False)
+    assert writer.stats['coalesced'] >= 1
+
+    for _ in range(100):
+        if writer.depth() == 0 and not raw_j._dirty:
+            break
+        time.sleep(0.1)
+    assert 'three' in _read_data(repo, this_id)
+    assert writer.stats['written'] >= 1
+    assert 'flush queue' in registry.info()
+
+    j.name = 'four'
+    registry._flush([raw_j], wait=False)
+    registry.flush_all()
+    assert writer.depth() == 0
+    assert 'four' in _read_data(repo, this_id)
+
+    # A flush which waits writes the object itself
+    j.name = 'five'
+    registry._flush([raw_j])
+    assert 'five' in _read_data(repo, this_id)
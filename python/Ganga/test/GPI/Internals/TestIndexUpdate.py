@@ -0,0 +1,47 @@
+from __future__ import absolute_import
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+from Ganga.testlib.decorators import add_config
+
+
+@pytest.mark.usefixtures('gpi')
+def test_noop_update_index():
+    """ An update of an unchanged repository shouldn't re-list directories or re-read any index """
+
+    from Ganga.GPI import Job
+
+    for _ in range(3):
+        j = Job()
+
+    repo = stripProxy(j)._getRegistry().repository
+
+    repo.update_index()
+    repo.update_index()
+
+    assert repo.last_update_stats['index_reads'] == 0
+    assert repo.last_update_stats['candidates'] == 0
+
+
+@add_config([('Configuration', 'repositoryChangeDetection', 'inotify')])
+@pytest.mark.usefixtures('gpi')
+def test_inotify_update_index():
+    """ Check that a new object directory is picked up through inotify """
+
+    import os
+    from Ganga.GPI import Job
+
+    j = Job()
+
+    repo = stripProxy(j)._getRegistry().repository
+    repo.update_index()
+    repo.update_index()
+    assert repo.last_update_stats['dirs_listed'] == 0
+
+    # An unknown (empty) object directory appearing in the chunk must trigger a re-listing,
+    # the repository cleans up the empty directory itself
+    os.mkdir(os.path.join(repo.root, '0xxx', '999'))
+    repo.update_index()
+    assert repo.last_update_stats['dirs_listed'] == 1
+    assert 999 not in repo.objects
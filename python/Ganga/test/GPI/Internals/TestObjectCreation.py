@@ -0,0 +1,58 @@
+from __future__ import absolute_import
+
+import pytest
+
+
+@pytest.mark.usefixtures('gpi')
+def test_defaults_resolved_once(mocker):
+    """ New objects take their defaults from the table of their class, which is only worked out again when the config
+    section of the defaults changes """
+    from Ganga.GPIDev.Lib.Job.Job import Job
+    from Ganga.GPIDev.Lib.File.LocalFile import LocalFile
+    from Ganga.GPIDev.Schema.Schema import SchemaTable
+    from Ganga.Utility.Config import getConfig
+
+    # Make sure the tables are worked out
+    Job(), LocalFile()
+
+    resolve = mocker.spy(SchemaTable, '_resolve')
+    recipe = mocker.spy(Job._schema.__class__, '_getDefaultRecipe')
+    for _ in range(10):
+        Job(), LocalFile()
+    assert resolve.call_count == 0
+    assert recipe.call_count == 0
+
+    getConfig('defaults_Executable').setUserValue('exe', 'hostname')
+    try:
+        assert Job().application.exe == 'hostname'
+        assert [call[0][0].schema.name for call in resolve.call_args_list] == ['Executable']
+        Job()
+        assert resolve.call_count == 1
+    finally:
+        getConfig('defaults_Executable').revertToSession('exe')
+
+
+@pytest.mark.usefixtures('gpi')
+def test_defaults_follow_config():
+    """ New objects pick up a change of the defaults in the config and don't share mutable defaults """
+    from Ganga.GPIDev.Lib.Job.Job import Job
+    from Ganga.GPIDev.Lib.File.LocalFile import LocalFile
+    from Ganga.Utility.Config import getConfig
+
+    assert Job().application.exe == 'echo'
+    first, second = Job(), Job()
+    assert first.application is not second.application
+    assert first.application.env is not second.application.env
+    assert first.outputfiles is not second.outputfiles
+    assert LocalFile().compressed is False
+
+    getConfig('defaults_Executable').setUserValue('exe', 'hostname')
+    getConfig('defaults_LocalFile').setUserValue('compressed', True)
+    try:
+        assert Job().application.exe == 'hostname'
+        assert LocalFile().compressed is True
+    finally:
+        getConfig('defaults_Executable').revertToSession('exe')
+        getConfig('defaults_LocalFile').revertToSession('compressed')
+    assert Job().application.exe == 'echo'
+    assert LocalFile().compressed is False
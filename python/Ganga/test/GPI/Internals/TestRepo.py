@@ -25,6 +25,9 @@ class FakeRegistry(object):
     def getIndexCache(self, obj):
         return {}
 
+    def getIndexedAttributes(self):
+        return {}
+
     def _dirty(self, obj):
         self.repo.flush([obj._registry_id])
 
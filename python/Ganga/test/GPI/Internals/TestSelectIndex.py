@@ -0,0 +1,89 @@
+from __future__ import absolute_import
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+from Ganga.testlib.decorators import add_config
+
+
+def _selected_ids(jobs, **attrs):
+    return sorted(j.id for j in jobs.select(**attrs))
+
+
+@add_config([('TestingFramework', 'AutoCleanup', 'False')])
+@pytest.mark.usefixtures('gpi')
+class TestSelectIndex(object):
+
+    def test_a_CreateJobs(self):
+        """ Create jobs with a few different names and backends """
+
+        from Ganga.GPI import Job, Local, Interactive, jobs
+
+        for i in range(6):
+            j = Job(name='alpha%s' % i if i % 2 else 'beta%s' % i)
+            if i % 3 == 0:
+                j.backend = Interactive()
+            else:
+                j.backend = Local()
+
+        assert len(jobs) == 6
+
+    def test_b_SelectWithoutLoading(self):
+        """ Select on indexed attributes answers from the index cache and doesn't load the jobs """
+
+        from Ganga.GPI import jobs, Local, Interactive
+
+        assert len(jobs) == 6
+        repo = stripProxy(jobs(0))._getRegistry().repository
+        assert all(this_id in repo.query_index for this_id in repo.objects)
+
+        assert _selected_ids(jobs, status='new') == range(6)
+        assert _selected_ids(jobs, status='running') == []
+        assert _selected_ids(jobs, name='alpha*') == [1, 3, 5]
+        assert _selected_ids(jobs, backend='Interactive') == [0, 3]
+        assert _selected_ids(jobs, backend=Local) == [1, 2, 4, 5]
+        assert _selected_ids(jobs, backend=Local(), name='beta*') == [2, 4]
+        assert _selected_ids(jobs, application='Executable', backend='Interactive', minid=1) == [3]
+
+        assert not any(repo.isObjectLoaded(repo.objects[this_id]) for this_id in repo.objects)
+
+    def test_b_SelectOnlyTestsCandidates(self, mocker):
+        """ Only the unloaded jobs the index gives as candidates are tested, rather than every job """
+
+        from Ganga.GPI import jobs
+
+        repo = stripProxy(jobs(0))._getRegistry().repository
+        candidates = mocker.spy(repo.query_index, 'candidates')
+        value = mocker.spy(repo.query_index, 'value')
+
+        assert _selected_ids(jobs, name='alpha*') == [1, 3, 5]
+        assert [call[0][0] for call in candidates.call_args_list] == ['name']
+        assert set(call[0][0] for call in value.call_args_list) == set([1, 3, 5])
+
+        value.reset_mock()
+        assert _selected_ids(jobs, backend='Interactive', name='beta*') == [0]
+        assert set(call[0][0] for call in value.call_args_list) == set([0])
+
+        assert not any(repo.isObjectLoaded(repo.objects[this_id]) for this_id in repo.objects)
+
+    def test_c_SelectLoaded(self):
+        """ Loaded jobs are selected by their attributes in memory """
+
+        from Ganga.GPI import jobs, Local
+
+        jobs(2).name = 'alpha2'
+        jobs(3).backend = Local()
+
+        assert _selected_ids(jobs, name='alpha*') == [1, 2, 3, 5]
+        assert _selected_ids(jobs, backend='Interactive') == [0]
+        assert _selected_ids(jobs, backend='Local', name='alpha*') == [1, 2, 3, 5]
+
+    def test_d_Cleanup(self):
+        """ Remove the jobs """
+
+        from Ganga.GPI import jobs
+        from Ganga.Utility.Config import setConfigOption
+
+        jobs.remove()
+        setConfigOption('TestingFramework', 'AutoCleanup', 'True')
+
@@ -0,0 +1,76 @@
+from __future__ import absolute_import
+
+import os
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+
+
+@pytest.mark.usefixtures('gpi')
+def test_unchanged_writes_skipped():
+    """ Setting an attribute to its value doesn't make a job dirty and an unchanged job isn't written again """
+
+    from Ganga.GPI import Job
+
+    j = Job(name='unchanged')
+    raw_j = stripProxy(j)
+    registry = raw_j._getRegistry()
+    repo = registry.repository
+    fn = repo.get_fn(raw_j._getRegistryID())
+    registry._flush([raw_j])
+
+    j.name = 'unchanged'
+    assert not raw_j._dirty
+
+    written = repo.write_stats['written']
+    unchanged = repo.write_stats['unchanged']
+    mtime = os.stat(fn).st_mtime
+
+    raw_j._setDirty()
+    registry._flush([raw_j])
+    assert repo.write_stats['unchanged'] == unchanged + 1
+    assert repo.write_stats['written'] == written
+    assert os.stat(fn).st_mtime == mtime
+    assert 'unchanged writes skipped' in registry.info()
+
+    j.name = 'changed'
+    assert raw_j._dirty
+    registry._flush([raw_j])
+    assert repo.write_stats['written'] == written + 1
+    with open(fn) as data_file:
+        assert 'changed' in data_file.read()
+
+    # A file changed behind our back is written again
+    os.remove(fn)
+    raw_j._setDirty()
+    registry._flush([raw_j])
+    assert os.path.exists(fn)
+
+
+@pytest.mark.usefixtures('gpi')
+def test_app_hash_verification_reused(mocker):
+    """ The prepared state of an application is only re-rendered to verify its hash when something in it changed """
+
+    from Ganga.GPI import Job
+    from Ganga.GPIDev.Adapters.IPrepareApp import IPrepareApp
+
+    j = Job()
+    j.prepare()
+    raw_app = stripProxy(j.application)
+    assert raw_app.hash is not None
+
+    registry = stripProxy(j)._getRegistry()
+    spy = mocker.spy(IPrepareApp, 'printPrepTree')
+
+    assert raw_app.calc_hash(True)
+    renders = spy.call_count
+    stripProxy(j)._setDirty()
+    registry._flush([stripProxy(j)])
+    assert raw_app.calc_hash(True)
+    assert spy.call_count == renders
+
+    raw_app.env['CHANGED'] = '1'
+    raw_app._setDirty()
+    raw_app.calc_hash(True)
+    assert spy.call_count == renders + 1
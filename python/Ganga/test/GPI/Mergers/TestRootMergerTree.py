@@ -0,0 +1,133 @@
+from __future__ import absolute_import
+
+import os
+import stat
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+from Ganga.testlib.monitoring import run_until_completed
+
+
+def _write_script(path, content):
+    with open(path, 'w') as script:
+        script.write(content)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+
+@pytest.yield_fixture
+def stub_root(gpi, tmpdir):
+    """ A ROOT installation whose hadd concatenates its input files """
+    from Ganga.Utility.Config import getConfig
+
+    bin_dir = tmpdir.mkdir('root').mkdir('bin')
+    _write_script(str(bin_dir.join('root-config')), '#!/bin/sh\necho 6.00/00\n')
+    _write_script(str(bin_dir.join('hadd')), '#!/bin/sh\n'
+                                             'while [ "${1#-}" != "$1" ]; do shift; done\n'
+                                             'out=$1\nshift\ncat "$@" > "$out"\n')
+    getConfig('ROOT').setUserValue('path', str(tmpdir.join('root')))
+    yield
+    getConfig('ROOT').revertToSession('path')
+
+
+def _lines(path):
+    with open(path) as merged:
+        return sorted(merged.read().split())
+
+
+@pytest.mark.usefixtures('stub_root')
+def test_merge_tree(tmpdir):
+    """ More files than fanin are merged through partial merges """
+    from Ganga.Lib.Mergers.Merger import RootMerger
+
+    inputs = []
+    for i in range(10):
+        path = str(tmpdir.join('in_%i.root' % i))
+        with open(path, 'w') as in_file:
+            in_file.write('%i\n' % i)
+        inputs.append(path)
+
+    output = str(tmpdir.join('out.root'))
+    rm = RootMerger()
+    rm.fanin = 3
+    rm.parallel = 2
+    rm.mergefiles(inputs, output)
+
+    assert _lines(output) == sorted(str(i) for i in range(10))
+    # 4 partial merges, then 2, then the final one
+    with open(output + '.hadd_output') as log:
+        assert log.read().count('# -- Hadd output -- #') == 7
+    assert not [f for f in os.listdir(str(tmpdir)) if f.startswith('.hadd_')]
+
+
+@pytest.mark.usefixtures('stub_root')
+def test_incremental_merge(tmpdir):
+    """ The files of completed subjobs are merged into partial results which are used by the final merge """
+    from Ganga.GPI import Job, Executable, ArgSplitter, File, LocalFile, RootMerger
+
+    script = str(tmpdir.join('write_out.sh'))
+    _write_script(script, '#!/bin/sh\necho $1 > out.root\n')
+
+    j = Job(application=Executable(exe=File(script)))
+    j.splitter = ArgSplitter(args=[[str(i)] for i in range(5)])
+    j.outputfiles = [LocalFile('out.root')]
+    j.submit()
+    assert run_until_completed(j, timeout=120)
+
+    rm = stripProxy(RootMerger(files=['out.root'], fanin=2, incremental=True))
+    for sj in j.subjobs:
+        rm.execute(stripProxy(sj), 'completed')
+
+    state_dir = os.path.join(j.outputdir, 'out.root.incremental')
+    assert len([f for f in os.listdir(state_dir) if f.endswith('.inputs')]) == 2
+
+    rm.merge(stripProxy(j), outputdir=j.outputdir, overwrite=True)
+    assert _lines(os.path.join(j.outputdir, 'out.root')) == sorted(str(i) for i in range(5))
+    assert not os.path.exists(state_dir)
+
+
+@pytest.mark.usefixtures('stub_root')
+def test_incremental_merge_twice(tmpdir):
+    """ The files of a subjob whose postprocessors run twice are only merged once """
+    from Ganga.GPI import Job, Executable, ArgSplitter, File, LocalFile, RootMerger
+
+    script = str(tmpdir.join('write_out.sh'))
+    _write_script(script, '#!/bin/sh\necho $1 > out.root\n')
+
+    j = Job(application=Executable(exe=File(script)))
+    j.splitter = ArgSplitter(args=[[str(i)] for i in range(3)])
+    j.outputfiles = [LocalFile('out.root')]
+    j.submit()
+    assert run_until_completed(j, timeout=120)
+
+    rm = stripProxy(RootMerger(files=['out.root'], fanin=3, incremental=True))
+    rm.execute(stripProxy(j.subjobs[0]), 'completed')
+    rm.execute(stripProxy(j.subjobs[0]), 'completed')
+    rm.execute(stripProxy(j.subjobs[1]), 'completed')
+    rm.execute(stripProxy(j.subjobs[2]), 'completed')
+
+    state_dir = os.path.join(j.outputdir, 'out.root.incremental')
+    assert len([f for f in os.listdir(state_dir) if f.endswith('.inputs')]) == 1
+
+    rm.merge(stripProxy(j), outputdir=j.outputdir, overwrite=True)
+    assert _lines(os.path.join(j.outputdir, 'out.root')) == ['0', '1', '2']
+
+
+@pytest.mark.usefixtures('stub_root')
+def test_partial_listing_a_file_twice(tmpdir):
+    """ A partial result which contains a file twice isn't used """
+    from Ganga.Lib.Mergers.Merger import RootMerger
+
+    inputs = []
+    for i in range(2):
+        path = str(tmpdir.join('in_%i.root' % i))
+        with open(path, 'w') as in_file:
+            in_file.write('%i\n' % i)
+        inputs.append(path)
+
+    output = str(tmpdir.join('out.root'))
+    state_dir = tmpdir.mkdir('out.root.incremental')
+    state_dir.join('partial_a.root').write('0\n0\n1\n')
+    state_dir.join('partial_a.root.inputs').write('%s\n%s\n%s\n' % (inputs[0], inputs[0], inputs[1]))
+
+    assert RootMerger()._withPartials(inputs, output) == inputs
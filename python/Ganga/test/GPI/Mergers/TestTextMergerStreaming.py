@@ -0,0 +1,79 @@
+from __future__ import absolute_import
+
+import gzip
+import os
+
+import pytest
+
+
+def _make_inputs(tmpdir, number, size):
+    """ Write number text files of about size bytes each, one of them compressed """
+    line = 'Some output of the job, with a number in it: %i\n'
+    inputs = []
+    for i in range(number):
+        path = str(tmpdir.join('in_%i.txt' % i))
+        if i == 0:
+            path += '.gz'
+            in_file = gzip.GzipFile(path, 'w')
+        else:
+            in_file = open(path, 'w')
+        block = ''.join(line % j for j in range(1000))
+        for j in range(max(1, size // len(block))):
+            in_file.write(block)
+        in_file.close()
+        inputs.append(path)
+    return inputs
+
+
+def _expected(inputs):
+    contents = []
+    for path in inputs:
+        in_file = gzip.GzipFile(path) if path.endswith('.gz') else open(path)
+        contents.append('# Start of file %s #\n%s\n' % (path, in_file.read()))
+        in_file.close()
+    return ''.join(contents) + '# Ganga Merge Ended Successfully #\n'
+
+
+@pytest.mark.usefixtures('gpi')
+@pytest.mark.parametrize('compress_threads', [0, 1, 3])
+def test_text_merge(tmpdir, compress_threads):
+    """ The merged file holds each input in turn, whether compressed by one or more threads or not at all """
+    from Ganga.Lib.Mergers.Merger import TextMerger
+
+    inputs = _make_inputs(tmpdir, 5, 200000)
+    output = str(tmpdir.join('out.txt'))
+    tm = TextMerger()
+    tm.compress = compress_threads > 0
+    tm.compress_threads = max(1, compress_threads)
+    tm.mergefiles(inputs, output)
+
+    if tm.compress:
+        merged = gzip.GzipFile(output + '.gz').read()
+    else:
+        merged = open(output).read()
+    assert merged.startswith('# Ganga TextMergeTool - ')
+    assert merged[merged.index('\n') + 1:] == _expected(inputs)
+
+
+
+@pytest.mark.usefixtures('gpi')
+@pytest.mark.parametrize('compress_threads', [1, 3])
+def test_text_merge_streams_inputs(tmpdir, mocker, compress_threads):
+    """ Inputs larger than a chunk are written to the output a chunk at a time rather than read whole """
+    from Ganga.Lib.Mergers.Merger import TextMerger
+    from Ganga.Utility.files import COPY_CHUNK_SIZE, ParallelGzipWriter
+
+    writer = ParallelGzipWriter if compress_threads > 1 else gzip.GzipFile
+    writes = mocker.spy(writer, 'write')
+
+    inputs = _make_inputs(tmpdir, 2, 3 * COPY_CHUNK_SIZE)
+    output = str(tmpdir.join('out.txt'))
+    tm = TextMerger()
+    tm.compress = True
+    tm.compress_threads = compress_threads
+    tm.mergefiles(inputs, output)
+
+    assert gzip.GzipFile(output + '.gz').read().endswith(_expected(inputs))
+    assert max(os.path.getsize(path) for path in inputs) > COPY_CHUNK_SIZE
+    assert writes.call_count > len(inputs) * 3
+    assert max(len(call[0][1]) for call in writes.call_args_list) <= COPY_CHUNK_SIZE
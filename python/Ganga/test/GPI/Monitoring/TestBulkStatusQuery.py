@@ -0,0 +1,89 @@
+from __future__ import absolute_import
+
+import os
+import stat
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+from Ganga.testlib.decorators import add_config
+
+
+@pytest.fixture
+def bjobs(tmpdir):
+    """ A script standing in for bjobs which counts how often it is run """
+    script = tmpdir.join('bjobs')
+    script.write('#!/bin/sh\n'
+                 'echo run >> %s\n'
+                 'echo "JOBID   USER    STAT  QUEUE      FROM_HOST   EXEC_HOST   JOB_NAME   SUBMIT_TIME"\n'
+                 'echo "101     user    RUN   8nm        lxplus001   b6a2        job        Jan  1 10:00"\n'
+                 'echo "102     user    PEND  8nm        lxplus001               job        Jan  1 10:00"\n'
+                 % tmpdir.join('calls'))
+    os.chmod(str(script), stat.S_IRWXU)
+    return script
+
+
+@add_config([('PollThread', 'autostart', False)])
+@pytest.mark.usefixtures('gpi')
+def test_lsf_bulk_status(bjobs):
+    """ Check that the state of all LSF jobs comes from a single bjobs listing """
+
+    from Ganga.GPI import Job, LSF
+    from Ganga.Utility.Config import setConfigOption
+    from Ganga.Lib.Batch.BulkStatusQuery import getBulkStatusQuery
+
+    setConfigOption('LSF', 'status_str', str(bjobs))
+    getBulkStatusQuery().clear()
+
+    raw_jobs = []
+    for batch_id in ['101', '102']:
+        raw_j = stripProxy(Job(backend=LSF()))
+        raw_j.status = 'submitted'
+        raw_j.backend.id = batch_id
+        raw_jobs.append(raw_j)
+
+    # The monitoring asks about the jobs in several blocks
+    backend = raw_jobs[0].backend
+    backend.updateMonitoringInformation(raw_jobs[:1])
+    backend.updateMonitoringInformation(raw_jobs[1:])
+
+    assert raw_jobs[0].status == 'running'
+    assert raw_jobs[0].backend.status == 'RUN'
+    assert raw_jobs[1].status == 'submitted'
+    assert raw_jobs[1].backend.status == 'PEND'
+    assert len(bjobs.dirpath('calls').readlines()) == 1
+
+    # Nothing to kill in the real batch system
+    for raw_j in raw_jobs:
+        raw_j.status = 'failed'
+
+
+@add_config([('PollThread', 'autostart', False), ('PollThread', 'batchStatusTimeout', 1)])
+@pytest.mark.usefixtures('gpi')
+def test_lsf_bulk_status_timeout(tmpdir):
+    """ Check that the jobs are checked one by one from their status files when bjobs hangs """
+
+    from Ganga.GPI import Job, LSF
+    from Ganga.Utility.Config import setConfigOption
+    from Ganga.Lib.Batch.BulkStatusQuery import getBulkStatusQuery
+
+    script = tmpdir.join('bjobs')
+    script.write('#!/bin/sh\nsleep 60\n')
+    os.chmod(str(script), stat.S_IRWXU)
+    setConfigOption('LSF', 'status_str', str(script))
+    getBulkStatusQuery().clear()
+
+    raw_j = stripProxy(Job(backend=LSF()))
+    raw_j.status = 'submitted'
+    raw_j.backend.id = '101'
+    with open(os.path.join(raw_j.getOutputWorkspace().getPath(), '__jobstatus__'), 'w') as status_file:
+        status_file.write('PID: 101\n')
+
+    timeouts = getBulkStatusQuery().stats['timeouts']
+    raw_j.backend.updateMonitoringInformation([raw_j])
+
+    assert getBulkStatusQuery().stats['timeouts'] == timeouts + 1
+    assert raw_j.status == 'running'
+
+    # Nothing to kill in the real batch system
+    raw_j.status = 'failed'
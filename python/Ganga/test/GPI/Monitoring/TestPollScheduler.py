@@ -0,0 +1,28 @@
+from __future__ import absolute_import
+
+import time
+
+import pytest
+
+
+@pytest.mark.usefixtures('gpi')
+def test_monitoring_stats():
+    """ Check that the monitoring loop reports how it schedules the checks of a Local job """
+
+    from Ganga.GPI import Job, Executable, monitoring, enableMonitoring, disableMonitoring
+
+    enableMonitoring()
+    j = Job(application=Executable(exe='sh', args=['-c', 'sleep 1']))
+    j.submit()
+
+    for _ in range(60):
+        if j.status == 'completed':
+            break
+        time.sleep(1)
+    disableMonitoring()
+    assert j.status == 'completed'
+
+    stats = monitoring.stats()
+    assert stats['calls_last_minute'] > 0
+    assert stats['backends']['Local']['polls'] > 0
+    assert stats['backends']['Local']['changes'] > 0
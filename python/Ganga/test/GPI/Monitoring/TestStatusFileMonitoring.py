@@ -0,0 +1,25 @@
+from __future__ import absolute_import
+
+import pytest
+
+from Ganga.testlib.decorators import add_config
+from Ganga.testlib.monitoring import run_until_completed
+
+
+@add_config([('PollThread', 'statusFileChangeDetection', 'inotify')])
+@pytest.mark.usefixtures('gpi')
+def test_local_job_inotify_monitoring():
+    """ Check that Local jobs go through all their states when the status files are watched """
+
+    from Ganga.GPI import Job, Executable
+    from Ganga.Core.MonitoringComponent.StatusFileWatcher import getStatusFileWatcher
+
+    j = Job(application=Executable(exe='sh', args=['-c', 'sleep 2; echo done']))
+    j.submit()
+    assert run_until_completed(j, timeout=60)
+    assert j.backend.exitcode == 0
+
+    watcher = getStatusFileWatcher()
+    assert watcher.stats['reads'] > 0
+    # The finished job is no longer followed
+    assert not [fn for fn in watcher._entries if fn.startswith(j.outputdir)]
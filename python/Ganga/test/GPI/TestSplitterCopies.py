@@ -0,0 +1,30 @@
+from __future__ import absolute_import
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+
+
+@pytest.mark.usefixtures('gpi')
+def test_split_copies_components_once(mocker):
+    """ Splitting gives each subjob a copy of the application and backend of the master, made only once """
+    from Ganga.GPI import Job, ArgSplitter
+    from Ganga.Lib.Executable import Executable
+    from Ganga.Lib.Localhost import Localhost
+
+    number_of_args = 10
+    j = Job(splitter=ArgSplitter(args=[[str(i)] for i in range(number_of_args)]))
+    raw_j = stripProxy(j)
+
+    app_copies = mocker.spy(Executable, '__deepcopy__')
+    backend_copies = mocker.spy(Localhost, '__deepcopy__')
+    subjobs = raw_j.splitter.validatedSplit(raw_j)
+
+    assert [sj.application.args for sj in subjobs] == [[str(i)] for i in range(number_of_args)]
+    assert len(set(id(sj.application) for sj in subjobs)) == number_of_args
+    assert all(sj.application is not raw_j.application for sj in subjobs)
+    assert all(sj.application._getParent() is sj for sj in subjobs)
+    assert raw_j.application.args == ['Hello World']
+
+    assert app_copies.call_count == number_of_args
+    assert backend_copies.call_count == number_of_args
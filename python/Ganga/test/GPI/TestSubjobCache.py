@@ -0,0 +1,43 @@
+from __future__ import absolute_import
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+from Ganga.testlib.decorators import add_config
+from Ganga.testlib.monitoring import run_until_completed
+
+
+# No monitoring loop, so that run_until_completed is the only thing moving the subjobs on
+@add_config([('Registry', 'SubjobCacheMaxCount', 2), ('PollThread', 'autostart', False)])
+@pytest.mark.usefixtures('gpi')
+def test_subjob_cache_eviction():
+    """ Check that the number of loaded subjobs is bounded and that evicted subjobs still referenced are reused """
+
+    from Ganga.GPI import Job, ArgSplitter
+    from Ganga.Core.GangaRepository.SubJobXMLList import SubJobXMLList
+
+    j = Job(splitter=ArgSplitter(args=[[str(i)] for i in range(5)]))
+    j.submit()
+    assert run_until_completed(j, timeout=60)
+
+    raw_j = stripProxy(j)
+    registry = raw_j._getRegistry()
+    repo = registry.repository
+
+    # Re-load the job from disk so the subjobs are managed by a SubJobXMLList
+    repo.flush([raw_j._getRegistryID()])
+    repo.load([raw_j._getRegistryID()])
+    subjobs = raw_j.subjobs
+    assert isinstance(subjobs, SubJobXMLList)
+
+    held = subjobs[0]
+    for i in range(len(subjobs)):
+        assert subjobs[i].status == 'completed'
+        assert len(subjobs._cachedJobs) <= 2
+
+    assert registry.subjob_cache_stats['evictions'] > 0
+    assert 'subjob cache' in registry.info()
+
+    # The subjob was evicted but is still alive so the same object is handed back
+    assert 0 not in subjobs._cachedJobs
+    assert subjobs[0] is held
@@ -0,0 +1,42 @@
+from __future__ import absolute_import
+
+import pytest
+
+
+@pytest.mark.usefixtures('gpi')
+def test_parallel_prepare_order():
+    """Test that subjobs prepared in parallel get their own config, whatever order they are prepared in"""
+    from Ganga.GPI import Job, ArgSplitter, Local
+    from Ganga.GPIDev.Base.Proxy import stripProxy
+
+    j = Job(backend=Local(), splitter=ArgSplitter(args=[[str(i)] for i in range(20)]))
+    j.parallel_submit = True
+    j.submit()
+
+    configs = stripProxy(j)._storedJobSubConfig
+    assert [c.args for c in configs] == [[str(i)] for i in range(20)]
+    assert [sj.application.args for sj in j.subjobs] == [[str(i)] for i in range(20)]
+
+
+class _App(object):
+
+    is_prepared = True
+
+
+class _Handler(object):
+
+    def prepare(self, app, appsubconfig, appmasterconfig, jobmasterconfig):
+        from Ganga.Core.exceptions import ApplicationConfigurationError
+        if appsubconfig == 3:
+            raise ApplicationConfigurationError('cannot prepare subjob %s' % appsubconfig)
+        return appsubconfig
+
+
+@pytest.mark.usefixtures('gpi')
+def test_parallel_prepare_error():
+    """Test that a GangaException raised while preparing a subjob in the thread pool is raised again"""
+    from Ganga.Core.exceptions import ApplicationConfigurationError
+    from Ganga.GPIDev.Lib.Job.SubjobPreparation import prepareSubjobs
+    apps = [_App() for i in range(6)]
+    with pytest.raises(ApplicationConfigurationError):
+        prepareSubjobs(_Handler(), apps, range(6), None, None)
@@ -0,0 +1,51 @@
+from __future__ import absolute_import
+
+import os
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+from Ganga.testlib.decorators import add_config
+from Ganga.testlib.monitoring import run_until_completed
+
+
+@add_config([('Registry', 'SubjobWriteAheadLog', True)])
+@pytest.mark.usefixtures('gpi')
+def test_subjob_write_ahead_log():
+    """ Check that subjob changes go to the log, are read back from it and end up in the data files on compaction """
+
+    from Ganga.GPI import Job, ArgSplitter
+    from Ganga.Core.GangaRepository.SubJobXMLList import SubJobXMLList
+    from Ganga.Core.GangaRepository.VStreamer import from_file
+
+    j = Job(splitter=ArgSplitter(args=[['a'], ['b'], ['c']]))
+    j.submit()
+    assert run_until_completed(j, timeout=60)
+
+    raw_j = stripProxy(j)
+    repo = raw_j._getRegistry().repository
+    job_dir = os.path.dirname(repo.get_fn(raw_j._getRegistryID()))
+
+    # Re-load the job from disk so the subjobs are managed by a SubJobXMLList
+    repo.flush([raw_j._getRegistryID()])
+    repo.load([raw_j._getRegistryID()])
+    subjobs = raw_j.subjobs
+    assert isinstance(subjobs, SubJobXMLList)
+
+    for i in range(len(subjobs)):
+        subjobs[i].name = 'viaLog%s' % i
+    repo.flush([raw_j._getRegistryID()])
+
+    assert os.path.isfile(os.path.join(job_dir, 'subjobs.wal'))
+
+    # A fresh view of the job directory sees the logged changes
+    reread = SubJobXMLList(job_dir, raw_j._getRegistry(), 'data', False, raw_j)
+    assert [reread[i].name for i in range(3)] == ['viaLog0', 'viaLog1', 'viaLog2']
+    assert reread.getAllSJStatus() == ['completed'] * 3
+    assert reread.getSJStatusCounts() == {'completed': 3}
+    assert reread.getSJIdsWithStatus(['submitted', 'running']) == []
+
+    subjobs.compactWriteAheadLog()
+    assert not os.path.exists(os.path.join(job_dir, 'subjobs.wal'))
+    with open(os.path.join(job_dir, '1', 'data')) as f:
+        assert from_file(f)[0].name == 'viaLog1'
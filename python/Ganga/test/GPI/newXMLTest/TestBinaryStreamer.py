@@ -0,0 +1,128 @@
+from __future__ import absolute_import
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+from Ganga.testlib.decorators import add_config
+
+
+@pytest.mark.usefixtures('gpi')
+def test_binary_roundtrip(tmpdir):
+    """ Check that an object written in the binary format reads back the same as through XML """
+
+    from Ganga.GPI import Job, LocalFile, ArgSplitter
+    from Ganga.Core.GangaRepository import BinaryStreamer, VStreamer
+
+    j = Job(name='binaryTest')
+    j.inputfiles = [LocalFile('a.txt'), LocalFile('b.txt')]
+    j.application.args = ['x', 'y']
+    j.splitter = ArgSplitter(args=[['1'], ['2']])
+
+    binary_fn = str(tmpdir.join('data.bin'))
+    xml_fn = str(tmpdir.join('data.xml'))
+    with open(binary_fn, 'w') as f:
+        BinaryStreamer.to_file(stripProxy(j), f, 'subjobs')
+    with open(xml_fn, 'w') as f:
+        VStreamer.to_file(stripProxy(j), f, 'subjobs')
+
+    with open(binary_fn) as f:
+        assert BinaryStreamer.is_binary_file(f)
+        from_binary, errs = BinaryStreamer.from_file(f)
+    assert not errs
+
+    # The binary reader falls back to XML
+    with open(xml_fn) as f:
+        assert not BinaryStreamer.is_binary_file(f)
+        from_xml, errs = BinaryStreamer.from_file(f)
+    assert not errs
+
+    assert from_binary == from_xml
+    assert from_binary.name == 'binaryTest'
+    assert [f.namePattern for f in from_binary.inputfiles] == ['a.txt', 'b.txt']
+    assert from_binary.splitter.args == [['1'], ['2']]
+
+
+@pytest.mark.usefixtures('gpi')
+def test_binary_incomplete(tmpdir):
+    """ Check that an object missing some of its attributes isn't loaded """
+
+    from Ganga.GPI import Job
+    from Ganga.Core.GangaRepository import BinaryStreamer
+    from Ganga.Core.GangaRepository.VStreamer import XMLFileError
+
+    j = Job(name='incomplete')
+    record = BinaryStreamer.BinaryStreamer(['subjobs']).encode(stripProxy(j))
+    del record[4]['name']
+
+    fn = str(tmpdir.join('data.bin'))
+    with open(fn, 'w') as f:
+        f.write(BinaryStreamer._magic)
+        BinaryStreamer.pickle.dump((['subjobs'], record), f, 2)
+    with open(fn) as f:
+        with pytest.raises(XMLFileError):
+            BinaryStreamer.from_file(f)
+
+    # The attributes which weren't written on purpose aren't missing
+    with open(fn, 'w') as f:
+        BinaryStreamer.to_file(stripProxy(j), f, ['subjobs', 'name'])
+    with open(fn) as f:
+        BinaryStreamer.from_file(f)
+
+
+@add_config([('Configuration', 'binaryRepositories', ['jobs'])])
+@pytest.mark.usefixtures('gpi')
+def test_binary_repository_migration():
+    """ Check that jobs are written in binary and that XML data is converted when it's next saved """
+
+    from Ganga.GPI import Job
+    from Ganga.Core.GangaRepository import BinaryStreamer, VStreamer
+
+    j = Job(name='migrateMe')
+    repo = stripProxy(j)._getRegistry().repository
+    this_id = stripProxy(j)._getRegistryID()
+    assert repo.binary_format
+
+    repo.flush([this_id])
+    fn = repo.get_fn(this_id)
+    with open(fn) as f:
+        assert BinaryStreamer.is_binary_file(f)
+
+    # Pretend the job was written by a session using XML
+    with open(fn, 'w') as f:
+        VStreamer.to_file(stripProxy(j), f, 'subjobs')
+
+    # Loading the job leaves the file alone
+    repo.load([this_id])
+    assert j.name == 'migrateMe'
+    with open(fn) as f:
+        assert not BinaryStreamer.is_binary_file(f)
+
+    j.name = 'migrated'
+    repo.flush([this_id])
+    with open(fn) as f:
+        assert BinaryStreamer.is_binary_file(f)
+
+
+@add_config([('Configuration', 'binaryRepositories', ['jobs'])])
+@pytest.mark.usefixtures('gpi')
+def test_binary_repository_truncated():
+    """ Check that a job whose binary data file is broken is loaded from the backup """
+
+    from Ganga.GPI import Job
+
+    j = Job(name='backup')
+    repo = stripProxy(j)._getRegistry().repository
+    this_id = stripProxy(j)._getRegistryID()
+
+    repo.flush([this_id])
+    j.name = 'latest'
+    repo.flush([this_id])
+    fn = repo.get_fn(this_id)
+
+    with open(fn) as f:
+        data = f.read()
+    with open(fn, 'w') as f:
+        f.write(data[:len(data) // 2])
+
+    repo.load([this_id])
+    assert j.name == 'backup'
@@ -0,0 +1,71 @@
+from __future__ import absolute_import
+
+import os
+
+import pytest
+
+from Ganga.GPIDev.Base.Proxy import stripProxy
+
+
+def _write_job(fn, n_files):
+    from Ganga.GPI import Job, LocalFile
+    from Ganga.Core.GangaRepository.VStreamer import to_file
+
+    j = Job(name='lazyTest')
+    j.inputfiles = [LocalFile('file_%s.txt' % i) for i in range(n_files)]
+    with open(fn, 'w') as f:
+        to_file(stripProxy(j), f)
+    return j
+
+
+@pytest.mark.usefixtures('gpi')
+def test_lazy_attribute_load(tmpdir):
+    """ Check that a deferred attribute is only parsed on first access and gives the same value """
+
+    from Ganga.Core.GangaRepository.VStreamer import from_file, LazyXMLAttribute
+
+    fn = str(tmpdir.join('data'))
+    j = _write_job(fn, 50)
+
+    with open(fn) as f:
+        obj, errs = from_file(f, ['inputfiles'])
+
+    assert not errs
+    assert obj.name == 'lazyTest'
+    assert isinstance(obj._data['inputfiles'], LazyXMLAttribute)
+
+    # Flushing must not force the attribute to be parsed
+    obj._setFlushed()
+    assert obj._hasLazyAttribute('inputfiles')
+
+    assert [f.namePattern for f in obj.inputfiles] == [f.namePattern for f in j.inputfiles]
+    assert not obj._hasLazyAttribute('inputfiles')
+    assert obj.inputfiles._getParent() is obj
+    assert not obj._dirty
+
+
+@pytest.mark.usefixtures('gpi')
+def test_lazy_attribute_file_changed(tmpdir):
+    """ Check that a deferred attribute is still read once the file it came from is backed up, but not once it's
+    rewritten """
+
+    from Ganga.Core.GangaRepository.VStreamer import from_file, XMLFileError
+
+    fn = str(tmpdir.join('data'))
+    _write_job(fn, 3)
+
+    with open(fn) as f:
+        renamed, _ = from_file(f, ['inputfiles'])
+
+    # What the repository does when saving an object
+    os.rename(fn, fn + '~')
+    _write_job(fn, 5)
+    assert len(renamed.inputfiles) == 3
+
+    # The file has been rewritten in place, its content may not match the rest of the object
+    with open(fn) as f:
+        rewritten, _ = from_file(f, ['inputfiles'])
+    _write_job(fn, 7)
+    with pytest.raises(XMLFileError):
+        rewritten.inputfiles
+    assert rewritten._hasLazyAttribute('inputfiles')
@@ -257,7 +257,8 @@ class TestSJXMLGenAndLoad(GangaUnitTest):
         with open(getSJXMLIndex(j)) as handler:
             obj, errs = from_file(handler)
 
-            assert isinstance(obj, dict)
+            from Ganga.Core.GangaRepository.SubJobIndex import SubJobIndex
+            assert isinstance(obj, SubJobIndex)
 
             from Ganga.GPIDev.Base.Proxy import stripProxy, getName
             raw_j = stripProxy(j)
@@ -0,0 +1,69 @@
+import os
+import stat
+
+
+def _stub(tmpdir, output):
+    """Write a script standing in for a batch system listing command, it counts how often it is run"""
+    script = tmpdir.join('listing.sh')
+    script.write('#!/bin/sh\necho run >> %s\ncat <<EOF\n%sEOF\n' % (tmpdir.join('calls'), output))
+    os.chmod(str(script), stat.S_IRWXU)
+    return str(script)
+
+
+def test_bulk_status_query_shared(tmpdir):
+    """Test that the listing is run once and re-used until it is too old"""
+
+    from Ganga.Lib.Batch.BulkStatusQuery import BulkStatusQuery, parseStatusLines
+
+    command = _stub(tmpdir, '1 RUN\n2 PEND\n')
+    query = BulkStatusQuery()
+
+    def parser(output):
+        return parseStatusLines(output, r'^(?P<id>\d+) (?P<status>\S+)')
+
+    for _ in range(5):
+        assert query.getStates(command, parser, max_age=60) == {'1': 'RUN', '2': 'PEND'}
+    assert len(tmpdir.join('calls').readlines()) == 1
+
+    assert query.getStates(command, parser, max_age=0) == {'1': 'RUN', '2': 'PEND'}
+    assert len(tmpdir.join('calls').readlines()) == 2
+
+    assert query.getStates('exit 1', parser, max_age=60) is None
+    assert query.stats == {'queries': 3, 'cached': 4, 'failures': 1, 'timeouts': 0}
+
+
+def test_bulk_status_query_timeout(tmpdir):
+    """Test that a listing which hangs is killed and counts as failed"""
+
+    import time
+    from Ganga.Lib.Batch.BulkStatusQuery import BulkStatusQuery
+
+    query = BulkStatusQuery()
+    start = time.time()
+    assert query.getStates('sleep 60', lambda output: {}, max_age=60, timeout=0.5) is None
+    assert time.time() - start < 30
+    assert query.stats == {'queries': 1, 'cached': 0, 'failures': 1, 'timeouts': 1}
+
+
+def test_bulk_status_default_patterns():
+    """Test the default patterns against typical output of bjobs, qstat (PBS) and qstat (SGE)"""
+
+    from Ganga.Lib.Batch.BulkStatusQuery import parseStatusLines
+    from Ganga.Utility.Config import getConfig
+
+    bjobs = ('JOBID   USER    STAT  QUEUE      FROM_HOST   EXEC_HOST   JOB_NAME   SUBMIT_TIME\n'
+             '123     user    RUN   8nm        lxplus001   b6a2        myjob      Jan  1 10:00\n'
+             '124     user    PEND  8nm        lxplus001               myjob      Jan  1 10:00\n')
+    assert parseStatusLines(bjobs, getConfig('LSF')['status_res_pattern']) == {'123': 'RUN', '124': 'PEND'}
+
+    pbs = ('Job id            Name             User              Time Use S Queue\n'
+           '----------------  ---------------- ----------------  -------- - -----\n'
+           '123.server        myjob            user              00:00:01 R batch\n'
+           '124.server        myjob            user                     0 Q batch\n')
+    assert parseStatusLines(pbs, getConfig('PBS')['status_res_pattern']) == {'123': 'R', '124': 'Q'}
+
+    sge = ('job-ID  prior   name       user         state submit/start at     queue              slots\n'
+           '----------------------------------------------------------------------------------------\n'
+           '    123 0.55500 myjob      user         r     01/01/2020 10:00:00 all.q@host         1\n'
+           '    124 0.00000 myjob      user         qw    01/01/2020 10:00:00                    1\n')
+    assert parseStatusLines(sge, getConfig('SGE')['status_res_pattern']) == {'123': 'r', '124': 'qw'}
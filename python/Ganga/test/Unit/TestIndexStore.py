@@ -0,0 +1,85 @@
+import os
+import uuid
+
+
+def _store_fn():
+    return '/tmp/indexstore.tmp' + str(uuid.uuid4())
+
+
+def test_index_store_roundtrip():
+    """Test that records written by one store are seen by another, last write wins"""
+
+    from Ganga.Core.GangaRepository.IndexStore import IndexStore
+
+    fn = _store_fn()
+    writer = IndexStore(fn)
+    writer.put(1, 'jobs', 'Job', {'status': 'new'})
+    writer.put(2, 'jobs', 'Job', {'status': 'new'})
+    writer.commit()
+    writer.put(1, 'jobs', 'Job', {'status': 'running'})
+    writer.remove(2)
+    writer.commit()
+
+    reader = IndexStore(fn)
+    assert reader.load() == set([1])
+    assert reader.get(1).cache == {'status': 'running'}
+    assert reader.get(2) is None
+
+    writer.put(3, 'jobs', 'Job', {'status': 'new'})
+    writer.commit()
+    assert reader.refresh() == set([3])
+
+    os.remove(fn)
+
+
+def test_index_store_torn_record():
+    """Test that a partially written record at the end of the store is dropped"""
+
+    from Ganga.Core.GangaRepository.IndexStore import IndexStore
+
+    fn = _store_fn()
+    store = IndexStore(fn)
+    store.put(1, 'jobs', 'Job', {'status': 'new'})
+    store.commit()
+    good_size = os.path.getsize(fn)
+
+    with open(fn, 'ab') as f:
+        f.write('\x80\x02(K\x02')
+
+    reader = IndexStore(fn)
+    assert reader.load() == set([1])
+
+    reader.put(2, 'jobs', 'Job', {'status': 'new'})
+    reader.commit()
+    assert os.path.getsize(fn) > good_size
+
+    assert IndexStore(fn).load() == set([1, 2])
+
+    os.remove(fn)
+
+
+def test_index_store_compact():
+    """Test that compacting keeps only the live records"""
+
+    from Ganga.Core.GangaRepository.IndexStore import IndexStore
+
+    fn = _store_fn()
+    store = IndexStore(fn, compact_minimum=10)
+    for i in range(20):
+        store.put(0, 'jobs', 'Job', {'status': str(i)})
+        store.commit()
+    assert store.needs_compaction()
+
+    other = IndexStore(fn)
+    other.load()
+
+    store.compact()
+    assert not store.needs_compaction()
+    assert store.get(0).cache == {'status': '19'}
+
+    # A session still holding the old file picks up the compacted one
+    other.put(1, 'jobs', 'Job', {'status': 'new'})
+    other.commit()
+    assert IndexStore(fn).load() == set([0, 1])
+
+    os.remove(fn)
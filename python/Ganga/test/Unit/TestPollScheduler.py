@@ -0,0 +1,75 @@
+class _FakeJob(object):
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = 'submitted'
+
+
+def test_poll_scheduler_backoff():
+    """Test that idle jobs are checked less and less often and changed jobs straight away again"""
+
+    from Ganga.Core.MonitoringComponent.PollScheduler import PollScheduler
+
+    scheduler = PollScheduler()
+    jobs = [_FakeJob(0), _FakeJob(1)]
+    now = 1000.
+
+    # New jobs are due immediately, then not again before the poll reports back
+    assert scheduler.selectJobs('Local', jobs, now=now) == jobs
+    assert scheduler.selectJobs('Local', jobs, now=now) == []
+
+    scheduler.recordPoll('Local', [0], [1], 0., now=now)
+    # adaptive_min_poll_rate (2s) for the job which changed, twice that for the other one
+    assert scheduler.selectJobs('Local', jobs, now=now + 2) == [jobs[0]]
+    scheduler.recordPoll('Local', [], [0], 0., now=now + 2)
+    assert scheduler.selectJobs('Local', jobs, now=now + 4) == [jobs[1]]
+    scheduler.recordPoll('Local', [], [1], 0., now=now + 4)
+
+    # Intervals double up to the poll rate of the backend ([PollThread]Local = 10s)
+    for job_id in range(2):
+        for _ in range(10):
+            scheduler.recordPoll('Local', [], [job_id], 0., now=now)
+    assert scheduler.selectJobs('Local', jobs, now=now + 9) == []
+    assert scheduler.selectJobs('Local', jobs, now=now + 10) == jobs
+
+    # Finished jobs are forgotten
+    assert scheduler.selectJobs('Local', jobs[:1], now=now + 100) == jobs[:1]
+    stats = scheduler.stats()['backends']['Local']
+    assert stats['active_jobs'] == 1
+    assert stats['changes'] == 1
+    assert stats['longest_interval'] == 10.
+
+
+def test_poll_scheduler_cost_and_budget():
+    """Test that slow backends are polled less often and that the budget of calls is respected"""
+
+    from Ganga.Core.MonitoringComponent.PollScheduler import PollScheduler
+    from Ganga.Utility.Config import getConfig
+
+    config = getConfig('PollThread')
+    scheduler = PollScheduler()
+    now = 1000.
+
+    job = _FakeJob(0)
+    scheduler.selectJobs('LSF', [job], now=now)
+    # A poll taking 1.5s isn't repeated before adaptive_cost_factor * 1.5s
+    scheduler.recordPoll('LSF', [0], [], 1.5, now=now)
+    assert scheduler.selectJobs('LSF', [job], now=now + 14) == []
+    assert scheduler.selectJobs('LSF', [job], now=now + 15) == [job]
+
+    old_budget = config['max_backend_calls_per_minute']
+    old_block = config['numParallelJobs']
+    try:
+        config.setUserValue('max_backend_calls_per_minute', 2)
+        config.setUserValue('numParallelJobs', 2)
+        scheduler = PollScheduler()
+        jobs = [_FakeJob(i) for i in range(6)]
+        # 2 calls of 2 jobs
+        assert scheduler.selectJobs('PBS', jobs, now=now) == jobs[:4]
+        assert scheduler.selectJobs('PBS', jobs, now=now + 1) == []
+        assert scheduler.stats()['backends']['PBS']['deferred_by_budget'] == 2 + 2
+        # The jobs held back are the first ones the next minute
+        assert scheduler.selectJobs('PBS', jobs, now=now + 61) == jobs[4:] + jobs[:2]
+    finally:
+        config.setUserValue('max_backend_calls_per_minute', old_budget)
+        config.setUserValue('numParallelJobs', old_block)
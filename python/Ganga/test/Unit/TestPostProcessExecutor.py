@@ -0,0 +1,57 @@
+import threading
+import time
+
+
+class _FakeSubjob(object):
+
+    def __init__(self, index, started, release):
+        self.index = index
+        self.started = started
+        self.release = release
+        self.postprocessed = False
+
+    def getFQID(self, sep):
+        return '0%s%s' % (sep, self.index)
+
+    def _finishPostProcessing(self):
+        self.started.set()
+        self.release.wait(10)
+        self.postprocessed = True
+        return True
+
+
+def test_shutdown_leaves_waiting_subjobs():
+    """Test that shutdown lets the subjob being postprocessed finish and leaves the subjobs still waiting alone"""
+    from Ganga.GPIDev.Adapters.PostProcessExecutor import PostProcessExecutor
+    from Ganga.Utility.Config import getConfig, setConfigOption
+
+    old_threads = getConfig('Configuration')['PostProcessThreads']
+    setConfigOption('Configuration', 'PostProcessThreads', 1)
+
+    try:
+        started = threading.Event()
+        release = threading.Event()
+        subjobs = [_FakeSubjob(i, started, release) for i in range(20)]
+
+        executor = PostProcessExecutor()
+        for sj in subjobs:
+            executor.submit(sj)
+        assert started.wait(10)
+
+        # The running subjob is only let go once shutdown has started
+        timer = threading.Timer(0.2, release.set)
+        timer.start()
+        begin = time.time()
+        executor.shutdown()
+        assert time.time() - begin < 5
+        timer.join()
+
+        assert [sj.index for sj in subjobs if sj.postprocessed] == [0]
+        assert executor.info()['waiting'] == 0
+
+        # Subjobs completing after the shutdown are left for the next session too
+        late = _FakeSubjob(20, started, release)
+        executor.submit(late)
+        assert executor.info()['waiting'] == 0
+    finally:
+        setConfigOption('Configuration', 'PostProcessThreads', old_threads)
@@ -8,7 +8,7 @@ from Ganga.GPIDev.Lib.File.LocalFile import LocalFile
 def test_safe_save_threadcalls():
     """Test that XML files don't disappear - See Github Issue #185"""
 
-    from Ganga.Core.GangaRepository.GangaRepositoryXML import safe_save
+    from Ganga.Core.GangaRepository.GangaRepositoryXML import safe_save, _getFileLock
 
     def my_to_file(obj, fhandle, ignore_subs):
         fhandle.write("!" * 1000)
@@ -33,3 +33,40 @@ def test_safe_save_threadcalls():
     assert os.path.isfile(testfn+'~')
     os.remove(testfn+'~')
     assert not os.path.isfile(testfn+'.new')
+
+
+def test_safe_save_different_files():
+    """Test that a slow write of one file doesn't hold up the writes of other files"""
+
+    from Ganga.Core.GangaRepository.GangaRepositoryXML import safe_save, _getFileLock
+
+    release = threading.Event()
+
+    def slow_to_file(obj, fhandle, ignore_subs):
+        release.wait(10)
+        fhandle.write("slow")
+
+    def my_to_file(obj, fhandle, ignore_subs):
+        fhandle.write("fast")
+
+    slowfn = '/tmp/xmltest.tmp' + str(uuid.uuid4())
+    fastfn = '/tmp/xmltest.tmp' + str(uuid.uuid4())
+    # Files which share a lock are written one after the other
+    while _getFileLock(fastfn) is _getFileLock(slowfn):
+        fastfn = '/tmp/xmltest.tmp' + str(uuid.uuid4())
+
+    o = LocalFile()
+
+    slow = threading.Thread(target=safe_save, args=(slowfn, o, slow_to_file))
+    slow.start()
+    try:
+        safe_save(fastfn, o, my_to_file)
+        assert os.path.isfile(fastfn)
+        assert not os.path.isfile(slowfn)
+    finally:
+        release.set()
+        slow.join()
+
+    for fn in (slowfn, fastfn):
+        assert os.path.isfile(fn)
+        os.remove(fn)
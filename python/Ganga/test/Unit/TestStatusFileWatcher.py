@@ -0,0 +1,69 @@
+import os
+import time
+
+
+def _write(fn, content):
+    with open(fn, 'w') as f:
+        f.write(content)
+
+
+def test_status_file_watcher_mtime(tmpdir):
+    """Test that a status file is only parsed again once it has changed"""
+
+    from Ganga.Core.MonitoringComponent.StatusFileWatcher import StatusFileWatcher
+
+    fn = str(tmpdir.join('__jobstatus__'))
+    parsed = []
+
+    def parser(content):
+        parsed.append(content)
+        return content
+
+    watcher = StatusFileWatcher('mtime')
+    assert watcher.read(fn, parser) is None
+
+    _write(fn, 'PID: 1\n')
+    # Make the file look older than the mtime resolution window
+    os.utime(fn, (time.time() - 10, time.time() - 10))
+    assert watcher.read(fn, parser) == 'PID: 1\n'
+    assert watcher.read(fn, parser) == 'PID: 1\n'
+    assert watcher.read(fn, parser) == 'PID: 1\n'
+    assert len(parsed) == 2
+    assert watcher.stats['cached'] == 2
+
+    _write(fn, 'PID: 1\nEXITCODE: 0\n')
+    assert watcher.read(fn, parser) == 'PID: 1\nEXITCODE: 0\n'
+    assert len(parsed) == 3
+
+    watcher.forget(str(tmpdir))
+    assert watcher.read(fn, parser) == 'PID: 1\nEXITCODE: 0\n'
+    assert len(parsed) == 4
+
+
+def test_status_file_watcher_inotify(tmpdir):
+    """Test that a write to a watched status file is noticed without looking at the file"""
+
+    from Ganga.Core.MonitoringComponent.StatusFileWatcher import StatusFileWatcher
+
+    fn = str(tmpdir.join('__jobstatus__'))
+    _write(fn, 'PID: 1\n')
+    os.utime(fn, (time.time() - 10, time.time() - 10))
+
+    watcher = StatusFileWatcher('inotify')
+    try:
+        if watcher.mode != 'inotify':
+            # Not available here, the 'mtime' test covers the fallback
+            return
+        assert watcher.read(fn, lambda content: content) == 'PID: 1\n'
+        assert watcher.read(fn, lambda content: content) == 'PID: 1\n'
+        assert watcher.stats['cached'] == 1
+
+        _write(fn, 'PID: 1\nEXITCODE: 0\n')
+        for _ in range(50):
+            if watcher.read(fn, lambda content: content) == 'PID: 1\nEXITCODE: 0\n':
+                break
+            time.sleep(0.1)
+        assert watcher.read(fn, lambda content: content) == 'PID: 1\nEXITCODE: 0\n'
+        assert watcher.stats['events'] > 0
+    finally:
+        watcher.close()
@@ -0,0 +1,40 @@
+from StringIO import StringIO
+
+
+def test_subjob_index_queries():
+    """Test that the status queries follow the changes made to the index"""
+
+    from Ganga.Core.GangaRepository.SubJobIndex import SubJobIndex
+
+    index = SubJobIndex(dict((i, {'status': 'submitted', 'id': i}) for i in range(5)))
+    index[3] = {'status': 'running', 'id': 3, 'name': 'three'}
+    index[4] = {'status': 'completed', 'id': 4}
+
+    assert len(index) == 5
+    assert index.getIndexesWithStatus(['submitted', 'running']) == [0, 1, 2, 3]
+    assert index.getStatusCounts() == {'submitted': 3, 'running': 1, 'completed': 1}
+    assert index.getAllStatus() == ['submitted'] * 3 + ['running', 'completed']
+    assert index[3] == {'status': 'running', 'id': 3, 'name': 'three'}
+    # Keys which weren't in the cache of a subjob stay missing
+    assert 'name' not in index[0]
+    assert 7 not in index
+    assert index.get(7) is None
+
+
+def test_subjob_index_pickle():
+    """Test that the index survives being written the way subjobs.idx is and that old indexes can be converted"""
+
+    from Ganga.Core.GangaRepository.SubJobIndex import SubJobIndex
+    from Ganga.Core.GangaRepository.PickleStreamer import to_file, from_file
+
+    old_index = {0: {'status': 'failed', 'modified': 12.5}, 2: {'status': 'running', 'display:fqid': '1.2'}}
+    index = SubJobIndex(old_index)
+
+    f = StringIO()
+    to_file(index, f)
+    f.seek(0)
+    reread = from_file(f)[0]
+
+    assert [reread.get(i) for i in range(3)] == [old_index[0], None, old_index[2]]
+    assert reread.getIndexesWithStatus(['running']) == [2]
+    assert reread.keys() == [0, 2]
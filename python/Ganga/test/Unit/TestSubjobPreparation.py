@@ -0,0 +1,58 @@
+import pytest
+
+from Ganga.Core.exceptions import ApplicationConfigurationError
+
+
+class _App(object):
+
+    is_prepared = True
+
+    def __init__(self, arg):
+        self.arg = arg
+
+
+class _Handler(object):
+
+    def prepare(self, app, appsubconfig, appmasterconfig, jobmasterconfig):
+        if app.arg == 'bad':
+            raise ApplicationConfigurationError('cannot prepare %s' % appsubconfig)
+        return (app.arg, appsubconfig, appmasterconfig, jobmasterconfig)
+
+
+class _FrozenPool(object):
+
+    def __init__(self):
+        self.added = []
+
+    def isfrozen(self):
+        return True
+
+    def add_function(self, *args, **kwargs):
+        self.added.append(args)
+
+
+class _Queues(object):
+
+    def __init__(self):
+        self._monitoring_threadpool = _FrozenPool()
+
+
+def test_prepare_subjobs_frozen_pool(mocker):
+    """Test that the subjobs are prepared in order by the calling thread when the thread pool doesn't take tasks"""
+    from Ganga.GPIDev.Lib.Job.SubjobPreparation import prepareSubjobs
+
+    queues = _Queues()
+    mocker.patch('Ganga.Core.GangaThread.WorkerThreads.getQueues', return_value=queues)
+    results = prepareSubjobs(_Handler(), [_App(str(i)) for i in range(5)], range(5), 'app master', 'job master')
+
+    assert results == [(str(i), i, 'app master', 'job master') for i in range(5)]
+    assert queues._monitoring_threadpool.added == []
+
+
+def test_prepare_subjobs_error(mocker):
+    """Test that a GangaException raised by the preparation of a subjob is raised again"""
+    from Ganga.GPIDev.Lib.Job.SubjobPreparation import prepareSubjobs
+
+    mocker.patch('Ganga.Core.GangaThread.WorkerThreads.getQueues', return_value=_Queues())
+    with pytest.raises(ApplicationConfigurationError):
+        prepareSubjobs(_Handler(), [_App('0'), _App('bad'), _App('2')], range(3), 'app master', 'job master')
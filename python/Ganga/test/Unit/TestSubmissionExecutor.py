@@ -0,0 +1,71 @@
+import threading
+import time
+
+
+class _FakeSubjob(object):
+
+    def __init__(self, index):
+        self.index = index
+
+    def getFQID(self, sep):
+        return '0%s%s' % (sep, self.index)
+
+
+def test_submission_executor():
+    """Test that submissions are limited in flight, retried when not submitted, not retried when raising, and reported
+    through futures"""
+    from Ganga.GPIDev.Adapters.SubmissionExecutor import SubmissionExecutor, waitForAll
+    from Ganga.Utility.Config import getConfig, setConfigOption
+
+    config = getConfig('Configuration')
+    old_options = dict((o, config[o]) for o in ['SubmitMaxInFlight', 'SubmitRetries', 'SubmitRetryBackoff'])
+    setConfigOption('Configuration', 'SubmitMaxInFlight', 3)
+    setConfigOption('Configuration', 'SubmitRetries', 2)
+    setConfigOption('Configuration', 'SubmitRetryBackoff', 0.01)
+
+    lock = threading.Lock()
+    state = {'running': 0, 'most_running': 0}
+    attempts = {}
+
+    def submit(sj, sc):
+        with lock:
+            state['running'] += 1
+            state['most_running'] = max(state['most_running'], state['running'])
+            attempts[sj.index] = attempts.get(sj.index, 0) + 1
+        time.sleep(0.01)
+        with lock:
+            state['running'] -= 1
+        # Subjob 3 isn't submitted the first time, subjob 5 raises
+        if sj.index == 5:
+            raise RuntimeError('failed to read the job id')
+        return sj.index != 3 or attempts[3] > 1
+
+    try:
+        executor = SubmissionExecutor(submit, 'TestBackend')
+        futures = [executor.submit(_FakeSubjob(i), 'config %s' % i) for i in range(20)]
+        submitted, failed = waitForAll(futures)
+        executor.shutdown()
+
+        # The limit is read each time a submission starts
+        first_most_running = state['most_running']
+        setConfigOption('Configuration', 'SubmitMaxInFlight', 1)
+        state['most_running'] = 0
+        executor = SubmissionExecutor(submit, 'TestBackend')
+        later_futures = [executor.submit(_FakeSubjob(i), 'config %s' % i) for i in range(20, 30)]
+        waitForAll(later_futures)
+        executor.shutdown()
+    finally:
+        for option, value in old_options.items():
+            setConfigOption('Configuration', option, value)
+
+    assert first_most_running <= 3
+    assert state['most_running'] == 1
+    assert [f.subjob.index for f in submitted] == [i for i in range(20) if i != 5]
+    assert [f.subjob.index for f in failed] == [5]
+    assert isinstance(failed[0].error, RuntimeError)
+    # Raising may mean the job reached the batch system, it mustn't be submitted again
+    assert failed[0].attempts == 1
+    assert attempts[5] == 1
+    assert futures[3].attempts == 2
+    assert all(f.done() and f.latency is not None for f in futures)
+    assert all(f.submitted for f in later_futures)
@@ -0,0 +1,53 @@
+import os
+import uuid
+
+
+def _log_fn():
+    return '/tmp/writeaheadlog.tmp' + str(uuid.uuid4())
+
+
+def test_write_ahead_log_roundtrip():
+    """Test that the last record for each subjob wins and is seen when the log is re-read"""
+
+    from Ganga.Core.GangaRepository.WriteAheadLog import WriteAheadLog
+
+    fn = _log_fn()
+    wal = WriteAheadLog(fn)
+    wal.append([(0, 'first', {'status': 'running'}), (1, 'other', {'status': 'running'})])
+    wal.append([(0, 'second', {'status': 'completed'})])
+    assert wal.read(0) == 'second'
+
+    reader = WriteAheadLog(fn)
+    assert reader.load() == set([0, 1])
+    assert reader.read(0) == 'second'
+    assert reader.read(1) == 'other'
+    assert reader.caches()[0] == {'status': 'completed'}
+
+    wal.clear()
+    assert not os.path.exists(fn)
+    # Records have been copied elsewhere, a reader of the old log must notice
+    assert reader.read(0) is None
+
+
+def test_write_ahead_log_torn_record():
+    """Test that a partially written record at the end of the log is dropped"""
+
+    from Ganga.Core.GangaRepository.WriteAheadLog import WriteAheadLog
+
+    fn = _log_fn()
+    wal = WriteAheadLog(fn)
+    wal.append([(0, 'good', {})])
+    good_size = os.path.getsize(fn)
+
+    wal.append([(1, 'a' * 100, {})])
+    with open(fn, 'r+b') as f:
+        f.truncate(good_size + 50)
+
+    reader = WriteAheadLog(fn)
+    assert reader.load() == set([0])
+
+    reader.append([(2, 'new', {})])
+    assert WriteAheadLog(fn).load() == set([0, 2])
+    assert reader.read(2) == 'new'
+
+    os.remove(fn)
@@ -0,0 +1,48 @@
+import gzip
+import os
+
+
+def test_copy_stream(tmpdir):
+    """Files are appended whole to plain and compressed files"""
+
+    from Ganga.Utility.files import copy_stream
+
+    data = ''.join('line %i\n' % i for i in range(10000))
+    src = str(tmpdir.join('src.txt'))
+    with open(src, 'w') as f:
+        f.write(data)
+
+    dest = str(tmpdir.join('dest.txt'))
+    with open(dest, 'w') as out_file:
+        out_file.write('header\n')
+        with open(src) as in_file:
+            copy_stream(in_file, out_file, chunk_size=1000)
+        out_file.write('footer\n')
+    with open(dest) as f:
+        assert f.read() == 'header\n' + data + 'footer\n'
+
+    dest_gz = str(tmpdir.join('dest.txt.gz'))
+    out_file = gzip.GzipFile(dest_gz, 'w')
+    with open(src) as in_file:
+        copy_stream(in_file, out_file, chunk_size=1000)
+    out_file.close()
+    assert gzip.GzipFile(dest_gz).read() == data
+
+
+def test_parallel_gzip_writer(tmpdir):
+    """The output made of several gzip members reads back as the data written"""
+
+    from Ganga.Utility.files import ParallelGzipWriter
+
+    data = [os.urandom(100).encode('hex') + '\n' for i in range(2000)]
+    output = str(tmpdir.join('out.gz'))
+    writer = ParallelGzipWriter(output, threads=3, block_size=10000)
+    for line in data:
+        writer.write(line)
+    writer.close()
+    writer.close()
+
+    assert gzip.GzipFile(output).read() == ''.join(data)
+    # One member per block
+    with open(output, 'rb') as f:
+        assert f.read().count('\037\213\010\000') >= len(''.join(data)) // 10000
@@ -10,6 +10,8 @@ import datetime
 import shutil
 import tempfile
 import math
+import threading
+import Queue
 from collections import defaultdict
 from Ganga.GPIDev.Schema import Schema, Version, SimpleItem, ComponentItem
 from Ganga.GPIDev.Adapters.IBackend import IBackend, group_jobs_by_backend_credential
@@ -890,6 +892,107 @@ class DiracBase(IBackend):
         # FIXME should I add something here to cleanup on sandboxes pulled from
         # malformed job output?
 
+    @staticmethod
+    def _write_dirac_file_locations(job, file_info_dict):
+        """
+        Record the LFN, locations and GUID of the DiracFiles uploaded by the job in its post-processing locations file
+        Args:
+            job (Job): The job whose output data is described
+            file_info_dict (dict): The output data info from DIRAC, {file name: {'LFN':..., 'LOCATIONS':..., 'GUID':...}}
+        """
+        output_path = job.getOutputWorkspace().getPath()
+
+        if hasattr(job.outputfiles, 'get'):
+            wildcards = [f.namePattern for f in job.outputfiles.get(DiracFile) if regex.search(f.namePattern) is not None]
+        else:
+            wildcards = []
+
+        lfn_store = os.path.join(output_path, getConfig('Output')['PostProcessLocationsFileName'])
+
+        # Make the file on disk with a nullop...
+        if not os.path.isfile(lfn_store):
+            with open(lfn_store, 'w'):
+                pass
+
+        if hasattr(job.outputfiles, 'get') and job.outputfiles.get(DiracFile):
+
+            # Now we can iterate over the contents of the file without touching it
+            with open(lfn_store, 'ab') as postprocesslocationsfile:
+                if not hasattr(file_info_dict, 'keys'):
+                    logger.error("Error understanding OutputDataInfo: %s" % str(file_info_dict))
+                    raise GangaDiracError("Error understanding OutputDataInfo: %s" % str(file_info_dict))
+
+                ## Caution is not clear atm whether this 'Value' is an LHCbism or bug
+                list_of_files = file_info_dict.get('Value', file_info_dict.keys())
+
+                for file_name in list_of_files:
+                    file_name = os.path.basename(file_name)
+                    info = file_info_dict.get(file_name)
+                    #logger.debug("file_name: %s,\tinfo: %s" % (str(file_name), str(info)))
+
+                    if not hasattr(info, 'get'):
+                        logger.error("Error getting OutputDataInfo for: %s" % str(job.getFQID('.')))
+                        logger.error("Please check the Dirac Job still exists or attempt a job.backend.reset() to try again!")
+                        logger.error("Err: %s" % str(info))
+                        logger.error("file_info_dict: %s" % str(file_info_dict))
+                        raise GangaDiracError("Error getting OutputDataInfo")
+
+                    valid_wildcards = [wc for wc in wildcards if fnmatch.fnmatch(file_name, wc)]
+                    if not valid_wildcards:
+                        valid_wildcards.append('')
+
+                    for wc in valid_wildcards:
+                        #logger.debug("wildcard: %s" % str(wc))
+
+                        DiracFileData = 'DiracFile:::%s&&%s->%s:::%s:::%s\n' % (wc,
+                                                                                file_name,
+                                                                                info.get('LFN', 'Error Getting LFN!'),
+                                                                                str(info.get('LOCATIONS', ['NotAvailable'])),
+                                                                                info.get('GUID', 'NotAvailable')
+                                                                                )
+                        #logger.debug("DiracFileData: %s" % str(DiracFileData))
+                        postprocesslocationsfile.write(DiracFileData)
+                        postprocesslocationsfile.flush()
+
+            logger.debug("Written: %s" % open(lfn_store, 'r').readlines())
+
+    @staticmethod
+    def _check_output_sandbox(job, getSandboxResult):
+        """
+        Fail the job if its output sandbox couldn't be downloaded
+        Args:
+            job (Job): The job being finalised
+            getSandboxResult (dict): The result of getOutputSandbox from DIRAC
+        """
+        if not result_ok(getSandboxResult):
+            logger.warning('Problem retrieving outputsandbox: %s' % str(getSandboxResult))
+            DiracBase._getStateTime(job, 'failed')
+            if job.status in ['removed', 'killed']:
+                return
+            elif (job.master and job.master.status in ['removed', 'killed']):
+                return  # user changed it under us
+            job.updateStatus('failed')
+            if job.master:
+                job.master.updateMasterJobStatus()
+            raise BackendError('Dirac', 'Problem retrieving outputsandbox: %s' % str(getSandboxResult))
+
+    @staticmethod
+    def _set_job_completed(job, completeTimeResult):
+        """
+        Last step of the finalisation of a job, this runs its post-processors
+        Args:
+            job (Job): The job being finalised
+            completeTimeResult (dict): The time the job completed in DIRAC
+        """
+        DiracBase._getStateTime(job, 'completed', completeTimeResult)
+        if job.status in ['removed', 'killed']:
+            return
+        elif (job.master and job.master.status in ['removed', 'killed']):
+            return  # user changed it under us
+        job.updateStatus('completed')
+        if job.master:
+            job.master.updateMasterJobStatus()
+
     @staticmethod
     def _internal_job_finalisation(job, updated_dirac_status):
         """
@@ -925,83 +1028,10 @@ class DiracBase(IBackend):
             #logger.info('Job ' + job.fqid + ' OutputSandbox: ' + str(getSandboxResult))
             #logger.info('Job ' + job.fqid + ' normCPUTime: ' + str(job.backend.normCPUTime))
 
-            # Set DiracFile metadata
-            if hasattr(job.outputfiles, 'get'):
-                wildcards = [f.namePattern for f in job.outputfiles.get(DiracFile) if regex.search(f.namePattern) is not None]
-            else:
-                wildcards = []
-
-            lfn_store = os.path.join(output_path, getConfig('Output')['PostProcessLocationsFileName'])
-
-            # Make the file on disk with a nullop...
-            if not os.path.isfile(lfn_store):
-                with open(lfn_store, 'w'):
-                    pass
-
-            if hasattr(job.outputfiles, 'get') and job.outputfiles.get(DiracFile):
-
-                # Now we can iterate over the contents of the file without touching it
-                with open(lfn_store, 'ab') as postprocesslocationsfile:
-                    if not hasattr(file_info_dict, 'keys'):
-                        logger.error("Error understanding OutputDataInfo: %s" % str(file_info_dict))
-                        raise GangaDiracError("Error understanding OutputDataInfo: %s" % str(file_info_dict))
-
-                    ## Caution is not clear atm whether this 'Value' is an LHCbism or bug
-                    list_of_files = file_info_dict.get('Value', file_info_dict.keys())
-
-                    for file_name in list_of_files:
-                        file_name = os.path.basename(file_name)
-                        info = file_info_dict.get(file_name)
-                        #logger.debug("file_name: %s,\tinfo: %s" % (str(file_name), str(info)))
-
-                        if not hasattr(info, 'get'):
-                            logger.error("Error getting OutputDataInfo for: %s" % str(job.getFQID('.')))
-                            logger.error("Please check the Dirac Job still exists or attempt a job.backend.reset() to try again!")
-                            logger.error("Err: %s" % str(info))
-                            logger.error("file_info_dict: %s" % str(file_info_dict))
-                            raise GangaDiracError("Error getting OutputDataInfo")
-
-                        valid_wildcards = [wc for wc in wildcards if fnmatch.fnmatch(file_name, wc)]
-                        if not valid_wildcards:
-                            valid_wildcards.append('')
-
-                        for wc in valid_wildcards:
-                            #logger.debug("wildcard: %s" % str(wc))
-
-                            DiracFileData = 'DiracFile:::%s&&%s->%s:::%s:::%s\n' % (wc,
-                                                                                    file_name,
-                                                                                    info.get('LFN', 'Error Getting LFN!'),
-                                                                                    str(info.get('LOCATIONS', ['NotAvailable'])),
-                                                                                    info.get('GUID', 'NotAvailable')
-                                                                                    )
-                            #logger.debug("DiracFileData: %s" % str(DiracFileData))
-                            postprocesslocationsfile.write(DiracFileData)
-                            postprocesslocationsfile.flush()
-
-                logger.debug("Written: %s" % open(lfn_store, 'r').readlines())
-
-            # check outputsandbox downloaded correctly
-            if not result_ok(getSandboxResult):
-                logger.warning('Problem retrieving outputsandbox: %s' % str(getSandboxResult))
-                DiracBase._getStateTime(job, 'failed')
-                if job.status in ['removed', 'killed']:
-                    return
-                elif (job.master and job.master.status in ['removed', 'killed']):
-                    return  # user changed it under us
-                job.updateStatus('failed')
-                if job.master:
-                    job.master.updateMasterJobStatus()
-                raise BackendError('Dirac', 'Problem retrieving outputsandbox: %s' % str(getSandboxResult))
-
-            # finally update job to completed
-            DiracBase._getStateTime(job, 'completed', completeTimeResult)
-            if job.status in ['removed', 'killed']:
-                return
-            elif (job.master and job.master.status in ['removed', 'killed']):
-                return  # user changed it under us
-            job.updateStatus('completed')
-            if job.master:
-                job.master.updateMasterJobStatus()
+            DiracBase._write_dirac_file_locations(job, file_info_dict)
+
+            DiracBase._check_output_sandbox(job, getSandboxResult)
+            DiracBase._set_job_completed(job, completeTimeResult)
             now = time.time()
             logger.debug('Job ' + job.fqid + ' Time for complete update : ' + str(now - start))
 
@@ -1081,6 +1111,11 @@ class DiracBase(IBackend):
                 j.been_queued = False
                 continue
             if not configDirac['serializeBackend']:
+                if configDirac['pipelinedFinalisation'] and finalised_statuses[j.backend.status] == 'completed':
+                    from GangaDirac.Lib.Backends.DiracFinalisation import getFinalisationPipeline
+                    j.been_queued = True
+                    getFinalisationPipeline().add(j)
+                    continue
                 getQueues()._monitoring_threadpool.add_function(DiracBase.job_finalisation,
                                                            args=(j, finalised_statuses[j.backend.status]),
                                                            priority=5, name="Job %s Finalizing" % j.fqid)
@@ -1089,10 +1124,34 @@ class DiracBase(IBackend):
                 DiracBase.job_finalisation(j, finalised_statuses[j.backend.status])
 
 
+    @staticmethod
+    def _monitor_dirac_shard(shard, statusmapping, retries):
+        """
+        Ask DIRAC about the state of one shard of jobs, retrying a few times if DIRAC fails
+        Args:
+            shard (list): Jobs, all with a DIRAC id, monitored in one monitorJobs call
+            statusmapping (dict): Dict of the Dirac statuses vs the Ganga statuses
+            retries (int): How many more times to try after a failure
+        """
+        dirac_job_ids = [j.backend.id for j in shard]
+        for attempt in range(retries + 1):
+            try:
+                result, bulk_state_result = execute('monitorJobs(%s, %s)' % (repr(dirac_job_ids), repr(statusmapping)), cred_req=shard[0].backend.credential_requirements)
+                if len(result) == len(shard):
+                    return result, bulk_state_result
+                logger.warning('Dirac monitoring failed for %s, result = %s' % (str(dirac_job_ids), str(result)))
+            except GangaDiracError as err:
+                logger.debug("Dirac monitoring of %s jobs failed: %s" % (len(shard), err))
+                if attempt == retries:
+                    raise
+        raise GangaDiracError("Dirac monitoring failed for %s jobs" % len(shard))
+
     @staticmethod
     def monitor_dirac_running_jobs(monitor_jobs, finalised_statuses):
         """
         Method to update the configuration of jobs which are in a submitted/running state in Ganga&Dirac
+        The jobs are split in shards of [DIRAC]MonitoringShardSize jobs, up to [DIRAC]MonitoringParallelShards of them
+        are sent to DIRAC at the same time and the state of the jobs of each shard is updated as soon as it returns
         Args:
             monitor_jobs (list): Jobs which are to be monitored for their status change
             finalised_statuses (dict): Dict of the Dirac statuses vs the Ganga statuses after running
@@ -1111,29 +1170,80 @@ class DiracBase(IBackend):
             if d.master is not None:
                 d.master.updateMasterJobStatus()
 
-        ganga_job_status = [j.status for j in monitor_jobs if j.backend.id is not None]
-        dirac_job_ids = [j.backend.id for j in monitor_jobs if j.backend.id is not None]
+        live_jobs = [j for j in monitor_jobs if j.backend.id is not None]
 
-        logger.debug("GangaStatus: %s" % str(ganga_job_status))
-        logger.debug("diracJobIDs: %s" % str(dirac_job_ids))
+        logger.debug("diracJobIDs: %s" % str([j.backend.id for j in live_jobs]))
 
-        if not dirac_job_ids:
+        if not live_jobs:
             ## Nothing to do here stop bugging DIRAC about it!
             ## Everything else beyond here in the function depends on some ids present here, no ids means we can stop.
             return
 
         statusmapping = configDirac['statusmapping']
+        shard_size = max(1, configDirac['MonitoringShardSize'])
+        retries = configDirac['MonitoringShardRetries']
+        shards = [live_jobs[i:i + shard_size] for i in range(0, len(live_jobs), shard_size)]
 
-        result, bulk_state_result = execute('monitorJobs(%s, %s)' %( repr(dirac_job_ids), repr(statusmapping)), cred_req=monitor_jobs[0].backend.credential_requirements)
+        if len(shards) == 1:
+            try:
+                result, bulk_state_result = DiracBase._monitor_dirac_shard(shards[0], statusmapping, retries)
+            except GangaDiracError as err:
+                # Don't stop the monitoring of the jobs using other credentials
+                logger.warning("Dirac monitoring failed for %s jobs, they will be checked again at the next update" % len(shards[0]))
+                logger.debug(err)
+                return
+            DiracBase._apply_dirac_monitoring_result(shards[0], result, bulk_state_result, finalised_statuses)
+            return
 
-        #result = results[0]
-        #bulk_state_result = results[1]
+        # The DIRAC calls run in threads, the jobs are only touched from this one
+        results = Queue.Queue()
+        pending = Queue.Queue()
+        for shard in shards:
+            pending.put(shard)
 
-        if len(result) != len(ganga_job_status):
-            logger.warning('Dirac monitoring failed for %s, result = %s' % (str(dirac_job_ids), str(result)))
-            logger.warning("Results: %s" % str(result))
-            return
+        def shard_worker():
+            while True:
+                try:
+                    shard = pending.get_nowait()
+                except Queue.Empty:
+                    return
+                if monitoring_component and monitoring_component.should_stop():
+                    results.put((shard, None, None))
+                    continue
+                try:
+                    results.put((shard, DiracBase._monitor_dirac_shard(shard, statusmapping, retries), None))
+                except Exception as err:
+                    results.put((shard, None, err))
+
+        for _ in range(min(len(shards), max(1, configDirac['MonitoringParallelShards']))):
+            worker = threading.Thread(target=shard_worker, name='DiracMonitoringShard')
+            worker.daemon = True
+            worker.start()
+
+        failed_shards = 0
+        for _ in range(len(shards)):
+            shard, shard_result, err = results.get()
+            if err is not None:
+                failed_shards += 1
+                logger.debug("Dirac monitoring of shard failed: %s" % err)
+                continue
+            if shard_result is None:
+                continue
+            DiracBase._apply_dirac_monitoring_result(shard, shard_result[0], shard_result[1], finalised_statuses)
 
+        if failed_shards:
+            logger.warning("Dirac monitoring failed for %s of %s groups of jobs, they will be checked again at the next update" % (failed_shards, len(shards)))
+
+    @staticmethod
+    def _apply_dirac_monitoring_result(monitor_jobs, result, bulk_state_result, finalised_statuses):
+        """
+        Update the jobs from the answer of DIRAC to monitorJobs
+        Args:
+            monitor_jobs (list): Jobs which were monitored, in the order of their DIRAC ids in the call
+            result (list): The status vector of each job
+            bulk_state_result (dict): The times of the state changes of the jobs
+            finalised_statuses (dict): Dict of the Dirac statuses vs the Ganga statuses after running
+        """
         requeue_job_list = []
         jobStateDict = {}
 
@@ -1141,7 +1251,7 @@ class DiracBase(IBackend):
         master_jobs_to_update = []
 
         thread_handled_states = ['completed', 'failed']
-        for job, state, old_state in zip(monitor_jobs, result, ganga_job_status):
+        for job, state in zip(monitor_jobs, result):
             if monitoring_component and monitoring_component.should_stop():
                     break
 
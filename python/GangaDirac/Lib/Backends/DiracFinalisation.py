@@ -0,0 +1,243 @@
+"""
+Staged finalisation of DIRAC jobs which completed.
+
+Finalising jobs one at a time (DiracBase.job_finalisation) interleaves talking to DIRAC with local work, so a burst of
+thousands of subjobs finishing together builds up a long backlog. Here completed jobs go through three stages, each
+with its own queue and threads, so that the network I/O of some jobs overlaps with the local work on others:
+  - download: the output sandboxes, CPU times and completion times of [DIRAC]FinalisationBatchSize jobs are fetched in
+    one DIRAC call, by up to [DIRAC]FinalisationDownloadThreads threads
+  - metadata: the LFNs, GUIDs and replicas of the output data of a batch of jobs are looked up in one DIRAC call and
+    written to the post-processing locations file of each job
+  - postprocess: the jobs are set to completed, which runs their post-processors and output file handling
+A job for which any of the stages fails, including the download of its output sandbox, is handed to
+DiracBase.job_finalisation, with its retries, as before.
+"""
+
+import time
+import threading
+import Queue
+
+from Ganga.Core.GangaThread import GangaThread
+from Ganga.Core.GangaThread.WorkerThreads import getQueues
+from Ganga.GPIDev.Adapters.IBackend import group_jobs_by_backend_credential
+from Ganga.Utility.Config import getConfig
+from Ganga.Utility.logging import getLogger
+from GangaDirac.Lib.Backends.DiracUtils import result_ok
+from GangaDirac.Lib.Files.DiracFile import DiracFile
+from GangaDirac.Lib.Utilities.DiracUtilities import execute
+
+logger = getLogger()
+
+
+class _Stage(object):
+
+    """ One step of the finalisation, its queue of jobs and how fast it gets through them """
+
+    def __init__(self, name, function, threads_option):
+        """
+        Args:
+            name (str): name of the stage, used in the statistics
+            function (function): processes a list of items, returns the items for the next stage
+            threads_option (str): [DIRAC] option giving the number of threads of the stage
+        """
+        self.name = name
+        self.function = function
+        self.threads_option = threads_option
+        self.queue = Queue.Queue()
+        self.threads = []
+        self._lock = threading.Lock()
+        self.active = 0
+        self.processed = 0
+        self.failed = 0
+        self.busy_time = 0.
+
+    def metrics(self):
+        """ Returns the queue depth, jobs being processed, jobs processed and failed and jobs per second of work """
+        with self._lock:
+            return {'queued': self.queue.qsize(),
+                    'active': self.active,
+                    'processed': self.processed,
+                    'failed': self.failed,
+                    'jobs_per_second': self.processed / self.busy_time if self.busy_time else None}
+
+
+class _StageWorker(GangaThread):
+
+    """ Takes batches of jobs from the queue of a stage and processes them """
+
+    def __init__(self, pipeline, stage, next_stage):
+        super(_StageWorker, self).__init__(name='DiracFinalisation_%s' % stage.name, critical=False)
+        self._pipeline = pipeline
+        self._stage = stage
+        self._next_stage = next_stage
+
+    def run(self):
+        while not self.should_stop():
+            try:
+                batch = [self._stage.queue.get(timeout=1.)]
+            except Queue.Empty:
+                continue
+            batch_size = max(1, getConfig('DIRAC')['FinalisationBatchSize'])
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self._stage.queue.get_nowait())
+                except Queue.Empty:
+                    break
+            self._pipeline._process(self._stage, self._next_stage, batch)
+
+
+class FinalisationPipeline(object):
+
+    """
+    Download, metadata and post-processing stages for the finalisation of completed DIRAC jobs
+    """
+
+    def __init__(self):
+        super(FinalisationPipeline, self).__init__()
+        self._lock = threading.Lock()
+        self.stages = [_Stage('download', self._download, 'FinalisationDownloadThreads'),
+                       _Stage('metadata', self._metadata, 'FinalisationMetadataThreads'),
+                       _Stage('postprocess', self._postprocess, 'FinalisationPostProcessThreads')]
+
+    def _startThreads(self):
+        """ Start the threads of the stages which have none running, e.g. on first use or after a restart of Ganga """
+        with self._lock:
+            for i, stage in enumerate(self.stages):
+                stage.threads = [t for t in stage.threads if t.isAlive() and not t.should_stop()]
+                next_stage = self.stages[i + 1] if i + 1 < len(self.stages) else None
+                while len(stage.threads) < max(1, getConfig('DIRAC')[stage.threads_option]):
+                    worker = _StageWorker(self, stage, next_stage)
+                    worker.start()
+                    stage.threads.append(worker)
+
+    def add(self, job):
+        """ Queue a job which completed in DIRAC for finalisation
+        Args:
+            job (Job): the job, with job.been_queued set by the caller
+        """
+        self._startThreads()
+        self.stages[0].queue.put((job, None))
+
+    def stats(self):
+        """ Returns the metrics of each stage """
+        return dict((stage.name, stage.metrics()) for stage in self.stages)
+
+    def _process(self, stage, next_stage, batch):
+        """ Run the stage on a batch of (job, data) and pass on the result """
+        with stage._lock:
+            stage.active += len(batch)
+        start = time.time()
+        try:
+            passed_on = stage.function(batch)
+        except Exception as err:
+            logger.debug("DIRAC finalisation %s stage error: %s" % (stage.name, err))
+            for job, _data in batch:
+                self._fallback(job, err)
+            passed_on = []
+        with stage._lock:
+            stage.active -= len(batch)
+            stage.busy_time += time.time() - start
+            stage.processed += len(passed_on)
+            stage.failed += len(batch) - len(passed_on)
+        if next_stage is not None:
+            for item in passed_on:
+                next_stage.queue.put(item)
+
+    @staticmethod
+    def _fallback(job, err):
+        """ Hand a job the pipeline couldn't finalise to the serial finalisation and its retries """
+        from GangaDirac.Lib.Backends.DiracBase import DiracBase
+        logger.debug("Finalising job %s on its own after: %s" % (job.getFQID('.'), err))
+        if job.status in ['completed', 'failed', 'killed', 'removed']:
+            job.been_queued = False
+            return
+        DiracBase.job_finalisation_cleanup(job, 'completed')
+        getQueues()._monitoring_threadpool.add_function(DiracBase.job_finalisation, args=(job, 'completed'),
+                                                        priority=5, name="Job %s Finalizing" % job.fqid)
+
+    @staticmethod
+    def _download(batch):
+        """ Move the jobs to completing and download their output sandboxes """
+        from GangaDirac.Lib.Backends.DiracBase import DiracBase
+        ready = []
+        for job, _data in batch:
+            # Check status is sane before we start
+            if job.status != "running" and job.status not in ['completed', 'killed', 'removed']:
+                job.updateStatus('submitted')
+                job.updateStatus('running')
+            if job.status in ['completed', 'killed', 'removed'] or (job.master and job.master.status in ['removed', 'killed']):
+                job.been_queued = False
+                continue
+            DiracBase._getStateTime(job, 'completing')
+            job.updateStatus('completing')
+            if job.master:
+                job.master.updateMasterJobStatus()
+            ready.append(job)
+
+        passed_on = []
+        for jobs in group_jobs_by_backend_credential(ready):
+            try:
+                results = execute('finished_jobs_sandboxes(%s)' % repr([(j.backend.id, j.getOutputWorkspace().getPath()) for j in jobs]),
+                                  cred_req=jobs[0].backend.credential_requirements)
+            except Exception as err:
+                for job in jobs:
+                    FinalisationPipeline._fallback(job, err)
+                continue
+            for job in jobs:
+                try:
+                    job.backend.normCPUTime, getSandboxResult, completeTimeResult = results[job.backend.id]
+                except Exception as err:
+                    FinalisationPipeline._fallback(job, err)
+                    continue
+                if not result_ok(getSandboxResult):
+                    # The download is tried again by the serial finalisation before the job is failed
+                    FinalisationPipeline._fallback(job, 'Problem retrieving outputsandbox: %s' % str(getSandboxResult))
+                    continue
+                passed_on.append((job, completeTimeResult))
+        return passed_on
+
+    @staticmethod
+    def _metadata(batch):
+        """ Record where the output data of the jobs went """
+        from GangaDirac.Lib.Backends.DiracBase import DiracBase
+        with_data = [job for job, _data in batch if hasattr(job.outputfiles, 'get') and job.outputfiles.get(DiracFile)]
+        file_info = {}
+        for jobs in group_jobs_by_backend_credential(with_data):
+            file_info.update(execute('getBulkOutputDataInfo(%s)' % repr([j.backend.id for j in jobs]),
+                                     cred_req=jobs[0].backend.credential_requirements))
+        passed_on = []
+        for job, completeTimeResult in batch:
+            try:
+                DiracBase._write_dirac_file_locations(job, file_info.get(job.backend.id, {}))
+            except Exception as err:
+                FinalisationPipeline._fallback(job, err)
+                continue
+            passed_on.append((job, completeTimeResult))
+        return passed_on
+
+    @staticmethod
+    def _postprocess(batch):
+        """ Complete the jobs, running their post-processors """
+        from GangaDirac.Lib.Backends.DiracBase import DiracBase
+        passed_on = []
+        for job, completeTimeResult in batch:
+            try:
+                DiracBase._set_job_completed(job, completeTimeResult)
+            except Exception as err:
+                FinalisationPipeline._fallback(job, err)
+                continue
+            job.been_queued = False
+            passed_on.append((job, completeTimeResult))
+        return passed_on
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def getFinalisationPipeline():
+    """ Returns the finalisation pipeline shared by all DIRAC backends """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = FinalisationPipeline()
+    return _pipeline
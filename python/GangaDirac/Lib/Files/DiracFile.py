@@ -16,9 +16,10 @@ from Ganga.GPIDev.Lib.Job.Job import Job
 from Ganga.Utility.files import expandfilename
 from Ganga.Core.exceptions import GangaFileError
 from GangaDirac.Lib.Utilities.DiracUtilities import getDiracEnv, execute, GangaDiracError
+from GangaDirac.Lib.Utilities import DiracCatalogue
 import Ganga.Utility.Config
 from Ganga.Runtime.GPIexport import exportToGPI
-from Ganga.GPIDev.Credentials import require_credential
+from Ganga.GPIDev.Credentials import require_credential, check_credential
 from GangaDirac.Lib.Credentials.DiracProxy import DiracProxy, DiracProxyInfo
 from Ganga.Utility.Config import getConfig
 from Ganga.Utility.logging import getLogger
@@ -396,7 +397,10 @@ class DiracFile(IGangaFile):
         if self.lfn == "":
             raise GangaFileError('Can\'t remove a  file from DIRAC SE without an LFN.')
         logger.info('Removing file %s' % self.lfn)
-        stdout = execute('removeFile("%s")' % self.lfn, cred_req=self.credential_requirements)
+        try:
+            stdout = execute('removeFile("%s")' % self.lfn, cred_req=self.credential_requirements)
+        finally:
+            DiracCatalogue.forgetLFNs([self.lfn])
 
         self.lfn = ""
         self.locations = []
@@ -414,6 +418,7 @@ class DiracFile(IGangaFile):
         try:
             logger.info("Removing replica at %s for LFN %s" % (SE, self.lfn))
             stdout = execute('removeReplica("%s", "%s")' % (self.lfn, SE), cred_req=self.credential_requirements)
+            DiracCatalogue.forgetLFNs([self.lfn])
             self.locations.remove(SE)
         except GangaDiracError as err:
             raise err
@@ -436,7 +441,10 @@ class DiracFile(IGangaFile):
 
         # eval again here as datatime not included in dirac_ganga_server
 
-        ret = execute('getMetadata("%s")' % self.lfn, cred_req=self.credential_requirements)
+        # Copied as the answer may be shared with other DiracFiles through the catalogue cache
+        ret = copy.deepcopy(DiracCatalogue.metadata.lookupOne(self.lfn, self.credential_requirements))
+        if self.lfn not in ret['Successful']:
+            raise GangaDiracError("Couldn't get the metadata of %s: %s" % (self.lfn, ret['Failed'].get(self.lfn)))
 
         if self.guid != ret.get('Successful',{}).get(self.lfn,{}).get('GUID',False):
             self.guid = ret['Successful'][self.lfn]['GUID']
@@ -510,7 +518,8 @@ class DiracFile(IGangaFile):
             if (self._storedReplicas == {} and len(self.subfiles) == 0) or forceRefresh:
 
                 try:
-                    self._storedReplicas = execute('getReplicas("%s")' % self.lfn, cred_req=self.credential_requirements)
+                    self._storedReplicas = DiracCatalogue.replicas.lookupOne(self.lfn, self.credential_requirements,
+                                                                             forceRefresh=forceRefresh)
                 except GangaDiracError as err:
                     logger.error("Couldn't find replicas for: %s" % str(self.lfn))
                     self._storedReplicas = {}
@@ -632,7 +641,10 @@ class DiracFile(IGangaFile):
             raise GangaFileError('Must supply an lfn to replicate')
 
         logger.info("Replicating file %s to %s" % (self.lfn, destSE))
-        stdout = execute('replicateFile("%s", "%s", "%s")' % (self.lfn, destSE, sourceSE), cred_req=self.credential_requirements)
+        try:
+            stdout = execute('replicateFile("%s", "%s", "%s")' % (self.lfn, destSE, sourceSE), cred_req=self.credential_requirements)
+        finally:
+            DiracCatalogue.forgetLFNs([self.lfn])
 
         if destSE not in self.locations:
             self.locations.append(destSE)
@@ -783,6 +795,7 @@ class DiracFile(IGangaFile):
                 self.failureReason += '\n' + failureReason
                 continue
 
+            DiracCatalogue.forgetLFNs([lfn])
             stdout_temp = stdout.get('Successful')
 
             if not stdout_temp:
@@ -958,6 +971,114 @@ for f in glob.glob('###NAME_PATTERN###'):
         user = DiracProxyInfo(credential_requirements).username
         return '/{0}/user/{1}/{2}'.format(configDirac['userVO'], user[0], user)
 
+
+def _diracFilesByProxy(files):
+    """
+    Returns {credential key: [DiracFile]} for the DiracFiles with an LFN among the files (and their subfiles)
+    Args:
+        files (list): DiracFiles, e.g. the outputfiles of a job, other types of files are ignored
+    """
+    grouped = {}
+    for this_file in files:
+        this_file = stripProxy(this_file)
+        if not isinstance(this_file, DiracFile):
+            continue
+        for f in this_file.subfiles or [this_file]:
+            f = stripProxy(f)
+            if f.lfn:
+                grouped.setdefault(DiracCatalogue._credentialKey(f.credential_requirements), []).append(f)
+    # Check the proxies up front so that no group is acted on if one of them is missing
+    for these_files in grouped.values():
+        check_credential(these_files[0].credential_requirements)
+    return grouped
+
+
+def getReplicasForFiles(files, forceRefresh=False):
+    """
+    Look up the replicas of many DiracFiles with as few DIRAC calls as possible, returns {lfn: {SE: PFN}}
+    The replicas are stored in the DiracFiles as if getReplicas had been called on each of them
+    Args:
+        files (list): DiracFiles, e.g. the outputfiles of a job
+        forceRefresh (bool): ask DIRAC even about files whose replicas are known already
+    """
+    all_replicas = {}
+    for these_files in _diracFilesByProxy(files).values():
+        reps = DiracCatalogue.replicas.lookup([f.lfn for f in these_files], these_files[0].credential_requirements,
+                                              forceRefresh=forceRefresh)['Successful']
+        for f in these_files:
+            if f.lfn in reps:
+                f._storedReplicas = {f.lfn: reps[f.lfn]}
+                f._updateRemoteURLs(reps)
+        all_replicas.update(reps)
+    return all_replicas
+
+
+def getMetadataForFiles(files):
+    """
+    Look up the metadata of many DiracFiles with as few DIRAC calls as possible, returns {lfn: metadata}
+    The guid of the DiracFiles is updated from it
+    Args:
+        files (list): DiracFiles, e.g. the outputfiles of a job
+    """
+    all_metadata = {}
+    for these_files in _diracFilesByProxy(files).values():
+        ret = DiracCatalogue.metadata.lookup([f.lfn for f in these_files], these_files[0].credential_requirements)
+        for lfn, reason in ret['Failed'].iteritems():
+            logger.warning("Couldn't get the metadata of %s: %s" % (lfn, reason))
+        for f in these_files:
+            this_metadata = ret['Successful'].get(f.lfn)
+            if this_metadata and this_metadata.get('GUID') and f.guid != this_metadata['GUID']:
+                f.guid = this_metadata['GUID']
+        all_metadata.update(copy.deepcopy(ret['Successful']))
+    return all_metadata
+
+
+def removeDiracFiles(files):
+    """
+    Remove many DiracFiles from DIRAC with as few DIRAC calls as possible, returns the LFNs which couldn't be removed
+    Args:
+        files (list): DiracFiles, e.g. the outputfiles of a job
+    """
+    failed = {}
+    for these_files in _diracFilesByProxy(files).values():
+        logger.info('Removing %s files' % len(these_files))
+        ret = DiracCatalogue.removeFiles([f.lfn for f in these_files], these_files[0].credential_requirements)
+        failed.update(ret['Failed'])
+        for f in these_files:
+            if f.lfn not in ret['Failed']:
+                f.lfn = ''
+                f.locations = []
+                f.guid = ''
+    for lfn, reason in failed.iteritems():
+        logger.warning("Couldn't remove %s: %s" % (lfn, reason))
+    return failed
+
+
+def getDiracFiles(files, localDir):
+    """
+    Download many DiracFiles to localDir with as few DIRAC calls as possible, returns the LFNs which couldn't be downloaded
+    Args:
+        files (list): DiracFiles, e.g. the outputfiles of a job
+        localDir (str): the directory to put the files in
+    """
+    localDir = expandfilename(localDir)
+    if not os.path.isdir(localDir):
+        raise GangaFileError('%s is not a valid directory' % localDir)
+    failed = {}
+    for these_files in _diracFilesByProxy(files).values():
+        logger.info('Getting %s files' % len(these_files))
+        ret = DiracCatalogue.getFiles([f.lfn for f in these_files], localDir, these_files[0].credential_requirements)
+        failed.update(ret['Failed'])
+        for f in these_files:
+            if f.lfn not in ret['Failed'] and f.namePattern == '':
+                f.namePattern = os.path.basename(f.lfn)
+    for lfn, reason in failed.iteritems():
+        logger.warning("Couldn't get %s: %s" % (lfn, reason))
+    return failed
+
+for _bulk_function in [getReplicasForFiles, getMetadataForFiles, removeDiracFiles, getDiracFiles]:
+    exportToGPI(_bulk_function.__name__, _bulk_function, 'Functions')
+
 # add DiracFile objects to the configuration scope (i.e. it will be
 # possible to write instatiate DiracFile() objects via config file)
 Ganga.Utility.Config.config_scope['DiracFile'] = DiracFile
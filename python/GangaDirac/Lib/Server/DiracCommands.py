@@ -240,6 +240,60 @@ def finished_job(id, outputDir=os.getcwd(), oversized=True, noJobDir=True):
     return (out_cpuTime, out_sandbox, out_dataInfo, outStateTime)
 
 
+@diracCommand
+def finished_jobs_sandboxes(jobs, oversized=True, noJobDir=True):
+    ''' Bulk version of the sandbox part of finished_job, for the finalisation pipeline
+    jobs: list of (DIRAC job id, output directory)
+    Returns {id: (CPU time, output sandbox result, {'completed': state time})}'''
+    ret = {}
+    for this_id, outputDir in jobs:
+        try:
+            ret[this_id] = (normCPUTime(this_id, pipe_out=False),
+                            getOutputSandbox(this_id, outputDir, oversized, noJobDir, pipe_out=False),
+                            {'completed': getStateTime(this_id, 'completed', pipe_out=False)})
+        except Exception as err:
+            ret[this_id] = (None, {'OK': False, 'Message': 'Error: %s' % str(err)}, {'completed': None})
+    return ret
+
+
+@diracCommand
+def getBulkOutputDataInfo(ids):
+    ''' Bulk version of getOutputDataInfo, the metadata and replicas of all the LFNs are looked up together
+    Returns {id: {file name: {'LFN':..., 'GUID':..., 'LOCATIONS':...}}}'''
+    job_lfns = {}
+    for this_id in ids:
+        result = getOutputDataLFNs(this_id, pipe_out=False)
+        job_lfns[this_id] = result.get('Value', []) if result.get('OK', False) else []
+    all_lfns = [lfn for lfns in job_lfns.values() for lfn in lfns]
+    md = {'Successful': {}, 'Failed': {}}
+    rp = {'Successful': {}, 'Failed': {}}
+    if all_lfns:
+        md_result = dirac.getMetadata(all_lfns)
+        if md_result.get('OK', False):
+            md = md_result['Value']
+        rp_result = dirac.getReplicas(all_lfns)
+        if rp_result.get('OK', False):
+            rp = rp_result['Value']
+    ret = {}
+    for this_id, lfns in job_lfns.items():
+        ret[this_id] = {}
+        for lfn in lfns:
+            file_name = os.path.basename(lfn)
+            info = {'LFN': lfn}
+            ret[this_id][file_name] = info
+            if lfn in md['Successful']:
+                info['GUID'] = md['Successful'][lfn]['GUID']
+            elif lfn in md['Failed']:
+                # this catches if fail upload, note lfn still exists in list as dirac tried it
+                info['LFN'] = '###FAILED###'
+                info['LOCATIONS'] = md['Failed'][lfn]
+                info['GUID'] = 'NotAvailable'
+                continue
+            if lfn in rp['Successful']:
+                info['LOCATIONS'] = rp['Successful'][lfn].keys()
+    return ret
+
+
 @diracCommand
 def status(job_ids, statusmapping, pipe_out=True):
     '''Function to check the statuses and return the Ganga status of a job after looking it's DIRAC status against a Ganga one'''
@@ -0,0 +1,227 @@
+"""
+Bulk and coalesced access to the DIRAC file catalogue for DiracFile.
+
+Asking DIRAC about one LFN at a time costs a full DIRAC call per file. Here:
+  - requests about single files made at about the same time (e.g. from the worker threads of a splitter) are
+    collected for [DIRAC]CatalogueBatchWindow seconds and sent as one bulk command, e.g. getReplicas([lfn1, lfn2...])
+  - bulk commands are sent in chunks of at most [DIRAC]CatalogueBatchSize LFNs
+  - the replicas and metadata of successful lookups are kept for [DIRAC]CatalogueCacheTTL seconds, any change made
+    through Ganga (remove, replicate, upload...) forgets them
+"""
+
+import time
+import threading
+
+from Ganga.Utility.Config import getConfig
+from Ganga.Utility.logging import getLogger
+from GangaDirac.Lib.Utilities.DiracUtilities import execute
+
+logger = getLogger()
+
+
+def _credentialKey(cred_req):
+    """ Returns a key telling apart the proxies the catalogue is accessed with
+    Args:
+        cred_req (DiracProxy): the credential requirement of the files, may be None
+    """
+    if cred_req is None:
+        return None
+    return (cred_req.encoded(), getattr(cred_req, 'dirac_env', None))
+
+
+def _chunks(lfns, size):
+    """ Split the list of LFNs into lists of at most size LFNs """
+    size = max(1, size)
+    for i in range(0, len(lfns), size):
+        yield lfns[i:i + size]
+
+
+class _PendingBatch(object):
+
+    """ LFNs waiting to be sent in one bulk command, and the answer for them """
+
+    def __init__(self, cred_req):
+        self.cred_req = cred_req
+        self.lfns = []
+        self.done = threading.Event()
+        self.result = {'Successful': {}, 'Failed': {}}
+        self.error = None
+
+
+class CatalogueLookup(object):
+
+    """
+    Cached and coalesced calls of one read-only catalogue command taking a list of LFNs (getReplicas, getMetadata)
+    """
+
+    def __init__(self, command):
+        """
+        Args:
+            command (str): name of the Ganga DIRAC command, e.g. 'getReplicas'
+        """
+        super(CatalogueLookup, self).__init__()
+        self.command = command
+        self._lock = threading.Lock()
+        # (credential key, lfn) -> (expiry time, answer)
+        self._cache = {}
+        # credential key -> batch being collected
+        self._pending = {}
+        self.stats = {'requests': 0, 'cached': 0, 'commands': 0}
+
+    def _run(self, lfns, cred_req):
+        """ Send the command for the LFNs in chunks, returns the merged {'Successful':..., 'Failed':...}
+        Args:
+            lfns (list): the LFNs to ask about
+            cred_req (DiracProxy): the proxy to use
+        """
+        self.stats['commands'] += 1
+        result = _bulk(self.command + '(%s)', lfns, cred_req)
+        ttl = getConfig('DIRAC')['CatalogueCacheTTL']
+        if ttl > 0:
+            expiry = time.time() + ttl
+            key = _credentialKey(cred_req)
+            with self._lock:
+                for lfn, value in result['Successful'].iteritems():
+                    self._cache[(key, lfn)] = (expiry, value)
+        return result
+
+    def _cached(self, lfns, key, result):
+        """ Fill the result with the cached answers, returns the LFNs which aren't cached """
+        now = time.time()
+        missing = []
+        with self._lock:
+            for lfn in lfns:
+                entry = self._cache.get((key, lfn))
+                if entry is not None and entry[0] > now:
+                    result['Successful'][lfn] = entry[1]
+                else:
+                    if entry is not None:
+                        del self._cache[(key, lfn)]
+                    missing.append(lfn)
+        self.stats['cached'] += len(lfns) - len(missing)
+        return missing
+
+    def lookup(self, lfns, cred_req=None, forceRefresh=False):
+        """ Returns {'Successful': {lfn: answer}, 'Failed': {lfn: error}} for the LFNs, sent straight as bulk commands
+        Args:
+            lfns (list): the LFNs to ask about
+            cred_req (DiracProxy): the proxy to use
+            forceRefresh (bool): ignore the cached answers
+        """
+        self.stats['requests'] += 1
+        result = {'Successful': {}, 'Failed': {}}
+        missing = list(lfns) if forceRefresh else self._cached(lfns, _credentialKey(cred_req), result)
+        if missing:
+            ret = self._run(missing, cred_req)
+            result['Successful'].update(ret['Successful'])
+            result['Failed'].update(ret['Failed'])
+        return result
+
+    def lookupOne(self, lfn, cred_req=None, forceRefresh=False):
+        """ Returns {'Successful': {lfn: answer}, 'Failed': {}} or the other way round for one LFN. The request is sent
+        together with those made by other threads within [DIRAC]CatalogueBatchWindow seconds
+        Args:
+            lfn (str): the LFN to ask about
+            cred_req (DiracProxy): the proxy to use
+            forceRefresh (bool): ignore the cached answer
+        """
+        self.stats['requests'] += 1
+        key = _credentialKey(cred_req)
+        result = {'Successful': {}, 'Failed': {}}
+        if not forceRefresh and not self._cached([lfn], key, result):
+            return result
+
+        window = getConfig('DIRAC')['CatalogueBatchWindow']
+        if window <= 0:
+            return self._run([lfn], cred_req)
+
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = _PendingBatch(cred_req)
+                self._pending[key] = batch
+            batch.lfns.append(lfn)
+
+        if leader:
+            # Give the other threads a chance to add their LFNs
+            time.sleep(window)
+            with self._lock:
+                del self._pending[key]
+            try:
+                batch.result = self._run(list(set(batch.lfns)), cred_req)
+            except Exception as err:
+                batch.error = err
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        for status in ('Successful', 'Failed'):
+            if lfn in batch.result[status]:
+                result[status][lfn] = batch.result[status][lfn]
+        return result
+
+    def forget(self, lfns=None):
+        """ Drop the cached answers about the LFNs, or all of them
+        Args:
+            lfns (list): the LFNs which have changed, None for all
+        """
+        with self._lock:
+            if lfns is None:
+                self._cache = {}
+                return
+            lfns = set(lfns)
+            for cache_key in [k for k in self._cache if k[1] in lfns]:
+                del self._cache[cache_key]
+
+replicas = CatalogueLookup('getReplicas')
+metadata = CatalogueLookup('getMetadata')
+
+
+def forgetLFNs(lfns=None):
+    """ Drop everything cached about the LFNs after a change to them, or about all LFNs
+    Args:
+        lfns (list): the LFNs which have changed, None for all
+    """
+    replicas.forget(lfns)
+    metadata.forget(lfns)
+
+
+def _bulk(command, lfns, cred_req):
+    """ Run a command taking a list of LFNs in chunks, returns the merged {'Successful':..., 'Failed':...}
+    Args:
+        command (str): the command with '%s' where the list of LFNs goes, e.g. 'removeFile(%s)'
+        lfns (list): the LFNs
+        cred_req (DiracProxy): the proxy to use
+    """
+    result = {'Successful': {}, 'Failed': {}}
+    for chunk in _chunks(list(lfns), getConfig('DIRAC')['CatalogueBatchSize']):
+        ret = execute(command % chunk, cred_req=cred_req)
+        result['Successful'].update(ret.get('Successful', {}))
+        result['Failed'].update(ret.get('Failed', {}))
+    return result
+
+
+def removeFiles(lfns, cred_req=None):
+    """ Remove the LFNs from the catalogue and the storage elements
+    Args:
+        lfns (list): the LFNs to remove
+        cred_req (DiracProxy): the proxy to use
+    """
+    try:
+        return _bulk('removeFile(%s)', lfns, cred_req)
+    finally:
+        forgetLFNs(lfns)
+
+
+def getFiles(lfns, destDir, cred_req=None):
+    """ Download the LFNs to destDir
+    Args:
+        lfns (list): the LFNs to download
+        destDir (str): the directory to put the files in
+        cred_req (DiracProxy): the proxy to use
+    """
+    return _bulk('getFile(%%s, destDir="%s")' % destDir, lfns, cred_req)
@@ -235,14 +235,24 @@ def execute(command,
         # We know were whe want to run, lets just run there
         cwd_ = cwd
 
-    returnable = gexecute.execute(command,
-                                  timeout=timeout,
-                                  env=env,
-                                  cwd=cwd_,
-                                  shell=shell,
-                                  python_setup=python_setup,
-                                  eval_includes=eval_includes,
-                                  update_env=update_env)
+    if getConfig('DIRAC')['useWorkerPool'] and not shell and not update_env and eval_includes is None:
+        # Re-use a python which has already loaded DIRAC
+        from GangaDirac.Lib.Utilities.DiracWorkerPool import getDiracWorkerPool, DiracWorkerError
+        try:
+            returnable = getDiracWorkerPool().execute(command, env, python_setup, cwd=cwd_, timeout=timeout)
+        except DiracWorkerError as err:
+            if cwd is None:
+                shutil.rmtree(cwd_, ignore_errors=True)
+            raise GangaDiracError(str(err))
+    else:
+        returnable = gexecute.execute(command,
+                                      timeout=timeout,
+                                      env=env,
+                                      cwd=cwd_,
+                                      shell=shell,
+                                      python_setup=python_setup,
+                                      eval_includes=eval_includes,
+                                      update_env=update_env)
 
     # If the time 
     if returnable == 'Command timed out!':
@@ -0,0 +1,317 @@
+"""
+Long-lived python processes which have the DIRAC environment and the Ganga DIRAC commands already loaded.
+
+Running a command through Ganga.Utility.execute starts a new python, which has to import DIRAC and parse the Ganga
+DIRAC commands before it can do anything; for short calls such as a status query this dominates the time taken.
+The processes here are started once for a given environment (i.e. a given DIRAC installation and proxy) and then
+receive the commands one after the other:
+  - requests and results are pickled and sent over the stdin and a private copy of the stdout of the worker, anything
+    printed by DIRAC ends up in the debug log
+  - at most [DIRAC]WorkerPoolSize workers run for a given environment, callers wait for one to become free
+  - a worker which runs a command for longer than the timeout of the call is killed, as is a worker which doesn't
+    answer a ping after being idle for [DIRAC]WorkerHealthCheckInterval seconds; a new one is started by the next call
+  - workers are replaced after [DIRAC]WorkerMaxCalls commands so that leaks in DIRAC don't build up
+"""
+
+import os
+import time
+import atexit
+import signal
+import threading
+import subprocess
+import cPickle as pickle
+
+from Ganga.Utility.Config import getConfig
+from Ganga.Utility.logging import getLogger
+
+logger = getLogger()
+
+# This is run by the worker, it reads the setup code once and then executes the commands it is sent
+_WORKER_SCRIPT = r'''
+import os, sys, traceback
+import cPickle as pickle
+channel = os.fdopen(os.dup(1), 'wb')
+os.dup2(2, 1)
+
+def send(obj):
+    data = pickle.dumps(obj, 2)
+    channel.write('%d\n' % len(data))
+    channel.write(data)
+    channel.flush()
+
+def receive():
+    size = sys.stdin.readline()
+    if not size:
+        return None
+    return pickle.loads(sys.stdin.read(int(size)))
+
+results = []
+def output(data):
+    results.append(data)
+
+namespace = {'__name__': '__ganga_dirac_worker__', 'pickle': pickle, 'output': output}
+try:
+    exec(receive(), namespace)
+except:
+    send(('error', traceback.format_exc()))
+    sys.exit(1)
+send(('ready', os.getpid()))
+
+while True:
+    request = receive()
+    if request is None:
+        break
+    command, cwd = request
+    del results[:]
+    start_dir = os.getcwd()
+    try:
+        if cwd:
+            os.chdir(cwd)
+        # New top level names of a command are not seen by the next ones
+        exec(command, dict(namespace))
+        send(results[0] if results else None)
+    except:
+        send(traceback.format_exc())
+    finally:
+        os.chdir(start_dir)
+'''
+
+
+class DiracWorkerError(Exception):
+
+    """ The worker died or didn't answer in time, the command may or may not have been run """
+    pass
+
+
+class DiracWorker(object):
+
+    """
+    One python process running the DIRAC commands it receives
+    """
+
+    def __init__(self, env, python_setup, timeout=None):
+        """
+        Start the worker and load the setup code in it
+        Args:
+            env (dict): the DIRAC environment the worker runs in
+            python_setup (str): the code defining the Ganga DIRAC commands, e.g. from getDiracCommandIncludes
+            timeout (int): seconds allowed for loading the setup code
+        """
+        super(DiracWorker, self).__init__()
+        self.calls = 0
+        self.last_used = time.time()
+        self._timed_out = False
+        # 'python' is looked up in the PATH of the DIRAC environment, as for Ganga.Utility.execute
+        self.process = subprocess.Popen(['python', '-u', '-c', _WORKER_SCRIPT], env=env, close_fds=True,
+                                        preexec_fn=os.setsid, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE)
+        self._stderr_thread = threading.Thread(target=self._logStderr, name='DiracWorker_stderr')
+        self._stderr_thread.daemon = True
+        self._stderr_thread.start()
+
+        ready = self._request(python_setup, timeout)
+        if not isinstance(ready, tuple) or ready[0] != 'ready':
+            self.kill()
+            raise DiracWorkerError("Could not start a DIRAC worker: %s" % (ready[1] if isinstance(ready, tuple) else ready))
+        self.pid = ready[1]
+        logger.debug("Started DIRAC worker %s" % self.pid)
+
+    def _logStderr(self):
+        for line in iter(self.process.stderr.readline, ''):
+            logger.debug("DIRAC worker: %s" % line.rstrip())
+
+    def _kill_on_timeout(self):
+        self._timed_out = True
+        self.kill()
+
+    def _request(self, request, timeout):
+        """ Send the request and return the answer of the worker
+        Args:
+            request (object): something which can be pickled
+            timeout (int): seconds after which the worker is killed, None to wait forever
+        """
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, self._kill_on_timeout)
+            timer.daemon = True
+            timer.start()
+        try:
+            data = pickle.dumps(request, 2)
+            self.process.stdin.write('%d\n' % len(data))
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+            size = self.process.stdout.readline()
+            if not size:
+                raise EOFError("no answer")
+            return pickle.loads(self.process.stdout.read(int(size)))
+        except (IOError, OSError, EOFError, ValueError, pickle.UnpicklingError) as err:
+            self.kill()
+            if self._timed_out:
+                raise DiracWorkerError("DIRAC command timed out")
+            raise DiracWorkerError("DIRAC worker died: %s" % err)
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def run(self, command, cwd=None, timeout=None):
+        """ Returns what the command passed to output(), or the traceback if it raised
+        Args:
+            command (str): python code calling the Ganga DIRAC commands
+            cwd (str): directory to run the command in
+            timeout (int): seconds after which the worker is killed
+        """
+        self.calls += 1
+        try:
+            return self._request((command, cwd), timeout)
+        finally:
+            self.last_used = time.time()
+
+    def ping(self, timeout):
+        """ Returns whether the worker still answers
+        Args:
+            timeout (int): seconds to wait for the answer
+        """
+        try:
+            return self.run('output(True)', timeout=timeout) is True
+        except DiracWorkerError:
+            return False
+
+    def isAlive(self):
+        """ Whether the process of the worker is running """
+        return self.process.poll() is None
+
+    def kill(self):
+        """ Stop the worker straight away """
+        if self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except OSError as err:
+                logger.debug("Error killing DIRAC worker: %s" % err)
+        self.process.wait()
+
+    def close(self):
+        """ Ask the worker to exit once it has finished """
+        try:
+            self.process.stdin.close()
+        except IOError:
+            pass
+        for _ in range(20):
+            if self.process.poll() is not None:
+                return
+            time.sleep(0.05)
+        self.kill()
+
+
+class DiracWorkerPool(object):
+
+    """
+    Workers shared by all the DIRAC calls, kept per environment and setup code
+    """
+
+    def __init__(self):
+        super(DiracWorkerPool, self).__init__()
+        self._cond = threading.Condition()
+        # key -> idle workers
+        self._idle = {}
+        # key -> number of workers started and not yet stopped
+        self._count = {}
+        self._closed = False
+        self.stats = {'calls': 0, 'started': 0, 'restarted': 0, 'timeouts': 0}
+
+    @staticmethod
+    def _key(env, python_setup):
+        return hash((tuple(sorted(env.items())), python_setup))
+
+    def _getWorker(self, key, env, python_setup, timeout):
+        """ Returns an idle worker for the key, starting one if the pool isn't full
+        Args:
+            key (int): identifies the environment and setup code
+            env (dict): the DIRAC environment
+            python_setup (str): the Ganga DIRAC commands
+            timeout (int): seconds allowed to start a worker
+        """
+        config = getConfig('DIRAC')
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise DiracWorkerError("The DIRAC worker pool has been shut down")
+                idle = self._idle.setdefault(key, [])
+                if idle:
+                    worker = idle.pop()
+                    break
+                if self._count.get(key, 0) < max(1, config['WorkerPoolSize']):
+                    self._count[key] = self._count.get(key, 0) + 1
+                    worker = None
+                    break
+                self._cond.wait()
+
+        if worker is not None:
+            healthy = worker.isAlive() and worker.calls < config['WorkerMaxCalls']
+            if healthy and time.time() - worker.last_used > config['WorkerHealthCheckInterval']:
+                healthy = worker.ping(timeout=min(timeout or 60, 60))
+            if healthy:
+                return worker
+            logger.debug("Replacing DIRAC worker %s" % worker.pid)
+            worker.close()
+            self.stats['restarted'] += 1
+
+        try:
+            worker = DiracWorker(env, python_setup, timeout)
+        except Exception:
+            self._release(key, None)
+            raise
+        self.stats['started'] += 1
+        return worker
+
+    def _release(self, key, worker):
+        """ Give the worker back to the pool, None if it is no longer usable """
+        with self._cond:
+            if worker is not None and worker.isAlive() and not self._closed:
+                self._idle.setdefault(key, []).append(worker)
+            else:
+                self._count[key] -= 1
+            self._cond.notify()
+
+    def execute(self, command, env, python_setup, cwd=None, timeout=None):
+        """ Run the command in a worker of the environment, returns what the command passed to output()
+        Args:
+            command (str): python code calling the Ganga DIRAC commands
+            env (dict): the DIRAC environment
+            python_setup (str): the Ganga DIRAC commands
+            cwd (str): directory to run the command in
+            timeout (int): seconds after which the command (and its worker) is killed
+        """
+        key = self._key(env, python_setup)
+        worker = self._getWorker(key, env, python_setup, timeout)
+        self.stats['calls'] += 1
+        try:
+            return worker.run(command, cwd, timeout)
+        except DiracWorkerError:
+            if worker._timed_out:
+                self.stats['timeouts'] += 1
+            raise
+        finally:
+            self._release(key, worker)
+
+    def shutdown(self):
+        """ Stop all the workers """
+        with self._cond:
+            self._closed = True
+            workers = [w for idle in self._idle.values() for w in idle]
+            self._idle = {}
+            self._cond.notifyAll()
+        for worker in workers:
+            worker.close()
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def getDiracWorkerPool():
+    """ Returns the pool of DIRAC workers, created the first time it is needed """
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = DiracWorkerPool()
+            atexit.register(_worker_pool.shutdown)
+    return _worker_pool
@@ -94,6 +94,22 @@ if not _after_bootstrap:
 
     configDirac.addOption('maxSubjobsPerProcess', 100, 'Set the maximum number of subjobs to be submitted per process.')
 
+    configDirac.addOption('MonitoringShardSize', 1000, 'Maximum number of jobs whose status is asked for in one DIRAC call by the monitoring')
+    configDirac.addOption('MonitoringParallelShards', 4, 'Number of groups of MonitoringShardSize jobs whose status is asked for at the same time by the monitoring')
+    configDirac.addOption('MonitoringShardRetries', 1, 'Number of times a failed DIRAC status query of a group of jobs is retried during a monitoring pass')
+    configDirac.addOption('pipelinedFinalisation', True, 'Finalise completed DIRAC jobs in download, metadata and post-processing stages, each working on batches of jobs, rather than one job at a time')
+    configDirac.addOption('FinalisationBatchSize', 20, 'Maximum number of jobs whose output sandboxes or output data information are fetched in one DIRAC call during finalisation')
+    configDirac.addOption('FinalisationDownloadThreads', 4, 'Number of threads downloading the output sandboxes of completed DIRAC jobs')
+    configDirac.addOption('FinalisationMetadataThreads', 2, 'Number of threads looking up the output data of completed DIRAC jobs')
+    configDirac.addOption('FinalisationPostProcessThreads', 2, 'Number of threads running the post-processing of completed DIRAC jobs')
+    configDirac.addOption('CatalogueBatchWindow', 0.1, 'Seconds during which the replica and metadata lookups of single DiracFiles made by different threads are collected into one DIRAC call. 0 sends each lookup straight away')
+    configDirac.addOption('CatalogueBatchSize', 500, 'Maximum number of LFNs sent to DIRAC in one bulk catalogue call')
+    configDirac.addOption('CatalogueCacheTTL', 300, 'Seconds for which the replicas and metadata of an LFN are re-used by DiracFile. Changes made through Ganga are seen straight away, 0 disables the cache')
+    configDirac.addOption('useWorkerPool', True, 'Run the DIRAC commands in long-lived python processes which have DIRAC loaded already, rather than starting a new python for every command')
+    configDirac.addOption('WorkerPoolSize', 3, 'Maximum number of DIRAC worker processes running at the same time for a given DIRAC environment and proxy')
+    configDirac.addOption('WorkerMaxCalls', 500, 'Number of commands after which a DIRAC worker process is replaced by a new one')
+    configDirac.addOption('WorkerHealthCheckInterval', 300, 'A DIRAC worker process idle for longer than this many seconds is pinged before being used, and replaced if it does not answer')
+
 def standardSetup():
 
     import PACKAGE
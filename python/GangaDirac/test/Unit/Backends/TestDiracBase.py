@@ -434,3 +434,127 @@ def test_getOutputDataLFNs(db):
 
         subjob = True
         assert db.getOutputDataLFNs() == ['a', 'b', 'c'] * 3
+
+
+def _monitored_jobs(number):
+    """Jobs in the submitted state on DIRAC, standing in for real subjobs"""
+    jobs = []
+    for i in range(number):
+        j = Mock(status='submitted', been_queued=False, master=None, fqid=str(i))
+        j.backend.id = i
+        j.backend.status = 'Waiting'
+        jobs.append(j)
+    return jobs
+
+
+def test_monitor_dirac_running_jobs_shards(db, mocker):
+    """Test that the jobs are monitored in shards and that only the failed shard is asked about again"""
+    from Ganga.Utility.Config import setConfigOption
+    from GangaDirac.Lib.Backends.DiracBase import DiracBase
+
+    setConfigOption('DIRAC', 'MonitoringShardSize', 3)
+    setConfigOption('DIRAC', 'MonitoringParallelShards', 2)
+    setConfigOption('DIRAC', 'MonitoringShardRetries', 1)
+    mocker.patch('GangaDirac.Lib.Backends.DiracBase.DiracBase._bulk_updateStateTime')
+
+    calls = []
+
+    def monitorJobs(command, cred_req=None):
+        ids = eval(command[len('monitorJobs('):command.index(']') + 1])
+        calls.append(ids)
+        # The shard with job 4 fails once, the one with job 7 always
+        if 7 in ids or (4 in ids and calls.count(ids) == 1):
+            raise GangaDiracError('DIRAC timed out')
+        return [['Job running', 'Running', 'CE', 'running', '']] * len(ids), {}
+
+    jobs = _monitored_jobs(10)
+    with patch('GangaDirac.Lib.Backends.DiracBase.execute', side_effect=monitorJobs):
+        DiracBase.monitor_dirac_running_jobs(jobs, {'Done': 'completed'})
+
+    assert sorted(calls) == [[0, 1, 2], [3, 4, 5], [3, 4, 5], [6, 7, 8], [6, 7, 8], [9]]
+    for j in jobs:
+        if j.backend.id in [6, 7, 8]:
+            j.updateStatus.assert_not_called()
+        else:
+            j.updateStatus.assert_called_once_with('running', update_master=False)
+            assert j.backend.status == 'Running'
+
+
+def test_monitor_dirac_running_jobs_single_shard_failure(db, mocker):
+    """Test that a failure to monitor a single shard is logged rather than raised, so other credential groups go on"""
+    from Ganga.Utility.Config import setConfigOption
+    from GangaDirac.Lib.Backends.DiracBase import DiracBase
+
+    setConfigOption('DIRAC', 'MonitoringShardSize', 10)
+    setConfigOption('DIRAC', 'MonitoringShardRetries', 1)
+
+    jobs = _monitored_jobs(3)
+    with patch('GangaDirac.Lib.Backends.DiracBase.execute', side_effect=GangaDiracError('DIRAC timed out')) as execute:
+        DiracBase.monitor_dirac_running_jobs(jobs, {'Done': 'completed'})
+
+    assert execute.call_count == 2
+    for j in jobs:
+        j.updateStatus.assert_not_called()
+
+
+def test_finalisation_pipeline(db, mocker):
+    """Test that completed jobs go through the finalisation stages in batches and that failures are finalised on their own"""
+    from GangaDirac.Lib.Backends.DiracFinalisation import FinalisationPipeline
+
+    mocker.patch('GangaDirac.Lib.Backends.DiracFinalisation.group_jobs_by_backend_credential',
+                 side_effect=lambda jobs: [jobs] if jobs else [])
+    mocker.patch('GangaDirac.Lib.Backends.DiracBase.DiracBase._getStateTime')
+    write_locations = mocker.patch('GangaDirac.Lib.Backends.DiracBase.DiracBase._write_dirac_file_locations')
+    fallback = mocker.patch('GangaDirac.Lib.Backends.DiracFinalisation.FinalisationPipeline._fallback')
+
+    calls = []
+
+    def finalise(command, cred_req=None):
+        calls.append(command)
+        if command.startswith('finished_jobs_sandboxes'):
+            ids = [i for i, _path in eval(command[len('finished_jobs_sandboxes('):-1])]
+            # The sandbox of job 2 can't be downloaded
+            return dict((i, (10. * i, {'OK': i != 2, 'Message': 'no sandbox'}, {'completed': 'time'})) for i in ids)
+        ids = eval(command[len('getBulkOutputDataInfo('):-1])
+        return dict((i, {'out.root': {'LFN': '/lfn/%s' % i}}) for i in ids)
+
+    jobs = _monitored_jobs(4)
+    for j in jobs:
+        j.status = 'running'
+        j.getOutputWorkspace.return_value.getPath.return_value = '/output/%s' % j.backend.id
+    # Only job 3 has DiracFiles as output
+    for j in jobs[:3]:
+        j.outputfiles = []
+
+    pipeline = FinalisationPipeline()
+    download, metadata, postprocess = pipeline.stages
+    with patch('GangaDirac.Lib.Backends.DiracFinalisation.execute', side_effect=finalise):
+        for j in jobs:
+            download.queue.put((j, None))
+        for stage, next_stage in [(download, metadata), (metadata, postprocess), (postprocess, None)]:
+            batch = []
+            while not stage.queue.empty():
+                batch.append(stage.queue.get())
+            pipeline._process(stage, next_stage, batch)
+
+    # One DIRAC call per stage for the whole batch
+    assert len(calls) == 2
+    assert calls[1] == 'getBulkOutputDataInfo([3])'
+    write_locations.assert_any_call(jobs[3], {'out.root': {'LFN': '/lfn/3'}})
+    write_locations.assert_any_call(jobs[0], {})
+
+    for j in jobs:
+        assert j.backend.normCPUTime == 10. * j.backend.id
+    # Left to the serial finalisation, which tries the download again, rather than failed straight away
+    assert fallback.call_count == 1
+    assert fallback.call_args[0][0] is jobs[2]
+    assert mocker.call('failed') not in jobs[2].updateStatus.call_args_list
+    for j in jobs[:2] + jobs[3:]:
+        j.updateStatus.assert_called_with('completed')
+        assert j.been_queued is False
+
+    stats = pipeline.stats()
+    assert stats['download']['processed'] == 3
+    assert stats['download']['failed'] == 1
+    assert stats['postprocess']['processed'] == 3
+    assert stats['postprocess']['queued'] == 0
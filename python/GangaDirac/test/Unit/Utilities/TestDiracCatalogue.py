@@ -0,0 +1,103 @@
+import threading
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+def _fake_execute(calls):
+    """ Stands in for DiracUtilities.execute, answers getReplicas([...]) for any list of LFNs """
+    def execute(command, cred_req=None):
+        calls.append(command)
+        lfns = eval(command[command.index('('):])
+        return {'Successful': dict((lfn, {'CERN-DST': 'root://' + lfn}) for lfn in lfns if 'missing' not in lfn),
+                'Failed': dict((lfn, 'No such file') for lfn in lfns if 'missing' in lfn)}
+    return execute
+
+
+def test_catalogue_coalescing():
+    """ Test that lookups of single files made by concurrent threads end up in one bulk call """
+
+    from GangaDirac.Lib.Utilities.DiracCatalogue import CatalogueLookup
+
+    calls = []
+    lookup = CatalogueLookup('getReplicas')
+    results = {}
+
+    def worker(lfn):
+        results[lfn] = lookup.lookupOne(lfn)
+
+    with patch('GangaDirac.Lib.Utilities.DiracCatalogue.execute', _fake_execute(calls)):
+        threads = [threading.Thread(target=worker, args=('/lhcb/file%s' % i,)) for i in range(20)]
+        threads.append(threading.Thread(target=worker, args=('/lhcb/missing',)))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert len(calls) < 5
+    assert results['/lhcb/file3'] == {'Successful': {'/lhcb/file3': {'CERN-DST': 'root:///lhcb/file3'}}, 'Failed': {}}
+    assert results['/lhcb/missing'] == {'Successful': {}, 'Failed': {'/lhcb/missing': 'No such file'}}
+
+
+def test_catalogue_cache():
+    """ Test that answers are re-used until they expire or the file is changed """
+
+    from GangaDirac.Lib.Utilities.DiracCatalogue import CatalogueLookup
+    from Ganga.Utility.Config import getConfig
+
+    calls = []
+    lookup = CatalogueLookup('getReplicas')
+    config = getConfig('DIRAC')
+
+    with patch('GangaDirac.Lib.Utilities.DiracCatalogue.execute', _fake_execute(calls)):
+        lfns = ['/lhcb/file%s' % i for i in range(5)]
+        assert len(lookup.lookup(lfns)['Successful']) == 5
+        # Only the new file is asked about
+        assert len(lookup.lookup(lfns + ['/lhcb/file5'])['Successful']) == 6
+        assert calls[-1] == "getReplicas(['/lhcb/file5'])"
+        assert lookup.lookupOne('/lhcb/file0')['Successful']
+        assert len(calls) == 2
+
+        lookup.forget(['/lhcb/file0'])
+        lookup.lookup(lfns)
+        assert calls[-1] == "getReplicas(['/lhcb/file0'])"
+
+        assert lookup.lookupOne('/lhcb/file1', forceRefresh=True)['Successful']
+        assert len(calls) == 4
+
+        old_size = config['CatalogueBatchSize']
+        try:
+            config.setUserValue('CatalogueBatchSize', 2)
+            lookup.lookup(lfns, forceRefresh=True)
+            assert len(calls) == 4 + 3
+        finally:
+            config.setUserValue('CatalogueBatchSize', old_size)
+
+
+def test_bulk_functions_check_credential():
+    """ Test that the bulk functions check the proxies before any DIRAC call """
+
+    from Ganga.Core.exceptions import CredentialsError
+    from GangaDirac.Lib.Files.DiracFile import DiracFile, getReplicasForFiles
+
+    calls = []
+    errors = []
+    files = [DiracFile(lfn='/lhcb/file%s' % i) for i in range(3)]
+
+    def worker():
+        try:
+            getReplicasForFiles(files)
+        except CredentialsError as err:
+            errors.append(err)
+
+    with patch('GangaDirac.Lib.Utilities.DiracCatalogue.execute', _fake_execute(calls)):
+        with patch('Ganga.GPIDev.Credentials.credential_store.__getitem__', side_effect=KeyError):
+            # Not the main thread, so there is no prompt for a proxy
+            t = threading.Thread(target=worker)
+            t.start()
+            t.join()
+
+    assert len(errors) == 1
+    assert calls == []
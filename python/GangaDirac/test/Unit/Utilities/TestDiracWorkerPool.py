@@ -0,0 +1,77 @@
+import os
+import time
+
+import pytest
+
+
+@pytest.fixture
+def fake_dirac(tmpdir):
+    """ A DIRAC package with just enough in it for the Ganga DIRAC commands to be loaded, importing it is slow """
+    files = {'DIRAC/__init__.py': 'import time\ntime.sleep(1)\n',
+             'DIRAC/Core/__init__.py': '',
+             'DIRAC/Core/Base/__init__.py': '',
+             'DIRAC/Core/Base/Script.py': 'def parseCommandLine():\n    pass\n',
+             'DIRAC/Interfaces/__init__.py': '',
+             'DIRAC/Interfaces/API/__init__.py': '',
+             'DIRAC/Interfaces/API/Dirac.py': ('import os\n'
+                                               'class Dirac(object):\n'
+                                               '    def ping(self, system, service):\n'
+                                               '        return {"OK": True, "Value": os.getpid()}\n'),
+             'DIRAC/Interfaces/API/DiracAdmin.py': 'class DiracAdmin(object):\n    pass\n'}
+    for name, content in files.items():
+        tmpdir.join(name).write(content, ensure=True)
+    env = dict(os.environ)
+    env['PYTHONPATH'] = str(tmpdir)
+    return env
+
+
+def _setup():
+    from GangaDirac.Lib.Utilities.DiracUtilities import getDiracCommandIncludes
+    return getDiracCommandIncludes()
+
+
+def test_worker_pool_reuse(fake_dirac):
+    """ Test that the commands run in the same process once DIRAC has been loaded """
+
+    from GangaDirac.Lib.Utilities.DiracWorkerPool import DiracWorkerPool
+
+    pool = DiracWorkerPool()
+    try:
+        first = pool.execute('ping("WorkloadManagement", "JobManager")', fake_dirac, _setup(), timeout=60)
+        assert first['OK']
+
+        start = time.time()
+        for _ in range(10):
+            assert pool.execute('ping("WorkloadManagement", "JobManager")', fake_dirac, _setup(), timeout=60) == first
+        # No new python importing DIRAC for each call
+        assert time.time() - start < 1
+        assert pool.stats['started'] == 1
+
+        # Names defined by a command don't leak into the next one
+        pool.execute('leaked = 1\noutput(True)', fake_dirac, _setup(), timeout=60)
+        assert 'NameError' in pool.execute('output(leaked)', fake_dirac, _setup(), timeout=60)
+    finally:
+        pool.shutdown()
+
+
+def test_worker_pool_restart(fake_dirac):
+    """ Test that a worker which crashes or times out is replaced """
+
+    from GangaDirac.Lib.Utilities.DiracWorkerPool import DiracWorkerPool, DiracWorkerError
+
+    pool = DiracWorkerPool()
+    try:
+        first = pool.execute('ping("a", "b")', fake_dirac, _setup(), timeout=60)['Value']
+
+        with pytest.raises(DiracWorkerError):
+            pool.execute('import os\nos._exit(1)', fake_dirac, _setup(), timeout=60)
+        second = pool.execute('ping("a", "b")', fake_dirac, _setup(), timeout=60)['Value']
+        assert second != first
+
+        with pytest.raises(DiracWorkerError) as err:
+            pool.execute('import time\ntime.sleep(30)', fake_dirac, _setup(), timeout=2)
+        assert 'timed out' in str(err.value)
+        assert pool.stats['timeouts'] == 1
+        assert pool.execute('ping("a", "b")', fake_dirac, _setup(), timeout=60)['Value'] not in (first, second)
+    finally:
+        pool.shutdown()